@@ -1,41 +1,193 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
 import secrets
 import bcrypt
+import orjson
 from fastapi import HTTPException, status
-from supabase import Client
+from cache import TTLCache
+from database import AdminRepository
+from metrics import Counter, Histogram, UPSTREAM_ERRORS, UPSTREAM_LATENCY
+
+BCRYPT_QUEUE_WAIT = Histogram('bcrypt_queue_wait_seconds', "Time bcrypt work waited for a pool worker")
+BCRYPT_REJECTED = Counter('bcrypt_rejected', "bcrypt operations refused because the pool queue was full")
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so a small thread pool gives real
+    parallelism without the cost of a process pool. Once more than
+    ``workers + max_queue`` operations are in flight, new ones are rejected
+    with a 503 instead of queueing behind each other.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.workers = workers or int(os.environ.get('BCRYPT_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get('BCRYPT_MAX_QUEUE', 8))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        self.in_flight = 0
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            BCRYPT_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please try again shortly",
+                headers={"Retry-After": "1"}
+            )
+        
+        self.in_flight += 1
+        queued_at = time.perf_counter()
+        
+        def timed():
+            started_at = time.perf_counter()
+            result = fn(*args)
+            return result, started_at - queued_at, time.perf_counter() - started_at
+        
+        operation = fn.__name__.lstrip('_')
+        try:
+            result, queue_wait, hash_time = await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+        except Exception:
+            UPSTREAM_ERRORS.labels('bcrypt', operation).inc()
+            raise
+        finally:
+            self.in_flight -= 1
+        
+        BCRYPT_QUEUE_WAIT.observe(queue_wait)
+        UPSTREAM_LATENCY.labels('bcrypt', operation).observe(hash_time)
+        return result
+
+    def typical_hash_time(self) -> float:
+        """Mean time of a password check, used to pad lookups of unknown emails"""
+        mean = UPSTREAM_LATENCY.labels('bcrypt', 'check').mean()
+        return mean if mean is not None else 0.25
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _check(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class SessionTokens:
+    """Stateless HMAC-SHA256 signed admin session tokens.
+
+    A token is ``payload.signature`` (both base64url). The payload holds the
+    admin id, the token kind (access or refresh), its expiry and a keyed
+    fingerprint of the admin's password hash, so a password change revokes
+    every token issued before it. Verifying is one HMAC, no I/O.
+
+    The key is ADMIN_SESSION_SECRET, or else derived from the Supabase
+    service key so every worker and deploy agrees on it.
+    """
+
+    def __init__(self, secret: Optional[bytes] = None, access_ttl: Optional[float] = None,
+                 refresh_ttl: Optional[float] = None):
+        self._secret = secret
+        self.access_ttl = access_ttl or float(os.environ.get('ADMIN_SESSION_TTL', 900))
+        self.refresh_ttl = refresh_ttl or float(os.environ.get('ADMIN_REFRESH_TTL', 7 * 86400))
+
+    @property
+    def secret(self) -> bytes:
+        # Resolved on first use, after .env has been loaded
+        if self._secret is None:
+            if os.environ.get('ADMIN_SESSION_SECRET'):
+                self._secret = os.environ['ADMIN_SESSION_SECRET'].encode('utf-8')
+            elif os.environ.get('SUPABASE_SERVICE_KEY'):
+                self._secret = hmac.new(
+                    os.environ['SUPABASE_SERVICE_KEY'].encode('utf-8'), b'admin-session', hashlib.sha256
+                ).digest()
+            else:
+                logging.error("ADMIN_SESSION_SECRET not set; admin sessions won't survive a restart")
+                self._secret = secrets.token_bytes(32)
+        return self._secret
+
+    def fingerprint(self, hashed_password: str) -> str:
+        return _b64encode(hmac.new(self.secret, hashed_password.encode('utf-8'), hashlib.sha256).digest()[:12])
+
+    def _sign(self, payload: bytes) -> str:
+        return _b64encode(hmac.new(self.secret, payload, hashlib.sha256).digest())
+
+    def issue(self, admin: dict, kind: str) -> tuple:
+        """A new token for ``admin`` and its expiry (unix seconds)"""
+        expires_at = int(time.time() + (self.access_ttl if kind == 'access' else self.refresh_ttl))
+        payload = orjson.dumps({
+            'sub': admin['id'],
+            'kind': kind,
+            'exp': expires_at,
+            'pwd': self.fingerprint(admin['hashed_password']),
+        })
+        return f"{_b64encode(payload)}.{self._sign(payload)}", expires_at
+
+    def verify(self, token: str, kind: str) -> Optional[dict]:
+        """The payload of a genuine, unexpired token of this kind, else None"""
+        try:
+            encoded, signature = token.split('.')
+            payload = _b64decode(encoded)
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            claims = orjson.loads(payload)
+        except (ValueError, TypeError):
+            return None
+        if claims.get('kind') != kind or claims.get('exp', 0) < time.time():
+            return None
+        return claims
+
 
 class AuthService:
-    def __init__(self, supabase: Client):
-        self.supabase = supabase
+    def __init__(self, admins: AdminRepository, hasher: Optional[PasswordHasher] = None,
+                 sessions: Optional[SessionTokens] = None):
+        self.admins = admins
+        self.hasher = hasher or PasswordHasher()
+        self.sessions = sessions or SessionTokens()
+        # Admin rows by id, so authenticated requests skip the database
+        self.records = TTLCache(maxsize=256, ttl=float(os.environ.get('ADMIN_CACHE_TTL', 300)))
     
-    def hash_password(self, password: str) -> str:
+    async def hash_password(self, password: str) -> str:
         """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        return await self.hasher.run(_hash, password)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify password against hash"""
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+        return await self.hasher.run(_check, plain_password, hashed_password)
     
     async def authenticate_admin(self, email: str, password: str) -> Optional[dict]:
-        """Authenticate admin user"""
-        try:
-            response = self.supabase.table('admin_users').select('*').eq('email', email).execute()
-            
-            if not response.data or len(response.data) == 0:
-                return None
-            
-            admin = response.data[0]
-            
-            if self.verify_password(password, admin['hashed_password']):
-                return admin
-            
-            return None
-        except Exception as e:
-            print(f"Authentication error: {str(e)}")
+        """Authenticate admin user; None for a wrong email or password.
+        Database errors propagate, so an outage isn't reported as bad credentials."""
+        admin = await self.admins.get_by_email(email)
+        
+        if not admin:
+            # Take as long as a real check without spending any CPU on it,
+            # so response time doesn't reveal which emails exist
+            await asyncio.sleep(self.hasher.typical_hash_time())
             return None
+        
+        if await self.verify_password(password, admin['hashed_password']):
+            self.records.set(admin['id'], admin)
+            return admin
+        
+        return None
     
     async def create_password_change_token(self, admin_id: int) -> str:
         """Create a password change verification token"""
@@ -43,12 +195,12 @@ class AuthService:
         expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
         
         try:
-            self.supabase.table('password_change_tokens').insert({
+            await self.admins.create_password_token({
                 'admin_id': admin_id,
                 'token': token,
                 'expires_at': expires_at.isoformat(),
                 'used': False
-            }).execute()
+            })
             
             return token
         except Exception as e:
@@ -58,41 +210,23 @@ class AuthService:
                 detail="Failed to create verification token"
             )
     
-    async def verify_and_change_password(self, token: str, new_password: str) -> bool:
-        """Verify token and change password"""
+    async def verify_and_change_password(self, token: str, new_password: str) -> dict:
+        """Verify token and change password; returns the admin's id and email"""
         try:
-            # Get token
-            response = self.supabase.table('password_change_tokens').select('*, admin_users(email)').eq('token', token).eq('used', False).execute()
-            
-            if not response.data or len(response.data) == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid or expired token"
-                )
+            # Hash first: checking, spending the token and updating the
+            # password are then a single database call
+            hashed_password = await self.hash_password(new_password)
             
-            token_data = response.data[0]
+            admin = await self.admins.change_password_with_token(token, hashed_password)
             
-            # Check expiration
-            expires_at = datetime.fromisoformat(token_data['expires_at'].replace('Z', '+00:00'))
-            if datetime.now(timezone.utc) > expires_at:
+            if not admin:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Token has expired"
+                    detail="Invalid or expired token"
                 )
             
-            # Hash new password
-            hashed_password = self.hash_password(new_password)
-            
-            # Update password
-            self.supabase.table('admin_users').update({
-                'hashed_password': hashed_password,
-                'updated_at': datetime.now(timezone.utc).isoformat()
-            }).eq('id', token_data['admin_id']).execute()
-            
-            # Mark token as used
-            self.supabase.table('password_change_tokens').update({'used': True}).eq('token', token).execute()
-            
-            return True
+            self.forget_admin(admin['id'])
+            return admin
         except HTTPException:
             raise
         except Exception as e:
@@ -102,13 +236,35 @@ class AuthService:
                 detail="Failed to change password"
             )
     
-    async def get_admin_email(self, admin_id: int) -> Optional[str]:
-        """Get admin email by ID"""
-        try:
-            response = self.supabase.table('admin_users').select('email').eq('id', admin_id).execute()
-            if response.data and len(response.data) > 0:
-                return response.data[0]['email']
+    async def get_admin(self, admin_id: int) -> Optional[dict]:
+        """Admin row by id, from memory when recently seen"""
+        admin = self.records.get(admin_id)
+        if admin is None:
+            admin = await self.admins.get_by_id(admin_id, 'id, email, hashed_password, created_at')
+            if admin:
+                self.records.set(admin_id, admin)
+        return admin
+
+    def forget_admin(self, admin_id: int):
+        """Drop a cached admin row, e.g. after its password changed"""
+        self.records.pop(admin_id)
+
+    def issue_session(self, admin: dict) -> dict:
+        access_token, expires_at = self.sessions.issue(admin, 'access')
+        refresh_token, _ = self.sessions.issue(admin, 'refresh')
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "bearer",
+            "expires_at": expires_at
+        }
+
+    async def admin_from_token(self, token: str, kind: str = 'access') -> Optional[dict]:
+        """The admin a session token belongs to, if it is still valid"""
+        claims = self.sessions.verify(token, kind)
+        if claims is None:
             return None
-        except Exception as e:
-            print(f"Error getting admin email: {str(e)}")
-            return None
\ No newline at end of file
+        admin = await self.get_admin(claims['sub'])
+        if not admin or not hmac.compare_digest(claims['pwd'], self.sessions.fingerprint(admin['hashed_password'])):
+            return None
+        return admin
@@ -0,0 +1,94 @@
+"""
+Concurrent-request throughput of the sync supabase client versus the async
+Database layer, against a local PostgREST stand-in.
+
+Run from backend/:  python -m benchmarks.bench_async_db --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from supabase import create_client
+
+from benchmarks.stand_ins import FakePostgREST, serve
+from database import Database, TransactionRepository
+
+KEY = "bench-service-key"
+
+
+def seed(fake: FakePostgREST, rows: int = 50):
+    fake.seed('payment_transactions', [{
+        "id": str(i),
+        "session_id": f"cs_bench_{i}",
+        "amount": 5.0,
+        "currency": "usd",
+        "message": "gg",
+        "tipper_name": "bench",
+        "status": "complete",
+        "payment_status": "paid",
+        "timestamp": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}+00:00",
+    } for i in range(rows)])
+
+
+async def drive(call, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+async def run(url: str, requests: int, concurrency: int) -> dict:
+    sync_client = create_client(url, KEY)
+
+    async def before():
+        # What the handlers used to do: a blocking call inside an async def
+        sync_client.table('payment_transactions').select(
+            "amount, message, tipper_name, timestamp"
+        ).eq('payment_status', 'paid').order('timestamp', desc=True).limit(10).execute()
+
+    db = Database(url, KEY, pool_size=concurrency, keepalive=concurrency)
+    transactions = TransactionRepository(db)
+
+    async def after():
+        await transactions.recent_paid(10)
+
+    results = {
+        "before_sync_client": await drive(before, requests, concurrency),
+        "after_async_pool": await drive(after, requests, concurrency),
+    }
+    await db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    fake = FakePostgREST(latency=args.latency_ms / 1000)
+    seed(fake)
+    with serve(fake.app) as url:
+        results = asyncio.run(run(url, args.requests, args.concurrency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
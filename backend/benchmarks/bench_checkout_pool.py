@@ -0,0 +1,85 @@
+"""
+Latency of POST /api/checkout/session for preset amounts with and without
+the warm checkout pool, against a Stripe stand-in with injected latency.
+
+Each variant boots the backend against the PostgREST and Stripe stand-ins.
+With the pool on, the run waits until /metrics reports it full, then clicks
+the preset buttons round-robin at ``--interval``, like tippers arriving one
+after another. The pool's hit ratio is read back from /metrics.
+
+Run from backend/:  python -m benchmarks.bench_checkout_pool --clicks 100 --stripe-latency-ms 400
+"""
+import argparse
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stand_ins import FakePostgREST, FakeStripe, metric, percentile, run_backend, serve
+
+ORIGIN = "https://tips.test"
+PRESETS = (5, 10, 25, 50, 100)
+
+
+def clicks(supabase_url: str, stripe_url: str, args, pool: bool) -> dict:
+    env = {
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_SERVICE_KEY": "bench-service-key",
+        "STRIPE_API_KEY": "sk_test_bench",
+        "STRIPE_API_BASE": stripe_url,
+        "CHECKOUT_POOL_ORIGINS": ORIGIN if pool else "",
+        "CHECKOUT_POOL_SIZE": str(args.pool_size),
+    }
+    with run_backend(env) as url, httpx.Client(base_url=url, timeout=30) as client:
+        if pool:
+            deadline = time.monotonic() + 60
+            while metric(client.get('/metrics').text, 'checkout_pool_sessions') < args.pool_size * len(PRESETS):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("checkout pool did not fill")
+                time.sleep(0.1)
+
+        latencies = []
+        for n in range(args.clicks):
+            started = time.perf_counter()
+            response = client.post('/api/checkout/session', json={
+                "amount": PRESETS[n % len(PRESETS)],
+                "tipper_name": f"fan-{n}",
+                "message": "great stream!",
+                "origin_url": ORIGIN,
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+            time.sleep(args.interval)
+
+        hits = metric(client.get('/metrics').text, r'checkout_pool_takes_total\{outcome="hit"\}')
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "max_ms": round(latencies[-1], 2),
+        "pool_hit_ratio": round(hits / args.clicks, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clicks', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=0.2, help="seconds between clicks")
+    parser.add_argument('--stripe-latency-ms', type=float, default=400)
+    parser.add_argument('--pool-size', type=int, default=3)
+    args = parser.parse_args()
+
+    fake_stripe = FakeStripe(latency=args.stripe_latency_ms / 1000)
+    with serve(FakePostgREST().app) as supabase_url, serve(fake_stripe.app) as stripe_url:
+        report = {
+            "stripe_latency_ms": args.stripe_latency_ms,
+            "clicks": args.clicks,
+            "on_demand": clicks(supabase_url, stripe_url, args, pool=False),
+            "pooled": clicks(supabase_url, stripe_url, args, pool=True),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
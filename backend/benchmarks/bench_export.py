@@ -0,0 +1,162 @@
+"""
+Streams the admin transaction export for a small and a very large table and
+compares the backend's peak RSS, which should stay flat as the table grows.
+
+The in-memory PostgREST stand-in keeps every row and filters by scanning, so
+this uses SyntheticTransactions instead: row ``n`` is computed on demand
+from the keyset filters the backend sends, so a million-row table costs the
+stand-in nothing. Peak RSS is read from the backend's own /metrics
+(process_max_resident_memory_bytes) after start-up and after the export.
+Exits non-zero when the export grows peak RSS by more than ``--rss-budget-mb``.
+
+Run from backend/:  python -m benchmarks.bench_export --sizes 10000 1000000
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from benchmarks.stand_ins import run_backend, serve
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "bench-password"
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+STATUSES = ('paid', 'paid', 'paid', 'paid', 'paid', 'paid', 'paid', 'paid', 'pending', 'expired')
+AFTER_ID = re.compile(r'id\.(?:gt|lt)\."?tx-(\d+)')
+
+
+class SyntheticTransactions:
+    """payment_transactions with ``rows`` generated rows, one second apart"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.hashed_password = bcrypt.hashpw(ADMIN_PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode()
+        self.app = Starlette(routes=[Route('/rest/v1/{table}', self.handle, methods=['GET', 'POST', 'PATCH'])])
+
+    def row(self, n: int) -> dict:
+        return {
+            "id": f"tx-{n:09d}",
+            "session_id": f"cs_bench_{n}",
+            "amount": float(5 * (1 + n % 20)),
+            "currency": "usd",
+            "message": "thanks for the stream!",
+            "tipper_name": f"fan-{n % 500}",
+            "status": "completed",
+            "payment_status": STATUSES[n % len(STATUSES)],
+            "timestamp": (BASE + timedelta(seconds=n)).isoformat(),
+            "created_at": (BASE + timedelta(seconds=n)).isoformat(),
+        }
+
+    def index_of(self, timestamp: str) -> int:
+        """First row at or after ``timestamp``"""
+        moment = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        seconds = (moment - BASE).total_seconds()
+        return max(0, min(self.rows, int(seconds) + (seconds % 1 > 0)))
+
+    async def handle(self, request: Request) -> Response:
+        table = request.path_params['table']
+        if table == 'admin_users':
+            rows = [{"id": 1, "email": ADMIN_EMAIL, "hashed_password": self.hashed_password,
+                     "created_at": BASE.isoformat()}]
+            return Response(json.dumps(rows), media_type='application/json')
+        if table != 'payment_transactions' or request.method != 'GET':
+            return Response('[]', media_type='application/json')
+
+        params = request.query_params
+        low, high = 0, self.rows
+        for raw in params.getlist('timestamp'):
+            op, value = raw.split('.', 1)
+            if op == 'gte':
+                low = max(low, self.index_of(value))
+            elif op == 'lt':
+                high = min(high, self.index_of(value))
+            elif op == 'lte':
+                high = min(high, self.index_of(value) + 1)
+        after = AFTER_ID.search(params.get('or', ''))
+        descending = 'desc' in params.get('order', '')
+        if after:
+            if descending:
+                high = min(high, int(after.group(1)))
+            else:
+                low = max(low, int(after.group(1)) + 1)
+        statuses = None
+        if params.get('payment_status', '').startswith(('in.', 'eq.')):
+            statuses = set(params['payment_status'][3:].strip('()').replace('"', '').split(','))
+
+        limit = int(params.get('limit', self.rows))
+        page = []
+        for n in (range(high - 1, low - 1, -1) if descending else range(low, high)):
+            row = self.row(n)
+            if statuses is None or row['payment_status'] in statuses:
+                page.append(row)
+                if len(page) == limit:
+                    break
+        return Response(json.dumps(page), media_type='application/json')
+
+
+def peak_rss_mb(client: httpx.Client) -> float:
+    text = client.get('/metrics').text
+    value = re.search(r'^process_max_resident_memory_bytes (\S+)$', text, re.M).group(1)
+    return round(float(value) / 2 ** 20, 1)
+
+
+def export(rows: int, fmt: str) -> dict:
+    with serve(SyntheticTransactions(rows).app) as supabase_url:
+        env = {"SUPABASE_URL": supabase_url, "SUPABASE_SERVICE_KEY": "bench-service-key"}
+        with run_backend(env) as url, httpx.Client(base_url=url, timeout=600) as client:
+            # Let the start-up tip stats rebuild finish so it isn't measured
+            client.get('/api/tips/stats').raise_for_status()
+            before = peak_rss_mb(client)
+            login = client.post('/api/admin/login', json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+            login.raise_for_status()
+            session = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+            started = time.perf_counter()
+            lines = size = 0
+            with client.stream('GET', '/api/admin/transactions/export', params={"format": fmt},
+                               headers=session) as response:
+                response.raise_for_status()
+                first_byte = time.perf_counter() - started
+                for chunk in response.iter_bytes():
+                    lines += chunk.count(b'\n')
+                    size += len(chunk)
+            elapsed = time.perf_counter() - started
+            after = peak_rss_mb(client)
+
+    exported = lines - (1 if fmt == 'csv' else 0)
+    assert exported == rows, f"exported {exported} of {rows} rows"
+    return {
+        "rows": exported,
+        "mb": round(size / 2 ** 20, 1),
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(exported / elapsed),
+        "first_byte_ms": round(first_byte * 1000, 1),
+        "peak_rss_mb": {"before": before, "after": after, "growth": round(after - before, 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--rss-budget-mb', type=float, default=64)
+    args = parser.parse_args()
+
+    results = {rows: export(rows, args.format) for rows in args.sizes}
+    print(json.dumps({"format": args.format, "exports": results}, indent=2))
+    worst = max(result["peak_rss_mb"]["growth"] for result in results.values())
+    if worst > args.rss_budget_mb:
+        sys.exit(f"export grew peak RSS by {worst} MB, over the {args.rss_budget_mb} MB budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Per-request CPU time and peak allocation of the hot read responses, built
+the old way (a Pydantic model per row, re-validated through response_model
+and serialized by FastAPI) versus the trusted projections serialized with
+orjson that the routes now use.
+
+Both variants run as real FastAPI routes, invoked through the ASGI interface
+directly so no HTTP client or socket overhead is counted. CPU is process
+time per request; allocation is the tracemalloc peak of one request.
+
+Run from backend/:  python -m benchmarks.bench_json_responses --rows 10 100 1000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import orjson
+from fastapi import FastAPI, Response
+
+from server import CreatorProfile, TipResponse, profile_projection, tip_projection
+
+PROFILE_ROW = {
+    "id": 1,
+    "name": "Bench Creator",
+    "bio": "Support me with a tip!",
+    "avatar_url": "https://images.test/avatar.png",
+    "social_links": {"twitter": "https://twitter.test/creator", "twitch": "https://twitch.test/creator"},
+    "created_at": "2024-01-01T00:00:00+00:00",
+    "updated_at": "2024-01-01T00:00:00+00:00",
+}
+
+
+def tip_rows(count: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": f"tx-{n}",
+        "amount": 5.0 * (1 + n % 20),
+        "message": "thanks for the stream!",
+        "tipper_name": f"fan-{n}",
+        "timestamp": (now - timedelta(seconds=n)).isoformat(),
+    } for n in range(count)]
+
+
+def legacy_tip(tip: dict) -> TipResponse:
+    # How rows were turned into responses before the fast path
+    return TipResponse(
+        amount=tip['amount'],
+        message=tip.get('message'),
+        tipper_name=tip.get('tipper_name'),
+        timestamp=datetime.fromisoformat(tip['timestamp'].replace('Z', '+00:00'))
+    )
+
+
+def build_apps(state: dict):
+    before, after = FastAPI(), FastAPI()
+
+    @before.get('/tips', response_model=List[TipResponse])
+    async def tips_before():
+        return [legacy_tip(row) for row in state['rows']]
+
+    @after.get('/tips', response_model=List[TipResponse])
+    async def tips_after():
+        return Response(orjson.dumps([tip_projection(row) for row in state['rows']]), media_type="application/json")
+
+    @before.get('/creator', response_model=CreatorProfile)
+    async def creator_before():
+        return CreatorProfile(**PROFILE_ROW)
+
+    @after.get('/creator', response_model=CreatorProfile)
+    async def creator_after():
+        return Response(orjson.dumps(profile_projection(PROFILE_ROW)), media_type="application/json")
+
+    return before, after
+
+
+async def call(app, path: str) -> bytes:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'headers': [], 'client': ('127.0.0.1', 1), 'server': ('bench', 80),
+    }
+    chunks = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return b''.join(chunks)
+
+
+def same_json(old: bytes, new: bytes) -> bool:
+    """Equal once timestamps are compared as instants ('Z' versus '+00:00')"""
+    def normalize(value):
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, str) and value[10:11] == 'T':
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return value
+    return normalize(json.loads(old)) == normalize(json.loads(new))
+
+
+async def measure(app, path: str, requests: int, samples: int) -> dict:
+    for _ in range(20):
+        await call(app, path)
+    started = time.process_time()
+    for _ in range(requests):
+        await call(app, path)
+    cpu_us = (time.process_time() - started) / requests * 1e6
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await call(app, path)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return {"cpu_us": round(cpu_us, 1), "peak_alloc_kib": round(statistics.median(peaks) / 1024, 1)}
+
+
+async def run(args) -> dict:
+    state = {}
+    before, after = build_apps(state)
+    report = {}
+    for rows in args.rows:
+        state['rows'] = tip_rows(rows)
+        assert same_json(await call(before, '/tips'), await call(after, '/tips'))
+        requests = max(20, args.requests // rows)
+        report[f"tips_recent_{rows}"] = {
+            "before": await measure(before, '/tips', requests, args.samples),
+            "after": await measure(after, '/tips', requests, args.samples),
+        }
+    assert same_json(await call(before, '/creator'), await call(after, '/creator'))
+    report["creator"] = {
+        "before": await measure(before, '/creator', args.requests, args.samples),
+        "after": await measure(after, '/creator', args.requests, args.samples),
+    }
+    for result in report.values():
+        result["cpu_speedup"] = round(result["before"]["cpu_us"] / result["after"]["cpu_us"], 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--requests', type=int, default=5000, help="requests per measurement (scaled down by rows)")
+    parser.add_argument('--samples', type=int, default=20, help="requests traced for allocation")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
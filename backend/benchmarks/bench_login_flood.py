@@ -0,0 +1,103 @@
+"""
+Checkout latency before and during an admin login flood, with the login
+attempt guard at its defaults versus effectively disabled.
+
+Boots server:app against local PostgREST and Stripe stand-ins.
+
+Run from backend/:  python -m benchmarks.bench_login_flood --flood-concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import bcrypt
+import httpx
+
+from benchmarks.stand_ins import FakePostgREST, FakeStripe, run_backend, serve
+
+ADMIN_EMAIL = "admin@example.com"
+
+
+def summarize(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+async def checkouts(client: httpx.AsyncClient, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.post('/api/checkout/session', json={
+            "amount": 5.0, "tipper_name": "bench", "origin_url": "https://tips.test"
+        })
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def flood(client: httpx.AsyncClient, concurrency: int, stop: asyncio.Event) -> dict:
+    statuses = {}
+
+    async def attacker():
+        while not stop.is_set():
+            email = ADMIN_EMAIL if random.random() < 0.5 else f"user{random.randrange(10**6)}@example.com"
+            ip = f"10.{random.randrange(4)}.0.{random.randrange(4)}"
+            response = await client.post('/api/admin/login', json={"email": email, "password": "guess"},
+                                         headers={"X-Forwarded-For": ip})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(attacker() for _ in range(concurrency)))
+    return statuses
+
+
+async def scenario(url: str, samples: int, concurrency: int) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        baseline = await checkouts(client, samples)
+        stop = asyncio.Event()
+        attack = asyncio.create_task(flood(client, concurrency, stop))
+        await asyncio.sleep(1)
+        during = await checkouts(client, samples)
+        stop.set()
+        statuses = await attack
+    return {"baseline": summarize(baseline), "during_flood": summarize(during), "login_statuses": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--flood-concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    postgrest = FakePostgREST()
+    postgrest.seed('admin_users', [{
+        "id": 1,
+        "email": ADMIN_EMAIL,
+        "hashed_password": bcrypt.hashpw(b"correct horse", bcrypt.gensalt()).decode(),
+    }])
+
+    results = {}
+    with serve(postgrest.app) as supabase_url, serve(FakeStripe().app) as stripe_url:
+        env = {
+            "SUPABASE_URL": supabase_url,
+            "SUPABASE_SERVICE_KEY": "bench-service-key",
+            "STRIPE_API_KEY": "sk_test_bench",
+            "STRIPE_API_BASE": stripe_url,
+        }
+        for name, limits in (
+            ("guarded", {}),
+            ("unguarded", {"ADMIN_LOGIN_IP_LIMIT": "1000000", "ADMIN_LOGIN_EMAIL_LIMIT": "1000000"}),
+        ):
+            with run_backend({**env, **limits}) as url:
+                results[name] = asyncio.run(scenario(url, args.samples, args.flood_concurrency))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
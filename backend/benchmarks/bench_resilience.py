@@ -0,0 +1,133 @@
+"""
+Behaviour of the read paths while Supabase is degraded, with the circuit
+breaker on and (effectively) off.
+
+Each variant boots the backend against the PostgREST and Stripe stand-ins,
+warms the creator profile, then degrades the PostgREST stand-in through
+``POST /test/faults`` (slow: every request takes ``--outage-latency-ms``;
+errors: every request fails) and fires creator-profile reads and
+checkout-status polls at ``--concurrency``. Reported per route: latency
+percentiles and status codes; plus the breaker state read from /metrics.
+
+Run from backend/:  python -m benchmarks.bench_resilience --requests 400 --mode slow
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import Counter
+from typing import List
+
+import httpx
+
+from benchmarks.stand_ins import FakePostgREST, FakeStripe, metric, percentile, run_backend, serve
+
+
+def seed(supabase: FakePostgREST, stripe: FakeStripe, count: int) -> List[str]:
+    supabase.seed('creator_profile', [{
+        "id": 1, "name": "Stork", "bio": "Clips", "avatar_url": None,
+        "social_links": {}, "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+    }])
+    session_ids = []
+    for n in range(count):
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        stripe.sessions[session_id] = {
+            "id": session_id, "object": "checkout.session", "url": "", "amount_total": 500,
+            "currency": "usd", "status": "open", "payment_status": "unpaid", "metadata": {},
+        }
+        supabase.seed('payment_transactions', [{
+            "id": str(uuid.uuid4()), "session_id": session_id, "amount": 5.0, "currency": "usd",
+            "message": "", "tipper_name": f"fan-{n}", "status": "initiated",
+            "payment_status": "pending", "timestamp": "2024-01-01T00:00:00+00:00",
+        }])
+        session_ids.append(session_id)
+    return session_ids
+
+
+async def fire(client: httpx.AsyncClient, paths: List[str], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def one(path: str):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+
+    await asyncio.gather(*(one(path) for path in paths))
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "max_ms": round(latencies[-1], 2),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def outage(url: str, supabase_url: str, session_ids: List[str], args) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client, \
+            httpx.AsyncClient(base_url=supabase_url) as faults:
+        (await client.get('/api/creator')).raise_for_status()
+        # Let the cached profile go stale so reads reach the database
+        await asyncio.sleep(1.1)
+        if args.mode == 'slow':
+            await faults.post('/test/faults', json={"latency": args.outage_latency_ms / 1000})
+        else:
+            await faults.post('/test/faults', json={"error_rate": 1})
+        try:
+            creator = await fire(client, ['/api/creator'] * args.requests, args.concurrency)
+            status = await fire(
+                client, [f'/api/checkout/status/{sid}' for sid in session_ids], args.concurrency
+            )
+        finally:
+            await faults.post('/test/faults', json={"latency": 0, "error_rate": 0})
+        text = (await client.get('/metrics')).text
+    return {
+        "creator": creator,
+        "checkout_status": status,
+        "stale_fallbacks": metric(text, r'stale_fallbacks_total\{[^}]*\}'),
+        "circuit_opened": metric(text, r'upstream_circuit_opened_total\{service="supabase"\}'),
+        "circuit_rejected": metric(text, r'upstream_circuit_rejected_total\{service="supabase"\}'),
+    }
+
+
+def variant(supabase_url: str, stripe_url: str, session_ids: List[str], args, breaker: bool) -> dict:
+    env = {
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_SERVICE_KEY": "bench-service-key",
+        "STRIPE_API_KEY": "sk_test_bench",
+        "STRIPE_API_BASE": stripe_url,
+        "CREATOR_CACHE_TTL": "1",
+        "CIRCUIT_MIN_CALLS": "20" if breaker else str(10 ** 9),
+    }
+    with run_backend(env) as url:
+        return asyncio.run(outage(url, supabase_url, session_ids, args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--mode', choices=('slow', 'errors'), default='slow')
+    parser.add_argument('--outage-latency-ms', type=float, default=5000)
+    args = parser.parse_args()
+
+    supabase, stripe = FakePostgREST(), FakeStripe()
+    session_ids = seed(supabase, stripe, args.requests)
+    with serve(supabase.app) as supabase_url, serve(stripe.app) as stripe_url:
+        report = {
+            "mode": args.mode,
+            "requests_per_route": args.requests,
+            "breaker_off": variant(supabase_url, stripe_url, session_ids, args, breaker=False),
+            "breaker_on": variant(supabase_url, stripe_url, session_ids, args, breaker=True),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
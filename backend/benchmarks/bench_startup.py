@@ -0,0 +1,112 @@
+"""
+Cold-start cost of the backend: import time of ``server`` and time from
+process spawn to the first 200 response.
+
+The import is measured with ``python -X importtime`` in a clean environment
+without credentials, so it also checks that importing has no side effects.
+Exits non-zero when the median import time exceeds ``--import-budget-ms``,
+so the number can be tracked in CI.
+
+Run from backend/:  python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.stand_ins import BACKEND_DIR, FakePostgREST, run_backend, serve
+
+IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_profile() -> dict:
+    """Cumulative import time of server and its heaviest direct imports"""
+    env = {'PATH': os.environ.get('PATH', ''), 'PYTHONPATH': os.environ.get('PYTHONPATH', '')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import server'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing server failed:\n{result.stderr[-2000:]}")
+    # Children are printed before their parent, one indent level deeper
+    children = {}
+    total_us = None
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            if module == 'server':
+                total_us = cumulative
+                break
+            children = {}
+        elif indent == 3:
+            children[module] = cumulative
+    heaviest = sorted(children.items(), key=lambda item: item[1], reverse=True)[:8]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "heaviest_ms": {module: round(us / 1000, 1) for module, us in heaviest},
+    }
+
+
+def first_ok(client: httpx.Client, path: str, deadline: float) -> float:
+    while True:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"{path} never returned 200")
+        time.sleep(0.005)
+
+
+def time_to_first_200(env: dict) -> dict:
+    started = time.perf_counter()
+    with run_backend(env) as url, httpx.Client(base_url=url, timeout=10) as client:
+        deadline = started + 60
+        root = first_ok(client, '/api/', deadline)
+        creator = first_ok(client, '/api/creator', deadline)
+    return {
+        "root_ms": round((root - started) * 1000, 1),
+        "creator_ms": round((creator - started) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=600)
+    args = parser.parse_args()
+
+    imports = [import_profile() for _ in range(args.runs)]
+    import_ms = statistics.median(profile["total_ms"] for profile in imports)
+
+    postgrest = FakePostgREST()
+    postgrest.seed('creator_profile', [{"id": 1, "name": "Bench", "bio": "", "avatar_url": "", "social_links": {}}])
+    with serve(postgrest.app) as supabase_url:
+        env = {"SUPABASE_URL": supabase_url, "SUPABASE_SERVICE_KEY": "bench-service-key"}
+        startups = [time_to_first_200(env) for _ in range(args.runs)]
+
+    print(json.dumps({
+        "import_ms": import_ms,
+        "import_budget_ms": args.import_budget_ms,
+        "heaviest_imports_ms": imports[-1]["heaviest_ms"],
+        "first_200_ms": {
+            "root": statistics.median(run["root_ms"] for run in startups),
+            "creator": statistics.median(run["creator_ms"] for run in startups),
+        },
+    }, indent=2))
+    if import_ms > args.import_budget_ms:
+        sys.exit(f"import time {import_ms} ms is over the {args.import_budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
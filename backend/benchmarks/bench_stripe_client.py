@@ -0,0 +1,73 @@
+"""
+Per-checkout latency of a fresh Stripe HTTP client per request versus the
+shared keep-alive StripeClientPool, against a local TLS Stripe stand-in.
+
+Run from backend/:  python -m benchmarks.bench_stripe_client --checkouts 200
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+import stripe
+
+from benchmarks.stand_ins import FakeStripe, self_signed_cert, serve
+from services.stripe_service import StripeClientPool
+
+API_KEY = "sk_test_bench"
+
+CHECKOUT = {
+    "mode": "payment",
+    "success_url": "https://tips.test/success?session_id={CHECKOUT_SESSION_ID}",
+    "cancel_url": "https://tips.test",
+    "line_items": [{
+        "quantity": 1,
+        "price_data": {"currency": "usd", "unit_amount": 500, "product_data": {"name": "Tip"}},
+    }],
+    "metadata": {"source": "tipping_page"},
+}
+
+
+def measure(make_client, url: str, checkouts: int) -> dict:
+    latencies = []
+    for _ in range(checkouts):
+        start = time.perf_counter()
+        client = stripe.StripeClient(API_KEY, base_addresses={"api": url}, http_client=make_client())
+        session = client.v1.checkout.sessions.create(CHECKOUT)
+        client.v1.checkout.sessions.retrieve(session.id)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checkouts', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    fake = FakeStripe(latency=args.latency_ms / 1000)
+
+    with self_signed_cert() as (cert, key), serve(fake.app, tls=(cert, key)) as url:
+        stripe.ca_bundle_path = cert
+        pool = StripeClientPool(api_key=API_KEY)
+        pool.open()
+        # Before: every request built its own client, so every checkout
+        # opened a new connection and paid a full TLS handshake
+        before = measure(lambda: stripe.RequestsClient(session=requests.Session()), url, args.checkouts)
+        after = measure(lambda: pool.http_client, url, args.checkouts)
+
+    print(json.dumps({
+        "per_request_client": before,
+        "shared_pool": after,
+        "saved_per_checkout_ms": round(before["mean_ms"] - after["mean_ms"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
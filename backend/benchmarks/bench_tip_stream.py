@@ -0,0 +1,73 @@
+"""
+Fan-out cost and delivery latency of TipEventHub with thousands of
+concurrent subscribers, compared with the request load of 3-second polling.
+
+Run from backend/:  python -m benchmarks.bench_tip_stream --subscribers 5000 --events 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from events import TipEventHub
+
+
+async def run(subscribers: int, events: int, interval: float) -> dict:
+    hub = TipEventHub(max_queue=max(64, events))
+    delivery = []
+    done = asyncio.Event()
+    remaining = subscribers
+
+    async def consume():
+        nonlocal remaining
+        subscriber = hub.subscribe()
+        received = 0
+        while received < events:
+            event = await subscriber.queue.get()
+            delivery.append(time.perf_counter() - json.loads(event.data)["sent_at"])
+            received += 1
+        hub.unsubscribe(subscriber)
+        remaining -= 1
+        if remaining == 0:
+            done.set()
+
+    tasks = [asyncio.create_task(consume()) for _ in range(subscribers)]
+    await asyncio.sleep(0)
+
+    publish = []
+    start = time.perf_counter()
+    for _ in range(events):
+        sent_at = time.perf_counter()
+        hub.publish({"amount": 5.0, "message": "gg", "tipper_name": "bench", "sent_at": sent_at})
+        publish.append(time.perf_counter() - sent_at)
+        await asyncio.sleep(interval)
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*tasks)
+
+    delivery.sort()
+    return {
+        "subscribers": subscribers,
+        "events": events,
+        "deliveries": len(delivery),
+        "publish_fanout_ms_p50": round(statistics.median(publish) * 1000, 3),
+        "delivery_ms_p50": round(statistics.median(delivery) * 1000, 2),
+        "delivery_ms_p99": round(delivery[int(len(delivery) * 0.99) - 1] * 1000, 2),
+        "deliveries_per_sec": round(len(delivery) / elapsed),
+        # What the same overlays cost with 3 s polling of /tips/recent
+        "polling_db_queries_per_min": subscribers * 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=50)
+    parser.add_argument('--interval-ms', type=float, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.subscribers, args.events, args.interval_ms / 1000)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Per-page cost of /tips/recent at shallow and deep positions: keyset cursors
+versus the OFFSET paging they replace.
+
+The in-memory PostgREST stand-in has no indexes, so by default the page
+queries run against SQLite with the same table and timestamp index as
+setup_supabase.py, using the exact filter shape TransactionRepository sends
+(``timestamp <= t AND (timestamp < t OR (timestamp = t AND id < i))``,
+newest first). The query plan is printed to show the index range scan.
+
+With ``--supabase-url`` / ``--supabase-key`` (e.g. a local ``supabase start``
+stack) the backend is started against it instead and the API itself is
+walked by following X-Next-Cursor, timing the pages at each depth.
+
+Run from backend/:  python -m benchmarks.bench_tips_pagination --rows 120000
+"""
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.stand_ins import run_backend
+
+SCHEMA = """
+CREATE TABLE payment_transactions (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL UNIQUE,
+    amount REAL NOT NULL,
+    message TEXT,
+    tipper_name TEXT,
+    payment_status TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX idx_payment_transactions_timestamp ON payment_transactions(timestamp DESC);
+"""
+COLUMNS = "id, amount, message, tipper_name, timestamp"
+KEYSET = (
+    f"SELECT {COLUMNS} FROM payment_transactions WHERE payment_status = 'paid' "
+    "AND timestamp <= :ts AND (timestamp < :ts OR (timestamp = :ts AND id < :id)) "
+    "ORDER BY timestamp DESC, id DESC LIMIT :limit"
+)
+OFFSET = (
+    f"SELECT {COLUMNS} FROM payment_transactions WHERE payment_status = 'paid' "
+    "ORDER BY timestamp DESC, id DESC LIMIT :limit OFFSET :offset"
+)
+
+
+def synthetic_rows(count: int):
+    """Mostly paid tips a second apart, with some timestamp ties"""
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for n in range(count):
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "session_id": f"cs_bench_{n}",
+            "amount": float(rng.choice([5, 10, 25, 50, 100])),
+            "message": "thanks!",
+            "tipper_name": f"fan-{n}",
+            "payment_status": "paid" if rng.random() < 0.9 else "initiated",
+            "timestamp": (now - timedelta(seconds=n - n % 4)).isoformat(),
+        }
+
+
+def timed(run, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def bench_sqlite(args) -> dict:
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO payment_transactions VALUES (:id, :session_id, :amount, :message, :tipper_name, :payment_status, :timestamp)",
+        synthetic_rows(args.rows),
+    )
+    conn.execute("ANALYZE")
+
+    results = {}
+    for depth in args.depths:
+        # The last row a client at this depth has seen is its cursor
+        last = conn.execute(OFFSET, {"limit": 1, "offset": depth - 1}).fetchone()
+        ts, row_id = last[4], last[0]
+        keyset = {"ts": ts, "id": row_id, "limit": args.limit}
+        offset = {"limit": args.limit, "offset": depth}
+        assert conn.execute(KEYSET, keyset).fetchall() == conn.execute(OFFSET, offset).fetchall()
+        results[depth] = {
+            "keyset_ms": timed(lambda: conn.execute(KEYSET, keyset).fetchall(), args.repeat),
+            "offset_ms": timed(lambda: conn.execute(OFFSET, offset).fetchall(), args.repeat),
+        }
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + KEYSET, keyset)]
+    return {"engine": "sqlite", "rows": args.rows, "limit": args.limit, "depths": results, "keyset_plan": plan}
+
+
+def seed_supabase(url: str, key: str, rows: int):
+    headers = {"apiKey": key, "Authorization": f"Bearer {key}", "Prefer": "resolution=ignore-duplicates"}
+    batch = []
+    with httpx.Client(base_url=f"{url.rstrip('/')}/rest/v1", headers=headers, timeout=60) as client:
+        for row in synthetic_rows(rows):
+            batch.append(row)
+            if len(batch) == 1000:
+                client.post('/payment_transactions', params={"on_conflict": "session_id"}, json=batch).raise_for_status()
+                batch = []
+        if batch:
+            client.post('/payment_transactions', params={"on_conflict": "session_id"}, json=batch).raise_for_status()
+
+
+def bench_api(args) -> dict:
+    if not args.no_seed:
+        seed_supabase(args.supabase_url, args.supabase_key, args.rows)
+    env = {"SUPABASE_URL": args.supabase_url, "SUPABASE_SERVICE_KEY": args.supabase_key}
+    pages = {}
+    with run_backend(env) as url, httpx.Client(base_url=url, timeout=30) as client:
+        depth, cursor = 0, None
+        while depth <= max(args.depths):
+            params = {"limit": args.limit, **({"cursor": cursor} if cursor else {})}
+            started = time.perf_counter()
+            response = client.get('/api/tips/recent', params=params)
+            elapsed = (time.perf_counter() - started) * 1000
+            response.raise_for_status()
+            pages[depth] = elapsed
+            depth += len(response.json())
+            cursor = response.headers.get('x-next-cursor')
+            if cursor is None:
+                break
+
+    def around(target: int) -> float:
+        # Median of the pages nearest the target depth, to smooth out noise
+        nearest = sorted(pages, key=lambda d: abs(d - target))[:args.repeat]
+        return round(statistics.median(pages[d] for d in nearest), 3)
+
+    return {
+        "engine": "api",
+        "rows": args.rows,
+        "limit": args.limit,
+        "pages_walked": len(pages),
+        "depths": {depth: {"keyset_ms": around(depth)} for depth in args.depths if depth <= max(pages)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=120_000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--depths', type=int, nargs='+', default=[10, 100_000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--supabase-url', help="run against this Supabase instead of SQLite")
+    parser.add_argument('--supabase-key', default="")
+    parser.add_argument('--no-seed', action='store_true', help="the Supabase table is already populated")
+    args = parser.parse_args()
+
+    report = bench_api(args) if args.supabase_url else bench_sqlite(args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
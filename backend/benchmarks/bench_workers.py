@@ -0,0 +1,71 @@
+"""
+Throughput of the read-heavy traffic mix with 1..N uvicorn workers, and
+whether a profile update is visible on every worker straight away.
+
+Each run boots server:app with the given worker count against the local
+stand-ins and drives the load_test page view / overlay mix. After the load,
+the creator profile is updated once and read back over fresh connections
+(which the kernel spreads across workers) to count stale answers.
+
+Run from backend/:  python -m benchmarks.bench_workers --max-workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from benchmarks.load_test import drive, parse_mix, seed_postgrest
+from benchmarks.stand_ins import FakePostgREST, FakeStripe, run_backend, serve
+
+
+def propagation(url: str, reads: int) -> dict:
+    name = f"Creator {time.time_ns()}"
+    with httpx.Client(base_url=url) as client:
+        client.post('/api/creator', json={"name": name}).raise_for_status()
+    updated_at = time.perf_counter()
+    stale = 0
+    for _ in range(reads):
+        with httpx.Client(base_url=url) as client:
+            if client.get('/api/creator').json()["name"] != name:
+                stale += 1
+    return {"stale_reads": stale, "reads": reads, "read_window_ms": round((time.perf_counter() - updated_at) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--supabase-latency', type=float, default=20, help="injected PostgREST latency (ms)")
+    parser.add_argument('--reads', type=int, default=50, help="fresh-connection reads after the update")
+    args = parser.parse_args()
+
+    load = SimpleNamespace(
+        users=args.users, duration=args.duration, warmup=3, mix=parse_mix("page_view=70,overlay=30"),
+        think_time=0.0, poll_interval=0.25, seed="bench-workers",
+    )
+    postgrest = FakePostgREST(latency=args.supabase_latency / 1000)
+    seed_postgrest(postgrest, 200)
+
+    results = {}
+    with serve(postgrest.app) as supabase_url, serve(FakeStripe().app) as stripe_url:
+        env = {
+            "SUPABASE_URL": supabase_url,
+            "SUPABASE_SERVICE_KEY": "bench-service-key",
+            "STRIPE_API_KEY": "sk_test_bench",
+            "STRIPE_API_BASE": stripe_url,
+        }
+        for workers in range(1, args.max_workers + 1):
+            with run_backend(env, workers=workers) as url:
+                report = asyncio.run(drive(url, stripe_url, load))
+                results[workers] = {**report["total"], "propagation": propagation(url, args.reads)}
+
+    print(json.dumps({"cpus": os.cpu_count(), "users": args.users, "workers": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
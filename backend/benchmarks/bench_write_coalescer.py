@@ -0,0 +1,89 @@
+"""
+Throughput of per-row payment_transactions writes versus the
+TransactionWriteCoalescer, against a local PostgREST stand-in.
+
+Each simulated tip inserts an initiated row and then flips it to paid.
+
+Run from backend/:  python -m benchmarks.bench_write_coalescer --tips 1000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from benchmarks.stand_ins import FakePostgREST, serve
+from database import Database, TransactionRepository
+
+KEY = "bench-service-key"
+
+
+def transaction(session_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "amount": 5.0,
+        "currency": "usd",
+        "message": None,
+        "tipper_name": "bench",
+        "status": "initiated",
+        "payment_status": "pending",
+        "timestamp": "2026-01-01T00:00:00+00:00",
+    }
+
+
+async def drive(tip, tips: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await tip(f"cs_bench_{uuid.uuid4().hex[:12]}_{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(tips)))
+    return time.perf_counter() - start
+
+
+async def run(url: str, tips: int, concurrency: int) -> dict:
+    db = Database(url, KEY, pool_size=concurrency, keepalive=concurrency)
+    transactions = TransactionRepository(db)
+    table = 'payment_transactions'
+
+    async def per_row(session_id: str):
+        await db.execute(db.table(table).insert(transaction(session_id)))
+        await db.execute(db.table(table).update({
+            "status": "complete", "payment_status": "paid"
+        }).eq('session_id', session_id).neq('payment_status', 'paid'))
+
+    async def coalesced(session_id: str):
+        await transactions.create(transaction(session_id))
+        assert await transactions.mark_paid(session_id, "complete") is not None
+
+    before = await drive(per_row, tips, concurrency)
+    after = await drive(coalesced, tips, concurrency)
+    await db.close()
+    return {
+        "per_row": {"tips_per_sec": round(tips / before, 1), "round_trips": tips * 2},
+        "coalesced": {
+            "tips_per_sec": round(tips / after, 1),
+            "round_trips": transactions.writes.requests,
+            "rows_per_flush": round(transactions.writes.rows_flushed / max(transactions.writes.flushes, 1), 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tips', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    fake = FakePostgREST(latency=args.latency_ms / 1000)
+    with serve(fake.app) as url:
+        results = asyncio.run(run(url, args.tips, args.concurrency))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Concurrent load test of the tipping API against local stand-ins.
+
+Boots server:app against in-process PostgREST, Stripe and Resend stand-ins
+(each with configurable injected latency) and drives a weighted mix of user
+flows from a pool of virtual users. Reports requests/s and p50/p95/p99 per
+route as JSON. Flow choice is seeded, so runs on the same machine are
+comparable across commits.
+
+Flows:
+  page_view  GET /api/creator (revalidated with If-None-Match on repeat
+             visits) + GET /api/tips/recent?limit=5, as HomePage does
+  overlay    GET /api/tips/recent?limit=1, an alerts overlay polling
+  checkout   POST /api/checkout/session, payment at Stripe, a signed
+             checkout.session.completed webhook, and the success page
+             polling GET /api/checkout/status/{id} until it reads paid
+
+Run from backend/:  python -m benchmarks.load_test --users 50 --duration 30 --out load.json
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import subprocess
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.stand_ins import BACKEND_DIR, FakePostgREST, FakeResend, FakeStripe, percentile, run_backend, serve
+
+FLOWS = ("page_view", "overlay", "checkout")
+DEFAULT_MIX = "page_view=60,overlay=25,checkout=15"
+WEBHOOK_SECRET = "whsec_load_test"
+SUCCESS_PAGE_POLLS = 5
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r}; choose from {', '.join(FLOWS)}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def sign_webhook(payload: bytes, secret: str) -> str:
+    timestamp = int(time.time())
+    signed = f"{timestamp}.".encode() + payload
+    return f"t={timestamp},v1={hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()}"
+
+
+class Recorder:
+    """Per-route latencies and status codes, only while ``measuring``"""
+
+    def __init__(self):
+        self.measuring = False
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+        self.failures: Dict[str, int] = {}
+        self.flows: Dict[str, int] = {}
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            if self.measuring:
+                self.failures[route] = self.failures.get(route, 0) + 1
+            return None
+        if self.measuring:
+            self.latencies.setdefault(route, []).append(time.perf_counter() - start)
+            statuses = self.statuses.setdefault(route, {})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route in sorted(set(self.latencies) | set(self.failures)):
+            ordered = sorted(self.latencies.get(route, []))
+            routes[route] = {
+                "requests": len(ordered),
+                "rps": round(len(ordered) / elapsed, 1),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+                "statuses": {str(code): count for code, count in sorted(self.statuses.get(route, {}).items())},
+                "transport_errors": self.failures.get(route, 0),
+            }
+        everything = sorted(latency for latencies in self.latencies.values() for latency in latencies)
+        return {
+            "total": {
+                "requests": len(everything),
+                "rps": round(len(everything) / elapsed, 1),
+                "p50_ms": round(percentile(everything, 0.50) * 1000, 2) if everything else None,
+                "p95_ms": round(percentile(everything, 0.95) * 1000, 2) if everything else None,
+                "p99_ms": round(percentile(everything, 0.99) * 1000, 2) if everything else None,
+            },
+            "flows": dict(sorted(self.flows.items())),
+            "routes": routes,
+        }
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, stripe: httpx.AsyncClient, recorder: Recorder,
+                 rng: random.Random, poll_interval: float):
+        self.client = client
+        self.stripe = stripe
+        self.recorder = recorder
+        self.rng = rng
+        self.poll_interval = poll_interval
+        self.creator_etag: Optional[str] = None
+
+    async def page_view(self):
+        headers = {"If-None-Match": self.creator_etag} if self.creator_etag else {}
+        response = await self.recorder.request(self.client, "GET /api/creator", "GET", "/api/creator", headers=headers)
+        if response is not None and response.headers.get("etag"):
+            self.creator_etag = response.headers["etag"]
+        await self.recorder.request(self.client, "GET /api/tips/recent", "GET", "/api/tips/recent", params={"limit": 5})
+
+    async def overlay(self):
+        await self.recorder.request(self.client, "GET /api/tips/recent", "GET", "/api/tips/recent", params={"limit": 1})
+
+    async def checkout(self):
+        response = await self.recorder.request(
+            self.client, "POST /api/checkout/session", "POST", "/api/checkout/session",
+            json={
+                "amount": self.rng.choice([5, 10, 25, 50, 100]),
+                "message": "load test",
+                "tipper_name": f"visitor-{self.rng.randrange(1000)}",
+                "origin_url": "https://tips.test",
+            },
+        )
+        if response is None or response.status_code != 200:
+            return
+        session_id = response.json()["session_id"]
+
+        # The visitor pays; Stripe notifies us while the browser lands on /success
+        await self.stripe.post(f"/test/checkout/sessions/{session_id}/pay")
+        payload = json.dumps({
+            "id": f"evt_{uuid.uuid4().hex}",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": session_id, "object": "checkout.session", "payment_status": "paid"}},
+        }).encode()
+        webhook = self.recorder.request(
+            self.client, "POST /api/webhook/stripe", "POST", "/api/webhook/stripe",
+            content=payload, headers={"Stripe-Signature": sign_webhook(payload, WEBHOOK_SECRET)},
+        )
+        await asyncio.gather(webhook, self.success_page(session_id))
+
+    async def success_page(self, session_id: str):
+        for _ in range(SUCCESS_PAGE_POLLS + 1):
+            response = await self.recorder.request(
+                self.client, "GET /api/checkout/status/{session_id}", "GET", f"/api/checkout/status/{session_id}"
+            )
+            if response is None or response.status_code != 200 or response.json().get("payment_status") == "paid":
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self, mix: Dict[str, int], stop: asyncio.Event, think_time: float):
+        names, weights = list(mix), list(mix.values())
+        while not stop.is_set():
+            flow = self.rng.choices(names, weights)[0]
+            await getattr(self, flow)()
+            if self.recorder.measuring:
+                self.recorder.flows[flow] = self.recorder.flows.get(flow, 0) + 1
+            if think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+
+
+
+async def drive(url: str, stripe_url: str, args) -> dict:
+    recorder = Recorder()
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as client, \
+            httpx.AsyncClient(base_url=stripe_url, timeout=30) as stripe:
+        users = [
+            VirtualUser(client, stripe, recorder, random.Random(f"{args.seed}-{n}"), args.poll_interval)
+            for n in range(args.users)
+        ]
+        tasks = [asyncio.create_task(user.run(args.mix, stop, args.think_time)) for user in users]
+        await asyncio.sleep(args.warmup)
+        recorder.measuring = True
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        recorder.measuring = False
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*tasks)
+    return recorder.report(elapsed)
+
+
+def seed_postgrest(postgrest: FakePostgREST, tips: int):
+    postgrest.seed('creator_profile', [{
+        "id": 1,
+        "name": "Load Test Creator",
+        "bio": "Support me with a tip!",
+        "avatar_url": "https://images.test/avatar.png",
+        "social_links": {"twitter": "https://twitter.test/creator"},
+    }])
+    now = datetime.now(timezone.utc)
+    rng = random.Random(0)
+    postgrest.seed('payment_transactions', [{
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "session_id": f"cs_test_seed_{n}",
+        "amount": float(rng.choice([5, 10, 25, 50, 100])),
+        "currency": "usd",
+        "message": "thanks!",
+        "tipper_name": f"fan-{n}",
+        "status": "completed",
+        "payment_status": "paid",
+        "timestamp": (now - timedelta(minutes=n)).isoformat(),
+    } for n in range(tips)])
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help="concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=30, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=5, help="unmeasured seconds before measuring")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"flow weights (default {DEFAULT_MIX})")
+    parser.add_argument('--think-time', type=float, default=0.0, help="mean pause between flows per user (s)")
+    parser.add_argument('--poll-interval', type=float, default=0.25, help="success page poll interval (s)")
+    parser.add_argument('--supabase-latency', type=float, default=20, help="injected PostgREST latency (ms)")
+    parser.add_argument('--stripe-latency', type=float, default=150, help="injected Stripe latency (ms)")
+    parser.add_argument('--resend-latency', type=float, default=100, help="injected Resend latency (ms)")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--tips', type=int, default=200, help="paid tips seeded into the database")
+    parser.add_argument('--seed', default="load-test", help="random seed for flow selection")
+    parser.add_argument('--out', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    postgrest = FakePostgREST(latency=args.supabase_latency / 1000)
+    seed_postgrest(postgrest, args.tips)
+
+    with serve(postgrest.app) as supabase_url, \
+            serve(FakeStripe(latency=args.stripe_latency / 1000).app) as stripe_url, \
+            serve(FakeResend(latency=args.resend_latency / 1000).app) as resend_url:
+        env = {
+            "SUPABASE_URL": supabase_url,
+            "SUPABASE_SERVICE_KEY": "load-test-service-key",
+            "STRIPE_API_KEY": "sk_test_load",
+            "STRIPE_API_BASE": stripe_url,
+            "STRIPE_WEBHOOK_SECRET": WEBHOOK_SECRET,
+            "RESEND_API_KEY": "re_load_test",
+            "RESEND_API_URL": resend_url,
+        }
+        with run_backend(env, workers=args.workers) as url:
+            results = asyncio.run(drive(url, stripe_url, args))
+
+    report = {
+        "revision": git_revision(),
+        "config": {
+            "users": args.users,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "think_time_s": args.think_time,
+            "poll_interval_s": args.poll_interval,
+            "latency_ms": {
+                "supabase": args.supabase_latency,
+                "stripe": args.stripe_latency,
+                "resend": args.resend_latency,
+            },
+            "workers": args.workers,
+            "seeded_tips": args.tips,
+            "seed": args.seed,
+        },
+        **results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+"""
+Local stand-ins for the upstream services used by the backend benchmarks.
+
+FakePostgREST implements the small subset of the PostgREST API that the
+supabase client issues from this codebase (filters including or/and, order,
+limit, insert, update, and the RPC functions in supabase_functions.sql)
+against in-memory tables. FakeStripe implements the
+Checkout Session endpoints and FakeResend the send-email endpoint. All
+support configurable injected latency; FakePostgREST and FakeStripe can also
+fail a share of requests, and both settings can be changed while serving
+with ``POST /test/faults``.
+"""
+import asyncio
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+def _instant(value):
+    """Timestamps compare as instants, whatever offset they were written with"""
+    if isinstance(value, str) and len(value) >= 19 and value[10:11] == 'T':
+        try:
+            return datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+    return value
+
+
+def _matches(value, op: str, arg: str) -> bool:
+    if op == 'is':
+        return value is None if arg == 'null' else str(value).lower() == arg
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        value = str(value).lower()
+    if op == 'in':
+        return str(value) in [v.strip('"') for v in arg.strip('()').split(',')]
+    if isinstance(value, (int, float)):
+        if op in ('eq', 'neq'):
+            value = str(value)
+        else:
+            arg = float(arg)
+    else:
+        value, arg = _instant(str(value)), _instant(arg)
+    if op == 'eq':
+        return value == arg
+    if op == 'neq':
+        return value != arg
+    return {
+        'lt': value < arg,
+        'lte': value <= arg,
+        'gt': value > arg,
+        'gte': value >= arg,
+    }[op]
+
+
+def _split(terms: str) -> List[str]:
+    """Split a logical filter body on top-level commas, honouring quotes"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for i, char in enumerate(terms):
+        if char == '"' and (i == 0 or terms[i - 1] != '\\'):
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    return parts + [current]
+
+
+def _condition(row: dict, term: str) -> bool:
+    """One term of an or=(...) / and=(...) filter, e.g. ``id.lt."abc"``"""
+    for logic, combine in (('or(', any), ('and(', all)):
+        if term.startswith(logic):
+            return combine(_condition(row, part) for part in _split(term[len(logic):-1]))
+    column, op, arg = term.split('.', 2)
+    negate = op == 'not'
+    if negate:
+        op, arg = arg.split('.', 1)
+    if arg.startswith('"') and arg.endswith('"'):
+        arg = arg[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return _matches(row.get(column), op, arg) != negate
+
+
+async def _set_faults(self, request: Request) -> Response:
+    """Change ``latency`` and ``error_rate`` of a running stand-in"""
+    changes = json.loads(await request.body())
+    for name in ('latency', 'error_rate'):
+        if name in changes:
+            setattr(self, name, float(changes[name]))
+    return Response(json.dumps({"latency": self.latency, "error_rate": self.error_rate}),
+                    media_type='application/json')
+
+
+class FakePostgREST:
+    """In-memory PostgREST with per-request latency injection.
+
+    ``missing_columns`` maps a table to columns it lacks, to act like a
+    database a migration hasn't reached: requests naming them are refused
+    the way PostgREST refuses them.
+    """
+
+    RESERVED = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 missing_columns: Optional[Dict[str, List[str]]] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.missing_columns = missing_columns or {}
+        self.tables: Dict[str, List[dict]] = {}
+        self.requests = 0
+        self.app = Starlette(routes=[
+            Route('/test/faults', self.set_faults, methods=['POST']),
+            Route('/rest/v1/rpc/{function}', self.rpc, methods=['POST']),
+            Route('/rest/v1/{table}', self.handle, methods=['GET', 'POST', 'PATCH', 'DELETE']),
+        ])
+        self.functions = {
+            'update_creator_profile': self._update_creator_profile,
+            'change_password_with_token': self._change_password_with_token,
+        }
+
+    def seed(self, table: str, rows: List[dict]):
+        self.tables.setdefault(table, []).extend(rows)
+
+    def _filter(self, rows: List[dict], params) -> List[dict]:
+        for key, raw in params.multi_items():
+            if key in ('or', 'and'):
+                rows = [r for r in rows if _condition(r, f"{key}{raw}")]
+                continue
+            if key in self.RESERVED or '.' not in raw:
+                continue
+            op, arg = raw.split('.', 1)
+            negate = op == 'not'
+            if negate:
+                op, arg = arg.split('.', 1)
+            rows = [r for r in rows if _matches(r.get(key), op, arg) != negate]
+        return rows
+
+    def _project(self, rows: List[dict], select: str) -> List[dict]:
+        columns = [c.strip() for c in select.split(',') if '(' not in c]
+        if not columns or '*' in columns:
+            return [dict(r) for r in rows]
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+    set_faults = _set_faults
+
+    async def _delay(self) -> Optional[Response]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return self._error("PGRST000", "Could not connect with the database", 503)
+        return None
+
+    async def handle(self, request: Request) -> Response:
+        fault = await self._delay()
+        if fault is not None:
+            return fault
+
+        name = request.path_params['table']
+        table = self.tables.setdefault(name, [])
+        params = request.query_params
+        missing = set(self.missing_columns.get(name, ()))
+
+        unknown = missing & ({key for key in params if key not in self.RESERVED} | {params.get('on_conflict')})
+        if unknown:
+            return self._error("42703", f"column {name}.{min(unknown)} does not exist", 400)
+
+        if request.method == 'POST':
+            payload = json.loads(await request.body())
+            rows = payload if isinstance(payload, list) else [payload]
+            unknown = missing & {key for row in rows for key in row}
+            if unknown:
+                return self._error("PGRST204", (
+                    f"Could not find the '{min(unknown)}' column of '{name}' in the schema cache"), 400)
+            conflict = params.get('on_conflict')
+            ignore = 'ignore-duplicates' in request.headers.get('prefer', '')
+            created = []
+            for row in rows:
+                existing = next((r for r in table if conflict and r.get(conflict) == row.get(conflict)), None)
+                if existing is not None:
+                    if not ignore:
+                        existing.update(row)
+                        created.append(existing)
+                else:
+                    table.append(dict(row))
+                    created.append(row)
+            return self._json(created, 201)
+
+        rows = self._filter(table, params)
+
+        if request.method == 'PATCH':
+            changes = json.loads(await request.body())
+            for row in rows:
+                row.update(changes)
+            return self._json(rows)
+
+        if request.method == 'DELETE':
+            for row in rows:
+                table.remove(row)
+            return self._json(rows)
+
+        for term in reversed(params.get('order', '').split(',')):
+            if term:
+                column, _, direction = term.partition('.')
+                rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)),
+                              reverse=direction.startswith('desc'))
+        offset = int(params.get('offset', 0))
+        if 'limit' in params:
+            rows = rows[offset:offset + int(params['limit'])]
+        return self._json(self._project(rows, params.get('select', '*')))
+
+    async def rpc(self, request: Request) -> Response:
+        fault = await self._delay()
+        if fault is not None:
+            return fault
+        function = self.functions.get(request.path_params['function'])
+        if function is None:
+            return self._error("PGRST202", "function not found", 404)
+        return self._json(function(**json.loads(await request.body())))
+
+    def _update_creator_profile(self, patch: dict) -> List[dict]:
+        table = self.tables.setdefault('creator_profile', [])
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        if not table:
+            table.append({
+                "id": 1,
+                "name": "Your Creator Name",
+                "bio": "Support me with a tip!",
+                "avatar_url": "https://images.unsplash.com/photo-1535713875002-d1d0cf377fde?w=400",
+                "social_links": {},
+                "created_at": now,
+            })
+        profile = min(table, key=lambda row: row['id'])
+        profile.update({key: value for key, value in patch.items() if value is not None}, updated_at=now)
+        return [dict(profile)]
+
+    def _change_password_with_token(self, p_token: str, p_hashed_password: str) -> List[dict]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        claimed = next((
+            row for row in self.tables.get('password_change_tokens', [])
+            if row['token'] == p_token and not row.get('used') and _instant(row['expires_at']) > now
+        ), None)
+        if claimed is None:
+            return []
+        claimed['used'] = True
+        for admin in self.tables.get('admin_users', []):
+            if admin['id'] == claimed['admin_id']:
+                admin.update(hashed_password=p_hashed_password, updated_at=now.isoformat())
+                return [{"id": admin['id'], "email": admin['email']}]
+        return []
+
+    @staticmethod
+    def _json(rows, status_code: int = 200) -> Response:
+        return Response(json.dumps(rows, default=str), status_code, media_type='application/json')
+
+    @classmethod
+    def _error(cls, code: str, message: str, status_code: int) -> Response:
+        # PostgREST always sends all four keys; postgrest-py needs them
+        return cls._json({"code": code, "message": message, "details": None, "hint": None}, status_code)
+
+
+class FakeStripe:
+    """Checkout Session endpoints of the Stripe API, backed by a dict"""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sessions: Dict[str, dict] = {}
+        # Idempotency-Key -> session created for it, replayed like Stripe does
+        self.idempotent: Dict[str, str] = {}
+        self.requests = 0
+        self.app = Starlette(routes=[
+            Route('/v1/checkout/sessions', self.create_session, methods=['POST']),
+            Route('/v1/checkout/sessions/{session_id}', self.get_session, methods=['GET']),
+            # Not part of Stripe: let tests complete or expire a session, or inject faults
+            Route('/test/faults', self.set_faults, methods=['POST']),
+            Route('/test/checkout/sessions/{session_id}/pay', self.pay_session, methods=['POST']),
+            Route('/test/checkout/sessions/{session_id}/expire', self.expire_session, methods=['POST']),
+        ])
+
+    set_faults = _set_faults
+
+    async def _delay(self) -> Optional[Response]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            error = {"error": {"type": "api_error", "message": "Injected failure"}}
+            return Response(json.dumps(error), 500, media_type='application/json')
+        return None
+
+    async def create_session(self, request: Request) -> Response:
+        fault = await self._delay()
+        if fault is not None:
+            return fault
+        key = request.headers.get('idempotency-key')
+        if key in self.idempotent:
+            return Response(json.dumps(self.sessions[self.idempotent[key]]), media_type='application/json')
+        form = dict(parse_qsl((await request.body()).decode()))
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        if key is not None:
+            self.idempotent[key] = session_id
+        amount = int(form.get('line_items[0][price_data][unit_amount]', 0))
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/c/pay/{session_id}",
+            "amount_total": amount,
+            "currency": form.get('line_items[0][price_data][currency]', 'usd'),
+            "status": "open",
+            "payment_status": "unpaid",
+            "expires_at": int(time.time()) + 86400,
+            "metadata": {k[9:-1]: v for k, v in form.items() if k.startswith('metadata[')},
+        }
+        self.sessions[session_id] = session
+        return Response(json.dumps(session), media_type='application/json')
+
+    async def get_session(self, request: Request) -> Response:
+        fault = await self._delay()
+        if fault is not None:
+            return fault
+        session = self.sessions.get(request.path_params['session_id'])
+        if session is None:
+            error = {"error": {"type": "invalid_request_error", "message": "No such checkout.session"}}
+            return Response(json.dumps(error), 404, media_type='application/json')
+        return Response(json.dumps(session), media_type='application/json')
+
+    async def pay_session(self, request: Request) -> Response:
+        session = self.sessions.get(request.path_params['session_id'])
+        if session is None:
+            return Response(status_code=404)
+        session.update(status="complete", payment_status="paid")
+        return Response(json.dumps(session), media_type='application/json')
+
+    async def expire_session(self, request: Request) -> Response:
+        session = self.sessions.get(request.path_params['session_id'])
+        if session is None:
+            return Response(status_code=404)
+        session.update(status="expired")
+        return Response(json.dumps(session), media_type='application/json')
+
+
+class FakeResend:
+    """The resend send-email endpoint; point RESEND_API_URL at it"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+        self.app = Starlette(routes=[Route('/emails', self.send, methods=['POST'])])
+
+    async def send(self, request: Request) -> Response:
+        self.sent += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        await request.body()
+        return Response(json.dumps({"id": str(uuid.uuid4())}), media_type='application/json')
+
+
+@contextmanager
+def self_signed_cert():
+    """Write a throwaway localhost certificate and key and yield their
+    paths; both are removed on exit"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName('localhost'),
+            x509.IPAddress(ipaddress.ip_address('127.0.0.1')),
+        ]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    with tempfile.TemporaryDirectory(prefix='stand-in-tls-') as directory:
+        cert_path, key_path = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+        with open(cert_path, 'wb') as f:
+            f.write(cert.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, 'wb') as f:
+            f.write(key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ))
+        yield cert_path, key_path
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(app, port: Optional[int] = None, tls: Optional[Tuple[str, str]] = None):
+    """Run an ASGI app in a forked child process and yield its base URL.
+
+    Pass ``tls=`` the paths from ``self_signed_cert()`` to serve HTTPS
+    with that certificate.
+    """
+    port = port or free_port()
+    ssl_files = dict(zip(('ssl_certfile', 'ssl_keyfile'), tls)) if tls else {}
+    config = uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', lifespan='off', **ssl_files)
+    process = multiprocessing.get_context('fork').Process(target=uvicorn.Server(config).run, daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                process.terminate()
+                raise RuntimeError(f"stand-in on port {port} did not start")
+            time.sleep(0.01)
+    try:
+        yield f"{'https' if tls else 'http'}://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"nothing listening on port {port}")
+            time.sleep(0.02)
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@contextmanager
+def run_backend(env: Dict[str, str], port: Optional[int] = None, workers: int = 1):
+    """Start ``uvicorn server:app`` as a subprocess with extra environment.
+
+    Local state (queues, worker bus, server.log) goes to a temporary
+    directory that is removed when the backend stops.
+    """
+    port = port or free_port()
+    with tempfile.TemporaryDirectory(prefix='backend-state-') as state:
+        process_env = {
+            **os.environ,
+            'WEBHOOK_QUEUE_PATH': os.path.join(state, 'webhook_queue.db'),
+            'EMAIL_OUTBOX_PATH': os.path.join(state, 'email_outbox.db'),
+            'WORKER_BUS_DIR': os.path.join(state, 'bus'),
+            **env,
+        }
+        with open(os.path.join(state, 'server.log'), 'wb') as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'uvicorn', 'server:app', '--host', '127.0.0.1', '--port', str(port),
+                 '--workers', str(workers), '--log-level', 'warning'],
+                cwd=BACKEND_DIR, env=process_env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            try:
+                _wait_for_port(port)
+                yield f"http://127.0.0.1:{port}"
+            finally:
+                process.terminate()
+                process.wait()
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def metric(text: str, pattern: str) -> float:
+    """Sum of the samples in a /metrics page whose name and labels match ``pattern``"""
+    return sum(float(value) for value in re.findall(rf'^{pattern} (\S+)$', text, re.M))
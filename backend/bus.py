@@ -0,0 +1,106 @@
+"""
+Broadcast bus between the uvicorn worker processes on one host.
+
+Each worker binds a Unix datagram socket in a directory shared with its
+siblings; publishing sends one datagram to every other socket there. Local
+datagrams are never reordered, and sending to a worker that has exited fails
+at once, so its socket file is removed. Used to keep per-process caches and
+the live tip feed consistent when running more than one worker.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+from typing import Any, Callable, Dict, Optional
+
+MAX_MESSAGE = 64 * 1024
+
+
+def default_directory() -> str:
+    # Workers started by the same uvicorn/gunicorn master share its pid
+    return os.environ.get('WORKER_BUS_DIR') or os.path.join(tempfile.gettempdir(), f"tipping-bus-{os.getppid()}")
+
+
+class WorkerBus:
+    """Fire-and-forget messages to sibling workers, dispatched by ``kind``"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or default_directory()
+        self.handlers: Dict[str, Callable[[Any], None]] = {}
+        self.path: Optional[str] = None
+        self.sock: Optional[socket.socket] = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    def on(self, kind: str, handler: Callable[[Any], None]):
+        self.handlers[kind] = handler
+
+    def open(self):
+        """Bind this worker's socket and start reading from the event loop"""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self.sock.fileno(), self._read)
+
+    def _read(self):
+        while True:
+            try:
+                payload = self.sock.recv(MAX_MESSAGE)
+            except (BlockingIOError, InterruptedError):
+                return
+            self.received += 1
+            try:
+                message = json.loads(payload)
+                handler = self.handlers.get(message['kind'])
+                if handler is not None:
+                    handler(message['data'])
+            except Exception as e:
+                logging.error(f"Error handling worker bus message: {str(e)}")
+
+    def peers(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        return [entry.path for entry in entries if entry.name.endswith('.sock') and entry.path != self.path]
+
+    def publish(self, kind: str, data: Any):
+        """Send to every other worker; a no-op until ``open()``"""
+        if self.sock is None:
+            return
+        payload = json.dumps({'kind': kind, 'data': data}, default=str).encode('utf-8')
+        for peer in self.peers():
+            try:
+                self.sock.sendto(payload, peer)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker behind this socket is gone
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except (BlockingIOError, OSError) as e:
+                self.dropped += 1
+                logging.error(f"Worker bus message to {peer} dropped: {str(e)}")
+
+    def close(self):
+        if self.sock is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self.sock.fileno())
+        except RuntimeError:
+            pass
+        self.sock.close()
+        self.sock = None
+        try:
+            os.unlink(self.path)
+            os.rmdir(self.directory)
+        except OSError:
+            pass
@@ -0,0 +1,230 @@
+"""
+In-process caches for hot read endpoints.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import orjson
+
+
+class CachedResponse:
+    __slots__ = ('value', 'body', 'etag', 'expires_at')
+
+    def __init__(self, value: dict, ttl: float):
+        self.value = value
+        self.body = orjson.dumps(value)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """Read-through TTL cache of a single serialized JSON response.
+
+    Loads and writes both run under ``lock``, so a writer can swap in the new
+    value without a concurrent reader repopulating the cache with the old one.
+    An ``invalidate()`` that lands while a load is in flight (e.g. from
+    another worker) also discards that load's result.
+
+    ``last_good`` keeps the most recent value however old, to serve when a
+    load fails. After a failed load that value is also cached again for
+    ``RETRY_AFTER`` seconds, so requests queued behind the load don't each
+    retry it.
+    """
+
+    RETRY_AFTER = 5.0
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entry: Optional[CachedResponse] = None
+        self.last_good: Optional[CachedResponse] = None
+        self.lock = asyncio.Lock()
+        self.generation = 0
+
+    def fresh(self) -> Optional[CachedResponse]:
+        entry = self.entry
+        if entry is not None and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def set(self, value: dict) -> CachedResponse:
+        self.entry = self.last_good = CachedResponse(value, self.ttl)
+        return self.entry
+
+    def invalidate(self):
+        self.entry = None
+        self.generation += 1
+
+    async def get_or_load(self, loader: Callable[[], Awaitable[dict]]) -> CachedResponse:
+        entry = self.fresh()
+        if entry is not None:
+            return entry
+        async with self.lock:
+            # Another request may have loaded it while we waited
+            entry = self.fresh()
+            if entry is not None:
+                return entry
+            generation = self.generation
+            try:
+                value = await loader()
+            except Exception:
+                if self.last_good is not None:
+                    self.entry = CachedResponse(self.last_good.value, min(self.ttl, self.RETRY_AFTER))
+                raise
+            entry = CachedResponse(value, self.ttl)
+            if generation == self.generation:
+                self.entry = self.last_good = entry
+            return entry
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against a strong ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class RecentTipsBuffer:
+    """The newest paid tips, kept in memory so /tips/recent needs no query.
+
+    Filled from the database once (``warm``) and then kept current from paid
+    transitions; tips added while a warm-up query runs are merged into its
+    result rather than lost. Tips are ordered by their (timestamp, id) key, the same
+    order as the keyset pages served from the database. Any page that ends
+    within the buffer is served from memory; if the table held fewer than
+    ``size`` paid tips at warm-up the buffer is the complete set and serves
+    every page. First-page bodies for the common limits are serialized once
+    per change.
+    """
+
+    PRESERIALIZED = (1, 5, 10)
+
+    def __init__(self, size: int, serialize: Callable[[list], bytes]):
+        self.size = size
+        self.serialize = serialize
+        self.entries: List[Tuple[tuple, Any]] = []
+        # Keys in ``entries``: a tip seen by the warm-up query and then
+        # announced by its paid transition is only held once
+        self._keys: set = set()
+        self.warmed = False
+        self.complete = False
+        self._pending: Optional[List[Tuple[tuple, Any]]] = None
+        self._bodies: Dict[int, Tuple[bytes, Optional[tuple]]] = {}
+
+    async def warm(self, load: Callable[[], Awaitable[List[Tuple[tuple, Any]]]]):
+        """Fill from ``load()``, the newest ``size`` tips in the database.
+
+        Entries already held and tips added while the query runs are kept,
+        so a snapshot taken before a tip was paid can't hide it.
+        """
+        self._pending = []
+        try:
+            loaded = await load()
+            merged = dict(self.entries)
+            merged.update(loaded)
+            merged.update(self._pending)
+        finally:
+            self._pending = None
+        self.entries = sorted(merged.items(), key=lambda entry: entry[0], reverse=True)[:self.size]
+        self._keys = {key for key, _ in self.entries}
+        # Fewer rows than asked for: the query saw every paid tip, and any
+        # paid since are in ``merged``
+        self.complete = len(loaded) < self.size and len(merged) <= self.size
+        self.warmed = True
+        self._bodies = {}
+
+    def add(self, key: tuple, tip):
+        if self._pending is not None:
+            self._pending.append((key, tip))
+        if not self.warmed or key in self._keys:
+            return
+        self.entries.append((key, tip))
+        self._keys.add(key)
+        self.entries.sort(key=lambda entry: entry[0], reverse=True)
+        if len(self.entries) > self.size:
+            for dropped, _ in self.entries[self.size:]:
+                self._keys.discard(dropped)
+            del self.entries[self.size:]
+            self.complete = False
+        self._bodies = {}
+
+    def page(self, limit: int, after: Optional[tuple] = None) -> Optional[Tuple[list, Optional[tuple]]]:
+        """Up to ``limit`` tips older than ``after`` and the key of the last
+        one if more may follow; None when the page reaches past the buffer"""
+        if not self.warmed:
+            return None
+        start = 0
+        if after is not None:
+            start = next((i for i, (key, _) in enumerate(self.entries) if key < after), len(self.entries))
+        end = start + max(limit, 0)
+        if end > len(self.entries) and not self.complete:
+            return None
+        page = self.entries[start:end]
+        more = end < len(self.entries) or not self.complete
+        return [tip for _, tip in page], (page[-1][0] if page and more else None)
+
+    def body(self, limit: int, after: Optional[tuple] = None) -> Optional[Tuple[bytes, Optional[tuple]]]:
+        cached = self._bodies.get(limit) if after is None else None
+        if cached is not None:
+            return cached
+        page = self.page(limit, after)
+        if page is None:
+            return None
+        tips, next_key = page
+        cached = (self.serialize(tips), next_key)
+        if after is None and limit in self.PRESERIALIZED:
+            self._bodies[limit] = cached
+        return cached
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire; least recently set evicted first"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data.pop(key, None)
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight call.
+
+    The call runs as its own task, so a caller that disconnects does not
+    cancel it for the others waiting on the same key.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(flight)
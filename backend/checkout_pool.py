@@ -0,0 +1,144 @@
+"""
+Warm pool of pre-created Stripe checkout sessions for the preset tip amounts.
+
+Nearly every tip uses one of the preset buttons, so instead of creating the
+session while the tipper waits, a few sessions per (origin, amount) are
+created ahead of time and handed out with a dict lookup. A background task
+tops the pool back up after each hand-out and replaces sessions before
+Stripe would expire them (24 hours after creation).
+
+Pooled sessions are created before anyone asks for them, so their Stripe
+metadata can't name the tipper; the tipper's name and message are kept on
+the ``payment_transactions`` row written when the session is handed out,
+which is where the app reads them from.
+
+Success and cancel URLs include the frontend origin, so only the origins
+listed in CHECKOUT_POOL_ORIGINS are pooled. Every worker keeps its own pool.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from metrics import Counter
+
+POOL_TAKES = Counter('checkout_pool_takes', "Preset checkouts served from the warm pool or created on demand", ('outcome',))
+POOL_CREATED = Counter('checkout_pool_sessions_created', "Checkout sessions created to fill the warm pool")
+POOL_EVICTED = Counter('checkout_pool_sessions_evicted', "Pooled checkout sessions dropped unused before Stripe expiry")
+
+
+def _cents(amount: float) -> int:
+    return int(round(amount * 100))
+
+
+def _list(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.environ.get(name, default).split(',') if item.strip()]
+
+
+class CheckoutPool:
+    def __init__(
+        self,
+        create: Callable[[str, float], Awaitable[Tuple[str, str]]],
+        origins: Optional[List[str]] = None,
+        amounts: Optional[List[float]] = None,
+        size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        interval: Optional[float] = None,
+    ):
+        # create(origin, amount) -> (session_id, url)
+        self.create = create
+        self.origins = [o.rstrip('/') for o in (origins if origins is not None else _list('CHECKOUT_POOL_ORIGINS', ''))]
+        self.amounts = amounts or [float(a) for a in _list('CHECKOUT_POOL_AMOUNTS', '5,10,25,50,100')]
+        self.size = size if size is not None else int(os.environ.get('CHECKOUT_POOL_SIZE', 3))
+        # Stripe expires a session 24 hours after creation; leave time to pay
+        self.max_age = max_age or float(os.environ.get('CHECKOUT_POOL_MAX_AGE', 20 * 3600))
+        self.interval = interval or float(os.environ.get('CHECKOUT_POOL_INTERVAL', 60))
+        self.pools: Dict[Tuple[str, int], Deque[Tuple[float, str, str]]] = {
+            (origin, _cents(amount)): deque() for origin in self.origins for amount in self.amounts
+        }
+        self.wanted = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.pools) and self.size > 0
+
+    def __len__(self) -> int:
+        return sum(len(pool) for pool in self.pools.values())
+
+    def start(self):
+        if self.enabled:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    def take(self, origin: str, amount: float) -> Optional[Tuple[float, str, str]]:
+        """A fresh pooled (created, session_id, url) for this checkout, or
+        None; pass it to give_back() if it ends up unused"""
+        pool = self.pools.get((origin.rstrip('/'), _cents(amount)))
+        if pool is None:
+            return None
+        cutoff = time.monotonic() - self.max_age
+        while pool:
+            created, session_id, url = pool.popleft()
+            if created >= cutoff:
+                POOL_TAKES.labels('hit').inc()
+                self.wanted.set()
+                return created, session_id, url
+            POOL_EVICTED.inc()
+        POOL_TAKES.labels('miss').inc()
+        self.wanted.set()
+        return None
+
+    def give_back(self, origin: str, amount: float, entry: Tuple[float, str, str]):
+        """Return a taken session nobody was given; it is the next one handed out"""
+        pool = self.pools.get((origin.rstrip('/'), _cents(amount)))
+        if pool is not None and entry[0] >= time.monotonic() - self.max_age:
+            pool.appendleft(entry)
+
+    async def _fill(self, origin: str, cents: int, pool: Deque[Tuple[float, str, str]]):
+        while len(pool) < self.size:
+            session_id, url = await self.create(origin, cents / 100)
+            pool.append((time.monotonic(), session_id, url))
+            POOL_CREATED.inc()
+
+    async def refill(self):
+        """Drop sessions near expiry and create sessions for every short pool"""
+        cutoff = time.monotonic() - self.max_age
+        for pool in self.pools.values():
+            # Oldest first, so stale sessions sit at the left
+            while pool and pool[0][0] < cutoff:
+                pool.popleft()
+                POOL_EVICTED.inc()
+        results = await asyncio.gather(
+            *(self._fill(origin, cents, pool) for (origin, cents), pool in self.pools.items()),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+    async def run(self):
+        while True:
+            self.wanted.clear()
+            try:
+                await self.refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Back off instead of retrying on every hand-out
+                logging.error(f"Error filling checkout pool: {str(e)}")
+                await asyncio.sleep(self.interval)
+                continue
+            try:
+                await asyncio.wait_for(self.wanted.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,471 @@
+"""
+Async data-access layer for Supabase (PostgREST).
+
+All route handlers and AuthService go through the repositories below instead
+of calling the synchronous supabase client directly, so a slow PostgREST round
+trip no longer stalls the event loop.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import upstream
+from resilience import CircuitBreaker, hedged
+
+
+# PostgREST's own "can't reach the database" errors and the SQLSTATE classes
+# for connection trouble, exhausted resources, cancelled statements (e.g. a
+# statement timeout) and internal errors: the database is unwell, rather
+# than the query being wrong
+UNHEALTHY_CODES = ('PGRST000', 'PGRST001', 'PGRST002', 'PGRST003', '08', '53', '57', '58', 'XX')
+
+
+def unhealthy(error: BaseException) -> bool:
+    """Whether a failed call counts against the Supabase circuit breaker"""
+    from postgrest.exceptions import APIError
+    if not isinstance(error, APIError):
+        # Deadline exceeded, connection refused or reset, ...
+        return True
+    if isinstance(error.code, int):
+        # Non-JSON error body, e.g. from a gateway in front of PostgREST
+        return error.code >= 500
+    return str(error.code or '').startswith(UNHEALTHY_CODES)
+
+
+def missing_column(error: BaseException) -> bool:
+    """Whether PostgREST refused a query for naming a column the table lacks"""
+    from postgrest.exceptions import APIError
+    # PGRST204: unknown column in a request body; 42703: undefined_column
+    return isinstance(error, APIError) and error.code in ('PGRST204', '42703')
+
+
+def quoted(value: str) -> str:
+    """A value safe to embed in a PostgREST logical filter such as or=(...)"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class Database:
+    """Pooled async PostgREST client shared by every repository.
+
+    The HTTP pool and client are only built by ``open()`` (called on the
+    first query), so importing the app needs neither credentials nor the
+    client libraries. Only PostgREST is used, so the full supabase client
+    (auth, storage, realtime) is never imported.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        key: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        keepalive: Optional[int] = None,
+        timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+    ):
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size or int(os.environ.get('SUPABASE_POOL_SIZE', 20))
+        self.keepalive = keepalive or int(os.environ.get('SUPABASE_POOL_KEEPALIVE', 10))
+        self.timeout = timeout or float(os.environ.get('SUPABASE_TIMEOUT', 10))
+        # Hot reads have a fallback, so they give up sooner than writes
+        self.read_timeout = read_timeout or float(os.environ.get('SUPABASE_READ_TIMEOUT', 2))
+        # Unset: no hedging
+        self.hedge_after = hedge_after or float(os.environ.get('SUPABASE_HEDGE_AFTER', 0)) or None
+        self.breaker = CircuitBreaker('supabase', unhealthy)
+        self.http = None
+        self.client = None
+
+    def open(self):
+        """Build the HTTP pool and PostgREST client; safe to call repeatedly"""
+        if self.client is not None:
+            return
+        import httpx
+        from postgrest import AsyncPostgrestClient
+
+        url = (self.url or os.environ['SUPABASE_URL']).rstrip('/')
+        key = self.key or os.environ['SUPABASE_SERVICE_KEY']
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.keepalive,
+                keepalive_expiry=30,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5)),
+            follow_redirects=True,
+        )
+        self.client = AsyncPostgrestClient(
+            f"{url}/rest/v1",
+            headers={"apiKey": key, "Authorization": f"Bearer {key}"},
+            http_client=self.http,
+        )
+
+    def table(self, name: str):
+        if self.client is None:
+            self.open()
+        return self.client.from_(name)
+
+    def rpc(self, function: str, params: Dict[str, Any]):
+        """Call a Postgres function from supabase_functions.sql"""
+        if self.client is None:
+            self.open()
+        return self.client.rpc(function, params)
+
+    async def execute(self, query, timeout: Optional[float] = None, hedge: bool = False):
+        """Run a built query with a per-call deadline, failing fast while
+        the circuit breaker is open"""
+        request = getattr(query, 'request', query)
+        method = getattr(request.http_method, 'value', request.http_method)
+        operation = f"{method} {request.path.path.rsplit('/', 1)[-1]}"
+        timeout = timeout or self.timeout
+        with self.breaker.call(), upstream('supabase', operation):
+            if hedge and self.hedge_after is not None:
+                return await hedged(query.execute, self.hedge_after, timeout, 'supabase')
+            return await asyncio.wait_for(query.execute(), timeout)
+
+    async def read(self, query):
+        """A hot-path read: short deadline, and hedged if SUPABASE_HEDGE_AFTER is set"""
+        return await self.execute(query, self.read_timeout, hedge=True)
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = self.client = None
+
+
+class CreatorProfileRepository:
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def get(self) -> Optional[dict]:
+        response = await self.db.read(self.db.table('creator_profile').select("*").limit(1))
+        return response.data[0] if response.data else None
+
+    async def save(self, changes: Dict[str, Any]) -> dict:
+        """Apply ``changes`` to the profile, creating it with the column
+        defaults if there is none, in one atomic call"""
+        response = await self.db.execute(self.db.rpc('update_creator_profile', {'patch': changes}))
+        return response.data[0]
+
+
+class TransactionWriteCoalescer:
+    """Write-behind batching for payment_transactions.
+
+    Inserts and status changes are collected for up to ``max_delay`` seconds
+    or ``max_batch`` rows, then flushed as one bulk upsert plus one bulk
+    conditional update per target status. Each caller awaits a future for
+    its own row. Flushes run one at a time, and within a flush inserts go
+    first, then non-paid status changes, then paid flips. A paid row is never
+    moved to another status, so initiated -> paid cannot be inverted.
+    """
+
+    def __init__(self, db: Database, max_delay: Optional[float] = None, max_batch: Optional[int] = None):
+        self.db = db
+        self.max_delay = max_delay if max_delay is not None else float(os.environ.get('TX_WRITE_DELAY_MS', 5)) / 1000
+        self.max_batch = max_batch or int(os.environ.get('TX_WRITE_BATCH', 50))
+        self._inserts: List[tuple] = []
+        self._updates: Dict[str, tuple] = {}
+        self._paid: Dict[str, tuple] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.flushes = 0
+        # Writes callers submitted vs. database round trips made for them
+        self.submitted = 0
+        self.requests = 0
+        self.rows_flushed = 0
+
+    def _pending(self) -> int:
+        return len(self._inserts) + len(self._updates) + len(self._paid)
+
+    def _submit(self) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.submitted += 1
+        if self._pending() + 1 >= self.max_batch:
+            loop.call_soon(lambda: asyncio.ensure_future(self.flush()))
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, lambda: asyncio.ensure_future(self.flush()))
+        return future
+
+    def insert(self, row: Dict[str, Any]) -> asyncio.Future:
+        future = self._submit()
+        self._inserts.append((row, future))
+        return future
+
+    def update_status(self, session_id: str, status: str, payment_status: str) -> asyncio.Future:
+        future = self._submit()
+        _, _, futures = self._updates.get(session_id, (None, None, []))
+        # Later changes to the same session supersede earlier ones
+        self._updates[session_id] = (status, payment_status, futures + [future])
+        return future
+
+    def mark_paid(self, session_id: str, status: str) -> asyncio.Future:
+        future = self._submit()
+        previous, futures = self._paid.get(session_id, (status, []))
+        self._paid[session_id] = (previous, futures + [future])
+        return future
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            inserts, updates, paid = self._inserts, self._updates, self._paid
+            self._inserts, self._updates, self._paid = [], {}, {}
+            if not (inserts or updates or paid):
+                return
+            self.flushes += 1
+            self.rows_flushed += len(inserts) + len(updates) + len(paid)
+
+            table = 'payment_transactions'
+            if inserts:
+                await self._settle(
+                    [future for _, future in inserts],
+                    lambda: self.db.table(table).upsert(
+                        [row for row, _ in inserts], on_conflict='session_id', ignore_duplicates=True
+                    ),
+                    lambda rows: [None] * len(inserts)
+                )
+
+            groups: Dict[tuple, List[str]] = {}
+            for session_id, (status, payment_status, _) in updates.items():
+                groups.setdefault((status, payment_status), []).append(session_id)
+            for (status, payment_status), session_ids in groups.items():
+                await self._settle(
+                    [future for session_id in session_ids for future in updates[session_id][2]],
+                    lambda status=status, payment_status=payment_status, session_ids=session_ids:
+                        self.db.table(table).update({
+                            "status": status,
+                            "payment_status": payment_status
+                        }).in_('session_id', session_ids).neq('payment_status', 'paid'),
+                    lambda rows, n=sum(len(updates[sid][2]) for sid in session_ids): [None] * n
+                )
+
+            paid_groups: Dict[str, List[str]] = {}
+            for session_id, (status, _) in paid.items():
+                paid_groups.setdefault(status, []).append(session_id)
+            for status, session_ids in paid_groups.items():
+                def results(rows, session_ids=session_ids):
+                    changed = {row['session_id']: row for row in rows}
+                    # Only the first caller per session sees the transition
+                    out = []
+                    for session_id in session_ids:
+                        futures = paid[session_id][1]
+                        out += [changed.get(session_id)] + [None] * (len(futures) - 1)
+                    return out
+                await self._settle(
+                    [future for session_id in session_ids for future in paid[session_id][1]],
+                    lambda status=status, session_ids=session_ids:
+                        self.db.table(table).update({
+                            "status": status,
+                            "payment_status": "paid"
+                        }).in_('session_id', session_ids).neq('payment_status', 'paid'),
+                    results
+                )
+
+    async def _settle(self, futures: List[asyncio.Future], query: Callable[[], Any], results):
+        """Run ``query()`` and resolve the batch's futures. Anything that goes
+        wrong, building the query included, fails them rather than leaving
+        callers waiting forever."""
+        self.requests += 1
+        try:
+            response = await self.db.execute(query())
+            outcomes = results(response.data or [])
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, outcomes):
+            if not future.done():
+                future.set_result(result)
+
+
+class TransactionRepository:
+    def __init__(self, db: Database):
+        self.db = db
+        self.writes = TransactionWriteCoalescer(db)
+        # Cleared on the first query that finds the idempotency columns missing
+        self.keyed = True
+
+    async def create(self, data: Dict[str, Any]) -> None:
+        await self.writes.insert(data)
+
+    async def find_checkout(self, idempotency_key: str) -> Optional[dict]:
+        """The row that claimed an Idempotency-Key, or None. Also None while
+        the table lacks the idempotency columns (see ``keyed``)."""
+        if not self.keyed:
+            return None
+        try:
+            response = await self.db.read(
+                self.db.table('payment_transactions').select('*').eq('idempotency_key', idempotency_key)
+            )
+        except Exception as e:
+            if not missing_column(e):
+                raise
+            self._unkeyed(e)
+            return None
+        return response.data[0] if response.data else None
+
+    async def claim_checkout(self, data: Dict[str, Any]) -> dict:
+        """Insert a checkout row carrying an Idempotency-Key; returns the row
+        that owns the key, an earlier request's if the key was used before.
+        The unique key makes this hold across workers. Without the
+        idempotency columns the row is written through the coalescer
+        instead, unkeyed, and returned as is."""
+        if self.keyed:
+            try:
+                response = await self.db.execute(
+                    self.db.table('payment_transactions').upsert(
+                        data, on_conflict='idempotency_key', ignore_duplicates=True
+                    )
+                )
+            except Exception as e:
+                if not missing_column(e):
+                    raise
+                self._unkeyed(e)
+            else:
+                if response.data:
+                    return response.data[0]
+                return await self.find_checkout(data['idempotency_key'])
+        await self.create({k: v for k, v in data.items() if k not in ('idempotency_key', 'checkout_url')})
+        return data
+
+    def _unkeyed(self, error: BaseException):
+        self.keyed = False
+        logging.warning(
+            "payment_transactions has no idempotency_key/checkout_url columns (%s); "
+            "Idempotency-Key replays stay per worker until the ALTER TABLE in "
+            "SUPABASE_SETUP.md is run and the backend restarted", error
+        )
+
+    async def get_by_session(self, session_id: str, columns: str = '*') -> Optional[dict]:
+        response = await self.db.read(
+            self.db.table('payment_transactions').select(columns).eq('session_id', session_id)
+        )
+        return response.data[0] if response.data else None
+
+    async def update_status(self, session_id: str, status: str, payment_status: str) -> None:
+        await self.writes.update_status(session_id, status, payment_status)
+
+    async def mark_paid(self, session_id: str, status: str) -> Optional[dict]:
+        """Flip a transaction to paid; returns the row only if this call changed it"""
+        return await self.writes.mark_paid(session_id, status)
+
+    async def expire(self, session_ids: List[str]) -> int:
+        """Mark checkouts that are still pending as expired in one update;
+        returns how many rows changed"""
+        response = await self.db.execute(
+            self.db.table('payment_transactions').update({
+                'status': 'expired',
+                'payment_status': 'unpaid'
+            }).in_('session_id', session_ids).eq('payment_status', 'pending')
+        )
+        return len(response.data)
+
+    async def recent_paid(self, limit: int, after: Optional[Tuple[datetime, str]] = None) -> List[dict]:
+        """Paid tips newest first, optionally only those older than the
+        ``after`` (timestamp, id) key, so deep pages cost the same as the first"""
+        query = self.db.table('payment_transactions').select(
+            "id, amount, message, tipper_name, timestamp"
+        ).eq('payment_status', 'paid')
+        if after is not None:
+            # The lte bound is what lets the timestamp index start the scan at
+            # the cursor; the or() only breaks ties between equal timestamps
+            timestamp, row_id = (quoted(value) for value in (after[0].isoformat(), after[1]))
+            query = query.lte('timestamp', after[0].isoformat()).or_(
+                f"timestamp.lt.{timestamp},and(timestamp.eq.{timestamp},id.lt.{row_id})"
+            )
+        response = await self.db.read(
+            query.order('timestamp', desc=True).order('id', desc=True).limit(limit)
+        )
+        return response.data
+
+    async def pages(
+        self,
+        columns: str,
+        payment_statuses: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = 1000,
+    ):
+        """Matching transactions oldest first, one keyset page (list) at a time.
+
+        ``columns`` must include id and timestamp. Each page resumes after the
+        last row of the previous one, so every page costs the same however
+        deep the export is, and the next page is already being fetched while
+        the caller works through the current one.
+        """
+        def fetch(after: Optional[Tuple[str, str]]) -> asyncio.Future:
+            query = self.db.table('payment_transactions').select(columns)
+            if payment_statuses:
+                query = query.in_('payment_status', payment_statuses)
+            if start is not None:
+                query = query.gte('timestamp', start.isoformat())
+            if end is not None:
+                query = query.lt('timestamp', end.isoformat())
+            if after is not None:
+                timestamp, row_id = (quoted(value) for value in after)
+                query = query.gte('timestamp', after[0]).or_(
+                    f"timestamp.gt.{timestamp},and(timestamp.eq.{timestamp},id.gt.{row_id})"
+                )
+            return asyncio.ensure_future(
+                self.db.execute(query.order('timestamp').order('id').limit(page_size))
+            )
+
+        pending = fetch(None)
+        try:
+            while True:
+                rows = (await pending).data
+                pending = None
+                if len(rows) < page_size:
+                    if rows:
+                        yield rows
+                    return
+                pending = fetch((rows[-1]['timestamp'], rows[-1]['id']))
+                yield rows
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def iter_paid(self, columns: str, page_size: int = 1000):
+        """Every paid transaction, oldest first; ``columns`` must include id and timestamp"""
+        async for rows in self.pages(columns, ['paid'], page_size=page_size):
+            for row in rows:
+                yield row
+
+
+class AdminRepository:
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        response = await self.db.execute(self.db.table('admin_users').select('*').eq('email', email))
+        return response.data[0] if response.data else None
+
+    async def get_by_id(self, admin_id: int, columns: str = '*') -> Optional[dict]:
+        response = await self.db.execute(self.db.table('admin_users').select(columns).eq('id', admin_id))
+        return response.data[0] if response.data else None
+
+    async def update_password(self, admin_id: int, hashed_password: str, updated_at: str) -> None:
+        await self.db.execute(
+            self.db.table('admin_users').update({
+                'hashed_password': hashed_password,
+                'updated_at': updated_at
+            }).eq('id', admin_id)
+        )
+
+    async def create_password_token(self, data: Dict[str, Any]) -> None:
+        await self.db.execute(self.db.table('password_change_tokens').insert(data))
+
+    async def change_password_with_token(self, token: str, hashed_password: str) -> Optional[dict]:
+        """Spend an unused, unexpired password change token and set the new
+        password in one atomic call; returns the admin's id and email, or
+        None when the token is not valid"""
+        response = await self.db.execute(self.db.rpc('change_password_with_token', {
+            'p_token': token,
+            'p_hashed_password': hashed_password
+        }))
+        return response.data[0] if response.data else None
@@ -0,0 +1,187 @@
+"""
+Fan-out of paid tip events to streaming subscribers (SSE/WebSocket).
+
+With several workers, events go through an ``EventLog`` shared by the
+workers on the host, so every worker numbers a tip the same way and
+delivers events in the same order, and Last-Event-ID resumes correctly
+whichever worker a client reconnects to.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+
+class TipEvent:
+    __slots__ = ('id', 'data', 'sse')
+
+    def __init__(self, event_id: int, tip: dict):
+        self.id = event_id
+        self.data = json.dumps({"id": event_id, **tip}, default=str)
+        self.sse = f"id: {event_id}\nevent: tip\ndata: {self.data}\n\n".encode('utf-8')
+
+
+class Subscriber:
+    """One connected stream. ``None`` on the queue means it fell too far behind"""
+
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, event: TipEvent):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the slow consumer; it reconnects and resumes via Last-Event-ID
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventLog:
+    """Tip events in a SQLite (WAL) file shared by the workers on one host.
+
+    Row ids are the event ids. They start from the time the file was created
+    in milliseconds, so they keep increasing across restarts, and rows are
+    only ever appended, so reading ``after`` an id yields events in the
+    order every worker sees them.
+    """
+
+    def __init__(self, path: str, keep: int, timeout: float = 0.05):
+        self.path = path
+        self.keep = keep
+        # Waiting for the lock blocks the event loop; give up quickly instead
+        self.timeout = timeout
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tip_events (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)'
+        )
+        self.conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'tip_events', ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'tip_events')",
+            (int(time.time() * 1000),)
+        )
+
+    def append(self, tip: dict) -> int:
+        event_id = self.conn.execute(
+            'INSERT INTO tip_events (data) VALUES (?)', (json.dumps(tip, default=str),)
+        ).lastrowid
+        if event_id % 64 == 0:
+            self.conn.execute('DELETE FROM tip_events WHERE id <= ?', (event_id - self.keep,))
+        return event_id
+
+    def after(self, last_id: int) -> List[Tuple[int, dict]]:
+        rows = self.conn.execute('SELECT id, data FROM tip_events WHERE id > ? ORDER BY id', (last_id,))
+        return [(event_id, json.loads(data)) for event_id, data in rows]
+
+    def latest(self, count: int) -> List[Tuple[int, dict]]:
+        rows = self.conn.execute('SELECT id, data FROM tip_events ORDER BY id DESC LIMIT ?', (count,)).fetchall()
+        return [(event_id, json.loads(data)) for event_id, data in reversed(rows)]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class TipEventHub:
+    """Publishes each newly paid tip to every subscriber's bounded queue.
+
+    Recent events are kept so a reconnecting client that sends Last-Event-ID
+    gets whatever it missed. Without a log (a single worker), event ids start
+    from the boot time in milliseconds, so they keep increasing across
+    restarts. With one, ids come from the log and tips published by other
+    workers are picked up by ``sync``.
+    """
+
+    def __init__(self, history: Optional[int] = None, max_queue: Optional[int] = None,
+                 log_path: Optional[str] = None):
+        self.max_queue = max_queue or int(os.environ.get('TIP_STREAM_QUEUE', 64))
+        self.history: Deque[TipEvent] = deque(maxlen=history or int(os.environ.get('TIP_STREAM_HISTORY', 256)))
+        self.subscribers: Set[Subscriber] = set()
+        self.last_id = int(time.time() * 1000)
+        self.log = EventLog(log_path, keep=self.history.maxlen) if log_path else None
+
+    def open(self):
+        """Open the shared log and load its recent events as history"""
+        if self.log is None:
+            return
+        self.log.open()
+        for event_id, tip in self.log.latest(self.history.maxlen):
+            self.history.append(TipEvent(event_id, tip))
+            self.last_id = event_id
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+    def _deliver(self, event: TipEvent):
+        self.last_id = event.id
+        self.history.append(event)
+        for subscriber in self.subscribers:
+            subscriber.offer(event)
+
+    def publish(self, tip: dict):
+        """Fan out a tip paid on this worker"""
+        if self.log is None or self.log.conn is None:
+            self._deliver(TipEvent(self.last_id + 1, tip))
+            return
+        try:
+            self.log.append(tip)
+        except sqlite3.Error as e:
+            # The tip is recorded; only its live alert is lost
+            logging.error(f"Error appending tip event: {str(e)}")
+            return
+        self.sync()
+
+    def sync(self):
+        """Deliver events appended to the log since the last one seen, in id order"""
+        if self.log is None or self.log.conn is None:
+            return
+        try:
+            rows = self.log.after(self.last_id)
+        except sqlite3.Error as e:
+            # Picked up by the next sync
+            logging.error(f"Error reading tip events: {str(e)}")
+            return
+        for event_id, tip in rows:
+            self._deliver(TipEvent(event_id, tip))
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscriber:
+        subscriber = Subscriber(self.max_queue)
+        if last_event_id is not None:
+            self.sync()
+            for event in self.history:
+                if event.id > last_event_id:
+                    subscriber.offer(event)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def next_event(subscriber: Subscriber, heartbeat: float):
+    """Wait for the next event; returns ``False`` on heartbeat timeout"""
+    try:
+        return await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+    except asyncio.TimeoutError:
+        return False
@@ -0,0 +1,60 @@
+"""
+Encoders for the admin transaction export.
+
+Rows arrive a keyset page at a time and each page is encoded into one chunk
+of the response body, so memory holds a page or two however large the
+export is.
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, Dict, List
+
+EXPORT_COLUMNS = (
+    'id', 'session_id', 'amount', 'currency', 'message', 'tipper_name',
+    'status', 'payment_status', 'timestamp', 'created_at',
+)
+
+# Cells a spreadsheet would evaluate as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def ndjson_chunk(rows: List[dict]) -> bytes:
+    return ''.join(json.dumps(row, default=str) + '\n' for row in rows).encode('utf-8')
+
+
+def _cell(value):
+    # Messages and names come from tippers; don't let them run in Excel
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunk(rows: List[dict], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([_cell(row.get(column)) for column in EXPORT_COLUMNS] for row in rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+FORMATS: Dict[str, tuple] = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+async def encode(fmt: str, first: List[dict], rest: AsyncIterator[List[dict]],
+                 on_rows: Callable[[int], None] = lambda n: None) -> AsyncIterator[bytes]:
+    """Response body chunks for an export whose first page is already fetched"""
+    if fmt == 'csv':
+        yield csv_chunk(first, header=True)
+    elif first:
+        yield ndjson_chunk(first)
+    on_rows(len(first))
+    if not first:
+        return
+    async for rows in rest:
+        yield csv_chunk(rows) if fmt == 'csv' else ndjson_chunk(rows)
+        on_rows(len(rows))
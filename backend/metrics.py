@@ -0,0 +1,267 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are plain dicts of floats keyed by label values, so recording one is
+a dict lookup and an addition on the event loop thread; formatting only
+happens when ``/metrics`` is scraped. Hot call sites can hold on to
+``labels(...)`` children to skip even the lookup.
+"""
+import sys
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float('inf') else repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List["Metric"] = []
+
+    def register(self, metric: "Metric") -> "Metric":
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            name = metric.name + metric.suffix
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """Base for labelled metrics; ``fn`` makes it a single value read at scrape time"""
+
+    kind = "untyped"
+    suffix = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (),
+                 fn: Optional[Callable[[], float]] = None, registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.fn = fn
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[str]:
+        name = self.name + self.suffix
+        if self.fn is not None:
+            try:
+                return [f"{name} {_number(self.fn())}"]
+            except Exception:
+                return []
+        return [
+            f"{name}{_labels(self.label_names, values)} {_number(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+    suffix = "_total"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, help, labels, registry=registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            labels = _labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+# HTTP server
+HTTP_REQUESTS = Counter('http_requests', "HTTP requests by route template, method and status", ('route', 'method', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', "HTTP request latency by route template", ('route', 'method'))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', "HTTP requests currently being handled")
+HTTP_STREAMS_OPEN = Gauge('http_streams_open', "Server-sent event streams currently open", ('route',))
+
+# Upstream dependencies (supabase, stripe, resend, bcrypt)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', "Latency of calls to upstream dependencies", ('service', 'operation')
+)
+UPSTREAM_ERRORS = Counter('upstream_errors', "Failed calls to upstream dependencies", ('service', 'operation'))
+
+
+def peak_rss() -> float:
+    """Peak resident memory of this process in bytes"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+
+
+@contextmanager
+def upstream(service: str, operation: str):
+    """Time a block as one call to an upstream dependency"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(service, operation).observe(time.perf_counter() - started_at)
+
+
+def _is_stream(headers: Iterable[Tuple[bytes, bytes]]) -> bool:
+    return any(name == b'content-type' and value.startswith(b'text/event-stream') for name, value in headers)
+
+
+class MetricsMiddleware:
+    """Counts and times HTTP requests, labelled by route template (not raw path).
+
+    Plain ASGI middleware: one perf_counter pair and a few dict updates per
+    request. Paths that match no route share the ``unmatched`` label so
+    scanners can't inflate cardinality. Server-sent event streams stay open
+    for as long as a client watches, so once their response starts they
+    leave the in-flight gauge for ``http_streams_open`` and are never timed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        stream = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, stream
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if _is_stream(message.get('headers', ())):
+                    stream = HTTP_STREAMS_OPEN.labels(getattr(scope.get('route'), 'path', 'unmatched'))
+                    stream.inc()
+                    HTTP_IN_FLIGHT.dec()
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            template = getattr(route, 'path', 'unmatched')
+            method = scope['method']
+            if stream is not None:
+                stream.dec()
+            else:
+                HTTP_IN_FLIGHT.dec()
+                HTTP_LATENCY.labels(template, method).observe(time.perf_counter() - started_at)
+            HTTP_REQUESTS.labels(template, method, str(status_code)).inc()
@@ -0,0 +1,37 @@
+"""
+Opaque cursors for keyset pagination over payment_transactions.
+
+A cursor carries the (timestamp, id) key of the last row a client has seen;
+the next page is everything strictly older, which the timestamp index can
+answer without counting past the rows already served.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from stats import parse_timestamp
+
+Key = Tuple[datetime, str]
+
+
+def row_key(row: dict) -> Key:
+    return parse_timestamp(row['timestamp']), str(row['id'])
+
+
+def encode_cursor(key: Key) -> str:
+    timestamp, row_id = key
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Key:
+    """Inverse of ``encode_cursor``; raises ValueError for anything else"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        if not isinstance(timestamp, str) or not isinstance(row_id, str):
+            raise ValueError("wrong types")
+        return parse_timestamp(timestamp), row_id
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
@@ -0,0 +1,121 @@
+"""
+Sliding-window attempt counters with bounded memory.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, Request
+
+
+class SlidingWindowLimiter:
+    """Approximate sliding window per key (current + weighted previous window).
+
+    Each key costs one small tuple; once ``max_keys`` are tracked the least
+    recently seen key is evicted, so memory stays flat under a flood of
+    distinct IPs or emails.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[str, list]" = OrderedDict()
+        self.rejected = 0
+
+    def _state(self, key: str, now: float) -> list:
+        state = self._keys.get(key)
+        start = now - (now % self.window)
+        if state is None:
+            state = [start, 0, 0]
+            self._keys[key] = state
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(key)
+            if state[0] != start:
+                # Roll forward: the old current window becomes the previous one
+                state[2] = state[1] if start - state[0] == self.window else 0
+                state[0], state[1] = start, 0
+        return state
+
+    def _count(self, state: list, now: float) -> float:
+        elapsed = (now - state[0]) / self.window
+        return state[2] * (1 - elapsed) + state[1]
+
+    def hit(self, key: str) -> bool:
+        """Record an attempt; returns False if the key is over its limit"""
+        now = time.monotonic()
+        state = self._state(key, now)
+        if self._count(state, now) >= self.limit:
+            self.rejected += 1
+            return False
+        state[1] += 1
+        return True
+
+    def record(self, key: str):
+        """Count an attempt that was already allowed elsewhere"""
+        self._state(key, time.monotonic())[1] += 1
+
+    def reset(self, key: str):
+        self._keys.pop(key, None)
+
+    def retry_after(self, key: str) -> int:
+        state = self._keys.get(key)
+        if state is None:
+            return 0
+        return max(1, int(state[0] + self.window - time.monotonic()) + 1)
+
+
+def client_ip(request: Request) -> str:
+    """The address the platform proxy saw (right-most X-Forwarded-For entry)"""
+    forwarded = request.headers.get('x-forwarded-for')
+    if forwarded:
+        return forwarded.split(',')[-1].strip()
+    return request.client.host if request.client else 'unknown'
+
+
+class LoginAttemptTracker:
+    """Caps credential checks per client IP and per email before any bcrypt work.
+
+    ``share(kind, data)`` tells sibling workers about every allowed attempt
+    and successful login; they apply it with ``record``/``forget``, so the
+    limits hold for the host rather than for each worker.
+    """
+
+    def __init__(self, ip_limit: int, email_limit: int, window: float, max_keys: int = 10000,
+                 share: Optional[Callable[[str, Any], None]] = None):
+        self.by_ip = SlidingWindowLimiter(ip_limit, window, max_keys)
+        self.by_email = SlidingWindowLimiter(email_limit, window, max_keys)
+        self.share = share or (lambda kind, data: None)
+
+    def check(self, request: Request, email: Optional[str]):
+        ip = client_ip(request)
+        if not self.by_ip.hit(ip):
+            self._reject(self.by_ip.retry_after(ip))
+        email = email.lower() if email is not None else None
+        allowed = email is None or self.by_email.hit(email)
+        self.share("login_attempt", {"ip": ip, "email": email if allowed else None})
+        if not allowed:
+            self._reject(self.by_email.retry_after(email))
+
+    def succeeded(self, email: str):
+        self.by_email.reset(email.lower())
+        self.share("login_succeeded", email.lower())
+
+    def record(self, attempt: dict):
+        """An attempt another worker allowed"""
+        self.by_ip.record(attempt["ip"])
+        if attempt["email"] is not None:
+            self.by_email.record(attempt["email"])
+
+    def forget(self, email: str):
+        self.by_email.reset(email)
+
+    @staticmethod
+    def _reject(retry_after: int):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(retry_after)}
+        )
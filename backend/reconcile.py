@@ -0,0 +1,169 @@
+"""
+Background reconciliation of checkouts that never heard back from Stripe.
+
+A transaction leaves ``pending`` when its webhook is applied or the tipper's
+browser polls the checkout status. If both are missed the row would stay
+pending forever, so the sweeper periodically pages through pending rows
+older than ``min_age``, asks Stripe about each (with bounded concurrency and
+a request rate cap), and applies what it learns in bulk: paid sessions go
+through the usual paid transition, expired ones are marked ``expired``, and
+rows Stripe can't answer for long after any session could still be open
+are abandoned as ``expired`` too.
+
+With several workers on one host only the one holding the lock file sweeps.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from database import TransactionRepository
+from metrics import Counter, Histogram
+from resilience import CircuitOpenError
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker sweeps, the updates are idempotent
+    fcntl = None
+
+SWEEP_DURATION = Histogram(
+    'reconcile_sweep_duration_seconds', "Time taken by one reconciliation sweep",
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+SWEEP_ROWS = Counter('reconcile_rows', "Stale pending transactions checked, by outcome", ('outcome',))
+
+
+class Pacer:
+    """Spaces calls at least ``1 / rate`` seconds apart, across tasks"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_at = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        at = max(now, self.next_at)
+        self.next_at = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class ReconciliationSweeper:
+    def __init__(
+        self,
+        transactions: TransactionRepository,
+        lookup: Callable[[str], Awaitable[Any]],
+        on_paid: Callable[[dict], None],
+        lock_path: Optional[str] = None,
+        interval: Optional[float] = None,
+        min_age: Optional[float] = None,
+        abandon_after: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+    ):
+        self.transactions = transactions
+        self.lookup = lookup
+        self.on_paid = on_paid
+        self.lock_path = lock_path
+        self.interval = interval or float(os.environ.get('RECONCILE_INTERVAL', 300))
+        self.min_age = min_age or float(os.environ.get('RECONCILE_MIN_AGE', 900))
+        # Checkout sessions expire after 24 hours at most
+        self.abandon_after = abandon_after or float(os.environ.get('RECONCILE_ABANDON_AFTER', 172800))
+        self.batch_size = batch_size or int(os.environ.get('RECONCILE_BATCH_SIZE', 100))
+        self.concurrency = concurrency or int(os.environ.get('RECONCILE_CONCURRENCY', 4))
+        self.pacer = Pacer(rate or float(os.environ.get('RECONCILE_RATE', 10)))
+        self.task: Optional[asyncio.Task] = None
+        self._lock_file = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _leader(self) -> bool:
+        """Take (or keep) the host-wide sweeper lock; released when this process exits"""
+        if fcntl is None or self.lock_path is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    async def run(self):
+        await asyncio.sleep(min(self.interval, 60))
+        while True:
+            try:
+                if self._leader():
+                    counts = await self.sweep()
+                    if any(counts[outcome] for outcome in ('paid', 'expired', 'abandoned')):
+                        logging.info(f"Reconciled stale transactions: {counts}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Reconciliation sweep failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _check(self, row: dict, now: datetime, semaphore: asyncio.Semaphore) -> str:
+        async with semaphore:
+            await self.pacer.wait()
+            try:
+                status = await self.lookup(row['session_id'])
+            except Exception as e:
+                created = datetime.fromisoformat(row['timestamp'].replace('Z', '+00:00'))
+                # During an outage Stripe said nothing about the session; try again next sweep
+                if not isinstance(e, CircuitOpenError) and (now - created).total_seconds() > self.abandon_after:
+                    return 'abandoned'
+                logging.error(f"Error reconciling checkout {row['session_id']}: {str(e)}")
+                return 'error'
+        if status.payment_status == 'paid':
+            return 'paid'
+        if status.status == 'expired':
+            return 'expired'
+        return 'unchanged'
+
+    async def sweep(self) -> Dict[str, int]:
+        """Check every stale pending row once; returns counts by outcome"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        counts = dict.fromkeys(('paid', 'expired', 'abandoned', 'unchanged', 'error'), 0)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async for rows in self.transactions.pages(
+                "id, session_id, timestamp", ['pending'],
+                end=now - timedelta(seconds=self.min_age), page_size=self.batch_size
+            ):
+                outcomes = await asyncio.gather(*(self._check(row, now, semaphore) for row in rows))
+                by_outcome: Dict[str, list] = {}
+                for row, outcome in zip(rows, outcomes):
+                    by_outcome.setdefault(outcome, []).append(row['session_id'])
+                    counts[outcome] += 1
+                    SWEEP_ROWS.labels(outcome).inc()
+
+                # Both go out as one conditional bulk update each
+                paid = await asyncio.gather(*(
+                    self.transactions.mark_paid(session_id, "complete") for session_id in by_outcome.get('paid', [])
+                ))
+                for transaction in paid:
+                    if transaction:
+                        self.on_paid(transaction)
+                gone = by_outcome.get('expired', []) + by_outcome.get('abandoned', [])
+                if gone:
+                    await self.transactions.expire(gone)
+        finally:
+            SWEEP_DURATION.observe(time.perf_counter() - started)
+        return counts
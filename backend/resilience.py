@@ -0,0 +1,153 @@
+"""
+Failure handling for calls to upstream services.
+
+``CircuitBreaker`` counts outcomes per service over a rolling window. Once
+enough calls have been seen and the share of failures crosses the threshold
+it opens: calls fail immediately with ``CircuitOpenError`` instead of each
+waiting out its deadline. After ``open_for`` seconds one probe call is let
+through; its success closes the breaker, its failure opens it again.
+
+``hedged`` runs an idempotent call and, if it hasn't answered after a delay,
+starts a second copy and takes whichever succeeds first, trimming the tail
+latency of reads.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, List, Optional
+
+from metrics import Counter, Gauge
+
+CIRCUIT_STATE = Gauge('upstream_circuit_state', "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open", ('service',))
+CIRCUIT_OPENED = Counter('upstream_circuit_opened', "Times an upstream's circuit breaker opened", ('service',))
+CIRCUIT_REJECTED = Counter('upstream_circuit_rejected', "Calls failed fast by an open circuit breaker", ('service',))
+HEDGED_REQUESTS = Counter('upstream_hedged_requests', "Second copies of slow reads sent to an upstream", ('service',))
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"{service} is unavailable (circuit open)")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(
+        self,
+        service: str,
+        is_failure: Callable[[BaseException], bool] = lambda error: True,
+        failure_ratio: Optional[float] = None,
+        min_calls: Optional[int] = None,
+        window: Optional[float] = None,
+        open_for: Optional[float] = None,
+    ):
+        self.service = service
+        # Errors that say nothing about the upstream's health (e.g. a 4xx) don't count
+        self.is_failure = is_failure
+        self.failure_ratio = failure_ratio or float(os.environ.get('CIRCUIT_FAILURE_RATIO', 0.5))
+        self.min_calls = min_calls or int(os.environ.get('CIRCUIT_MIN_CALLS', 20))
+        self.window = window or float(os.environ.get('CIRCUIT_WINDOW', 30))
+        self.open_for = open_for or float(os.environ.get('CIRCUIT_OPEN_FOR', 15))
+        # [second, calls, failures], oldest first
+        self.buckets: Deque[List[int]] = deque()
+        self.opened_at = 0.0
+        self.probing = False
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: int):
+        self.state = state
+        CIRCUIT_STATE.labels(self.service).set(state)
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.buckets.clear()
+        self._set_state(self.OPEN)
+        CIRCUIT_OPENED.labels(self.service).inc()
+
+    def _reject(self):
+        CIRCUIT_REJECTED.labels(self.service).inc()
+        retry_after = max(0.0, self.opened_at + self.open_for - time.monotonic())
+        raise CircuitOpenError(self.service, retry_after)
+
+    def _record(self, failed: bool, probe: bool):
+        if probe:
+            self.probing = False
+            if failed:
+                self._open()
+            else:
+                self._set_state(self.CLOSED)
+            return
+        if self.state != self.CLOSED:
+            # A call that started before the breaker opened
+            return
+        second = int(time.monotonic())
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append([second, 0, 0])
+        bucket = self.buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        while self.buckets[0][0] <= second - self.window:
+            self.buckets.popleft()
+        calls = sum(b[1] for b in self.buckets)
+        failures = sum(b[2] for b in self.buckets)
+        if calls >= self.min_calls and failures >= calls * self.failure_ratio:
+            self._open()
+
+    @contextmanager
+    def call(self):
+        """Wrap one upstream call; raises CircuitOpenError instead of running it while open"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_for:
+                self._reject()
+            self._set_state(self.HALF_OPEN)
+        probe = False
+        if self.state == self.HALF_OPEN:
+            if self.probing:
+                self._reject()
+            self.probing = probe = True
+        try:
+            yield
+        except Exception as e:
+            self._record(self.is_failure(e), probe)
+            raise
+        except BaseException:
+            # Cancelled: no verdict, let another call probe
+            if probe:
+                self.probing = False
+            raise
+        else:
+            self._record(False, probe)
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], after: float, timeout: float, service: str) -> Any:
+    """First successful result of ``call()``, started again if the first
+    attempt takes longer than ``after``; TimeoutError after ``timeout``"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    hedge_at = loop.time() + after
+    pending = {asyncio.ensure_future(call())}
+    try:
+        while True:
+            now = loop.time()
+            if now >= deadline:
+                raise asyncio.TimeoutError()
+            until = min(hedge_at, deadline) if hedge_at is not None else deadline
+            done, pending = await asyncio.wait(pending, timeout=until - now, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                # Every attempt failed; hedging is for slowness, not errors
+                raise error
+            if hedge_at is not None and loop.time() >= hedge_at:
+                hedge_at = None
+                HEDGED_REQUESTS.labels(service).inc()
+                pending.add(asyncio.ensure_future(call()))
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,51 @@
+"""
+Production entry point: uvicorn with one worker process per available core.
+
+WEB_CONCURRENCY overrides the worker count; MAX_WORKERS caps the automatic
+choice. Workers keep their caches and the live tip feed in sync over the
+worker bus (see bus.py).
+"""
+import math
+import os
+from pathlib import Path
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def available_cpus() -> int:
+    """Cores this process may use, honouring affinity and a cgroup CPU quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    try:
+        # Containers see the host's cores; the quota is what we actually get
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    if os.environ.get('WEB_CONCURRENCY'):
+        return max(1, int(os.environ['WEB_CONCURRENCY']))
+    return max(1, min(available_cpus(), int(os.environ.get('MAX_WORKERS', 8))))
+
+
+def main():
+    # The workers load it too; MAX_WORKERS and friends are needed here first
+    load_dotenv(Path(__file__).parent / '.env')
+    workers = worker_count()
+    # Split the bcrypt threads between workers instead of giving each half the box
+    os.environ.setdefault('BCRYPT_WORKERS', str(max(1, available_cpus() // (2 * workers))))
+    uvicorn.run(
+        'server:app',
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 8001)),
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
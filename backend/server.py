@@ -1,32 +1,142 @@
-from fastapi import FastAPI, APIRouter, Request, HTTPException, Depends
+from pathlib import Path
 from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+# Before any module below reads its configuration from the environment
+load_dotenv(ROOT_DIR / '.env')
+
+from fastapi import FastAPI, APIRouter, Request, Response, HTTPException, Depends, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse, ORJSONResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from starlette.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
 import os
 import logging
-from pathlib import Path
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import uuid
+import time
+import asyncio
+import importlib
+import sqlite3
+import orjson
 from datetime import datetime, timezone
-from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 from auth import AuthService
+from database import Database, CreatorProfileRepository, TransactionRepository, AdminRepository
+from cache import ResponseCache, RecentTipsBuffer, TTLCache, SingleFlight, etag_matches
+from events import TipEventHub, parse_event_id, next_event
+from webhook_queue import WebhookQueue, WebhookWorker
+from reconcile import ReconciliationSweeper
+from checkout_pool import CheckoutPool
+from resilience import CircuitOpenError
+from rate_limit import LoginAttemptTracker
+from bus import WorkerBus
+from stats import TipStats
+from pagination import row_key, encode_cursor, decode_cursor
+import export
+from metrics import REGISTRY, CONTENT_TYPE, Counter, Gauge, MetricsMiddleware, peak_rss
 from services.email_service import email_service
+from services.stripe_service import StripeClientPool, checkout_request
 
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# Supabase connection
-SUPABASE_URL = os.environ['SUPABASE_URL']
-SUPABASE_KEY = os.environ['SUPABASE_SERVICE_KEY']
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase (PostgREST) connection, opened on the first query
+db = Database()
+profiles = CreatorProfileRepository(db)
+transactions = TransactionRepository(db)
+admins = AdminRepository(db)
 
 # Initialize auth service
-auth_service = AuthService(supabase)
+auth_service = AuthService(admins)
+
+# Credential checks allowed per client IP / per email before bcrypt runs,
+# counted across workers over the worker bus
+login_attempts = LoginAttemptTracker(
+    ip_limit=int(os.environ.get('ADMIN_LOGIN_IP_LIMIT', 20)),
+    email_limit=int(os.environ.get('ADMIN_LOGIN_EMAIL_LIMIT', 5)),
+    window=float(os.environ.get('ADMIN_LOGIN_WINDOW', 300)),
+    share=lambda kind, data: worker_bus.publish(kind, data)
+)
+
+# Shared Stripe clients (keep-alive connection pool)
+stripe_clients = StripeClientPool()
+
+# Creator profile is read on every page view but changes rarely
+profile_cache = ResponseCache(ttl=float(os.environ.get('CREATOR_CACHE_TTL', 300)))
+PROFILE_CACHE_CONTROL = "public, max-age=15, must-revalidate"
+
+# Keeps the caches above consistent across uvicorn workers
+worker_bus = WorkerBus()
+
+# Live tip events for the alerts overlay, numbered through a log shared by the workers
+tip_events = TipEventHub(log_path=f"{worker_bus.directory}-events.db")
+TIP_STREAM_HEARTBEAT = float(os.environ.get('TIP_STREAM_HEARTBEAT', 15))
+
+# Checkout status answers: paid/expired are final, others re-checked shortly
+CHECKOUT_STATUS_TERMINAL_TTL = 3600
+CHECKOUT_STATUS_PENDING_TTL = float(os.environ.get('CHECKOUT_STATUS_TTL', 1.5))
+checkout_statuses = TTLCache(maxsize=10000, ttl=CHECKOUT_STATUS_PENDING_TTL)
+status_flights = SingleFlight()
+
+# Checkout sessions by Idempotency-Key, so double-clicks and retries reuse the
+# first one; Stripe keeps its own record of a key for 24 hours
+checkout_replies = TTLCache(
+    maxsize=int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('IDEMPOTENCY_TTL', 86400))
+)
+checkout_flights = SingleFlight()
+
+
+# Imported in the background after startup so the first checkout doesn't pay for them
+INTEGRATION_MODULES = ('postgrest', 'stripe', 'emergentintegrations.payments.stripe.checkout', 'resend')
+
+def preload_integrations():
+    for name in INTEGRATION_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.error(f"Error preloading {name}: {str(e)}")
+
+async def warm_up():
+    """Runs once the app is already accepting requests"""
+    await asyncio.to_thread(preload_integrations)
+    if stripe_clients.api_key:
+        # Filled once Stripe is imported, off the event loop
+        checkout_pool.start()
+    try:
+        if not recent_tips.warmed:
+            await warm_recent_tips()
+    except Exception as e:
+        logging.error(f"Error warming recent tips: {str(e)}")
+    try:
+        await stats_flight.do("rebuild", rebuild_tip_stats)
+    except Exception as e:
+        logging.error(f"Error building tip stats: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_bus.open()
+    tip_events.open()
+    webhook_queue.open()
+    webhook_worker.start()
+    email_service.start()
+    if stripe_clients.api_key:
+        reconciler.start()
+    warming = asyncio.create_task(warm_up())
+    yield
+    warming.cancel()
+    await checkout_pool.stop()
+    await reconciler.stop()
+    await email_service.stop()
+    await webhook_worker.stop()
+    webhook_queue.close()
+    await stripe_clients.close()
+    auth_service.hasher.shutdown()
+    await transactions.writes.flush()
+    await db.close()
+    tip_events.close()
+    worker_bus.close()
 
-# Create the main app without a prefix
-app = FastAPI()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -75,90 +185,259 @@ class TipResponse(BaseModel):
     timestamp: datetime
 
 
+def tip_projection(row: dict) -> dict:
+    """TipResponse fields of a payment_transactions row, trusted as-is.
+
+    Rows come straight from the database (or our own writes), so nothing is
+    re-validated and the ISO-8601 timestamp is passed through unparsed.
+    """
+    return {
+        "amount": float(row['amount']),
+        "message": row.get('message'),
+        "tipper_name": row.get('tipper_name'),
+        "timestamp": row['timestamp'],
+    }
+
+# Most recent paid tips, served from memory by /tips/recent
+recent_tips = RecentTipsBuffer(
+    size=int(os.environ.get('RECENT_TIPS_BUFFER', 50)),
+    serialize=orjson.dumps
+)
+TIPS_PAGE_MAX = int(os.environ.get('TIPS_PAGE_MAX', 100))
+
+recent_tips_flight = SingleFlight()
+
+async def load_recent_tips() -> list:
+    rows = await transactions.recent_paid(recent_tips.size)
+    return [(row_key(tip), tip_projection(tip)) for tip in rows]
+
+async def warm_recent_tips():
+    # Cold requests arriving together share one query
+    await recent_tips_flight.do("warm", lambda: recent_tips.warm(load_recent_tips))
+
+# Totals, rollups and leaderboard for /tips/stats
+tip_stats = TipStats(top_k=int(os.environ.get('TIP_STATS_TOP_K', 10)))
+stats_flight = SingleFlight()
+
+async def rebuild_tip_stats():
+    await tip_stats.rebuild(transactions.iter_paid("id, session_id, amount, tipper_name, timestamp"))
+
+PAID_FIELDS = ('id', 'session_id', 'status', 'payment_status', 'amount', 'currency', 'message', 'tipper_name', 'timestamp')
+
+def apply_tip_paid(transaction: dict):
+    """Update this worker's caches for a newly paid transaction"""
+    recent_tips.add(row_key(transaction), tip_projection(transaction))
+    tip_stats.add(transaction)
+    cache_checkout_status(status_from_row(transaction))
+
+def on_tip_paid(transaction: dict):
+    """Called once for every transaction that has just become paid"""
+    apply_tip_paid(transaction)
+    tip_events.publish({
+        "amount": transaction['amount'],
+        "message": transaction.get('message'),
+        "tipper_name": transaction.get('tipper_name'),
+        "timestamp": transaction.get('timestamp'),
+    })
+    worker_bus.publish("tip_paid", {
+        "transaction": {field: transaction.get(field) for field in PAID_FIELDS},
+    })
+
+def on_peer_tip_paid(message: dict):
+    apply_tip_paid(message["transaction"])
+    # The live event is already in the shared log
+    tip_events.sync()
+
+
+async def apply_webhook_event(event: dict):
+    """Apply one queued Stripe event to payment_transactions (idempotent)"""
+    if event['payment_status'] == "paid":
+        paid = await transactions.mark_paid(event['session_id'], "completed")
+        if paid:
+            on_tip_paid(paid)
+    else:
+        await transactions.update_status(event['session_id'], "completed", event['payment_status'])
+
+# Other workers' paid transitions and profile edits
+worker_bus.on("tip_paid", on_peer_tip_paid)
+worker_bus.on("creator_changed", lambda _: profile_cache.invalidate())
+worker_bus.on("admin_changed", auth_service.forget_admin)
+worker_bus.on("login_attempt", login_attempts.record)
+worker_bus.on("login_succeeded", login_attempts.forget)
+
+# Verified webhook events are persisted locally and applied in the background
+webhook_queue = WebhookQueue()
+webhook_worker = WebhookWorker(webhook_queue, apply_webhook_event)
+
+async def lookup_checkout(session_id: str):
+    return await stripe_clients.get().get_checkout_status(session_id)
+
+# Settles pending transactions whose webhook and status polls never came;
+# one sweeper per host, picked by a lock file next to the worker bus
+reconciler = ReconciliationSweeper(
+    transactions, lookup_checkout, on_tip_paid, lock_path=f"{worker_bus.directory}-reconcile.lock"
+)
+
+
 # Routes
 @api_router.get("/")
 async def root():
     return {"message": "Tipping Page API with Supabase"}
 
+PROFILE_DEFAULTS = CreatorProfile().model_dump()
+
+def profile_projection(row: Optional[dict]) -> dict:
+    """CreatorProfile fields of a creator_profile row, without re-validating it"""
+    if not row:
+        return dict(PROFILE_DEFAULTS)
+    return {field: row[field] if row.get(field) is not None else default
+            for field, default in PROFILE_DEFAULTS.items()}
+
+async def load_creator_profile() -> dict:
+    return profile_projection(await profiles.get())
+
+STALE_FALLBACKS = Counter('stale_fallbacks', "Failed reads answered with the last known good value", ('route',))
+
+def unavailable(error: Exception, detail: str) -> HTTPException:
+    """503 telling the client when to try again"""
+    retry_after = error.retry_after if isinstance(error, CircuitOpenError) else 5
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(max(1, round(retry_after)))})
+
 @api_router.get("/creator", response_model=CreatorProfile)
-async def get_creator_profile():
+async def get_creator_profile(request: Request):
     try:
-        response = supabase.table('creator_profile').select("*").limit(1).execute()
-        if response.data and len(response.data) > 0:
-            return CreatorProfile(**response.data[0])
-        return CreatorProfile()
+        entry = await profile_cache.get_or_load(load_creator_profile)
     except Exception as e:
         logging.error(f"Error fetching creator profile: {str(e)}")
-        return CreatorProfile()
+        # An out-of-date profile beats an empty one
+        entry = profile_cache.last_good
+        if entry is None:
+            raise unavailable(e, "Creator profile unavailable")
+        STALE_FALLBACKS.labels('/api/creator').inc()
+    
+    headers = {"ETag": entry.etag, "Cache-Control": PROFILE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
 
 @api_router.post("/creator", response_model=CreatorProfile)
 async def update_creator_profile(profile_update: CreatorProfileUpdate):
     try:
-        # Get existing profile
-        response = supabase.table('creator_profile').select("*").limit(1).execute()
-        
-        if response.data and len(response.data) > 0:
-            # Update existing
-            existing = response.data[0]
-            update_data = profile_update.model_dump(exclude_none=True)
+        # Hold the cache lock so readers can't reload the old profile mid-write
+        async with profile_cache.lock:
+            # Update the profile, or create it if there is none, in one call
+            saved = await profiles.save(profile_update.model_dump(exclude_none=True))
+            profile = CreatorProfile(**saved)
             
-            updated = supabase.table('creator_profile').update(update_data).eq('id', existing['id']).execute()
-            return CreatorProfile(**updated.data[0])
-        else:
-            # Create new
-            new_profile = CreatorProfile()
-            update_data = profile_update.model_dump(exclude_none=True)
-            profile_dict = new_profile.model_dump()
-            profile_dict.update(update_data)
-            
-            created = supabase.table('creator_profile').insert(profile_dict).execute()
-            return CreatorProfile(**created.data[0])
+            profile_cache.set(profile.model_dump())
+            worker_bus.publish("creator_changed", None)
+            return profile
     except Exception as e:
+        profile_cache.invalidate()
         logging.error(f"Error updating creator profile: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+CHECKOUT_REPLAYS = Counter('checkout_session_replays', "Checkout session requests answered for an Idempotency-Key seen before")
+
 @api_router.post("/checkout/session")
-async def create_checkout_session(request: CheckoutRequest):
+async def create_checkout_session(
+    request: CheckoutRequest,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+):
+    """Start a Stripe checkout. Requests repeating an earlier Idempotency-Key
+    get that request's session instead of a new one."""
     # Validate amount first (before try block)
     if request.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
+    if idempotency_key is None:
+        return await start_checkout(request)
+    
+    fields = request.model_dump()
+    
+    async def first_request():
+        result = await start_checkout(request, idempotency_key)
+        checkout_replies.set(idempotency_key, (fields, result))
+        return fields, result
+    
+    reply = checkout_replies.get(idempotency_key)
+    if reply is None:
+        # Duplicates arriving while the first is in flight wait for its answer
+        reply = await checkout_flights.do(idempotency_key, first_request)
+    else:
+        CHECKOUT_REPLAYS.inc()
+    
+    original_fields, result = reply
+    if original_fields != fields:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different checkout")
+    return result
+
+async def create_stripe_checkout(origin_url: str, amount: float, metadata: Dict[str, str],
+                                 idempotency_key: Optional[str] = None) -> Tuple[str, str]:
+    """Create a Stripe checkout session; returns its id and URL"""
+    # Build webhook and redirect URLs
+    webhook_url = f"{origin_url}/api/webhook/stripe"
+    success_url = f"{origin_url}/success?session_id={{{{CHECKOUT_SESSION_ID}}}}"
+    cancel_url = f"{origin_url}"
+    
+    # Shared Stripe checkout client for this webhook URL
+    stripe_checkout = stripe_clients.get(webhook_url)
+    
+    # Create checkout session; Stripe answers a repeated key with the same session
+    session = await stripe_checkout.create_checkout_session(checkout_request(
+        amount=amount,
+        currency="usd",
+        success_url=success_url,
+        cancel_url=cancel_url,
+        metadata=metadata
+    ), idempotency_key=idempotency_key)
+    return session.session_id, session.url
+
+async def create_pooled_checkout(origin_url: str, amount: float) -> Tuple[str, str]:
+    # Nobody has asked for it yet; the tipper is recorded on the transaction row
+    return await create_stripe_checkout(origin_url, amount, {"source": "tipping_page", "pooled": "true"})
+
+# Ready-made sessions for the preset amounts, handed out without a Stripe call
+checkout_pool = CheckoutPool(create_pooled_checkout)
+
+def replay_checkout(request: CheckoutRequest, row: dict) -> dict:
+    """The checkout an earlier request with the same Idempotency-Key started"""
+    if (float(row['amount']), row['message'], row['tipper_name']) != (
+        request.amount, request.message, request.tipper_name or "Anonymous"
+    ):
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different checkout")
+    CHECKOUT_REPLAYS.inc()
+    return {"url": row['checkout_url'], "session_id": row['session_id']}
+
+async def start_checkout(request: CheckoutRequest, idempotency_key: Optional[str] = None) -> dict:
     try:
-        # Get Stripe API key
-        api_key = os.environ.get('STRIPE_API_KEY')
-        if not api_key:
+        if not stripe_clients.api_key:
             raise HTTPException(status_code=500, detail="Stripe API key not configured")
         
-        # Build webhook and redirect URLs
-        webhook_url = f"{request.origin_url}/api/webhook/stripe"
-        success_url = f"{request.origin_url}/success?session_id={{{{CHECKOUT_SESSION_ID}}}}"
-        cancel_url = f"{request.origin_url}"
-        
-        # Initialize Stripe checkout
-        stripe_checkout = StripeCheckout(api_key=api_key, webhook_url=webhook_url)
-        
-        # Prepare metadata
-        metadata = {
-            "source": "tipping_page",
-            "tipper_name": request.tipper_name or "Anonymous",
-            "message": request.message or ""
-        }
-        
-        # Create checkout session
-        checkout_request = CheckoutSessionRequest(
-            amount=request.amount,
-            currency="usd",
-            success_url=success_url,
-            cancel_url=cancel_url,
-            metadata=metadata
-        )
+        # Another worker may have seen this key; check before spending a session
+        if idempotency_key is not None:
+            row = await transactions.find_checkout(idempotency_key)
+            if row is not None:
+                return replay_checkout(request, row)
         
-        session: CheckoutSessionResponse = await stripe_checkout.create_checkout_session(checkout_request)
+        pooled = checkout_pool.take(request.origin_url, request.amount)
+        if pooled is not None:
+            _, session_id, url = pooled
+        else:
+            # Prepare metadata
+            metadata = {
+                "source": "tipping_page",
+                "tipper_name": request.tipper_name or "Anonymous",
+                "message": request.message or ""
+            }
+            session_id, url = await create_stripe_checkout(
+                request.origin_url, request.amount, metadata, idempotency_key
+            )
         
         # Create payment transaction record in Supabase
         transaction_data = {
             "id": str(uuid.uuid4()),
-            "session_id": session.session_id,
+            "session_id": session_id,
             "amount": request.amount,
             "currency": "usd",
             "message": request.message,
@@ -168,59 +447,106 @@ async def create_checkout_session(request: CheckoutRequest):
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        supabase.table('payment_transactions').insert(transaction_data).execute()
+        if idempotency_key is None:
+            await transactions.create(transaction_data)
+            return {"url": url, "session_id": session_id}
         
-        return {"url": session.url, "session_id": session.session_id}
+        # Whichever row claims the key first wins, should a retry on another
+        # worker have got past the check above at the same time
+        transaction_data.update(idempotency_key=idempotency_key, checkout_url=url)
+        row = await transactions.claim_checkout(transaction_data)
+        if row['session_id'] != session_id:
+            if pooled is not None:
+                checkout_pool.give_back(request.origin_url, request.amount, pooled)
+            return replay_checkout(request, row)
+        return {"url": url, "session_id": session_id}
         
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logging.error(f"Error creating checkout session: {str(e)}")
+        raise unavailable(e, "Checkout is temporarily unavailable")
     except Exception as e:
         logging.error(f"Error creating checkout session: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+STATUS_FIELDS = "session_id, status, payment_status, amount, currency"
+
+def status_from_row(transaction: dict) -> dict:
+    return {
+        "session_id": transaction['session_id'],
+        "status": transaction['status'],
+        "payment_status": transaction['payment_status'],
+        "amount": float(transaction['amount']),
+        "currency": transaction['currency']
+    }
+
+def cache_checkout_status(result: dict):
+    terminal = result["payment_status"] == "paid" or result["status"] == "expired"
+    checkout_statuses.set(
+        result["session_id"], result,
+        ttl=CHECKOUT_STATUS_TERMINAL_TTL if terminal else CHECKOUT_STATUS_PENDING_TTL
+    )
+
+async def fetch_checkout_status(session_id: str) -> dict:
+    # Find transaction in Supabase; once it is paid Stripe has nothing new to say
+    try:
+        transaction = await transactions.get_by_session(session_id, STATUS_FIELDS)
+    except Exception as e:
+        # Stripe can still answer; the webhook and the sweeper record the payment
+        logging.error(f"Error reading transaction {session_id}, asking Stripe only: {str(e)}")
+        transaction = None
+    if transaction and transaction.get("payment_status") == "paid":
+        return status_from_row(transaction)
+    
+    # Webhook URL not needed for status check
+    stripe_checkout = stripe_clients.get()
+    
+    # Get checkout status from Stripe
+    checkout_status = await stripe_checkout.get_checkout_status(session_id)
+    
+    # A single conditional UPDATE ... WHERE payment_status <> 'paid' RETURNING,
+    # so only one of this poll, the webhook and the sweeper sees the transition
+    if transaction and checkout_status.payment_status == "paid":
+        paid = await transactions.mark_paid(session_id, checkout_status.status)
+        if paid:
+            on_tip_paid(paid)
+    
+    return {
+        "session_id": session_id,
+        "status": checkout_status.status,
+        "payment_status": checkout_status.payment_status,
+        "amount": checkout_status.amount_total / 100,  # Convert from cents
+        "currency": checkout_status.currency
+    }
+
 @api_router.get("/checkout/status/{session_id}")
 async def get_checkout_status(session_id: str):
+    cached = checkout_statuses.get(session_id)
+    if cached is not None:
+        return ORJSONResponse(cached)
+    
     try:
-        # Get Stripe API key
-        api_key = os.environ.get('STRIPE_API_KEY')
-        if not api_key:
+        if not stripe_clients.api_key:
             raise HTTPException(status_code=500, detail="Stripe API key not configured")
         
-        # Initialize Stripe checkout
-        webhook_url = ""  # Not needed for status check
-        stripe_checkout = StripeCheckout(api_key=api_key, webhook_url=webhook_url)
-        
-        # Get checkout status from Stripe
-        checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
-        
-        # Find transaction in Supabase
-        response = supabase.table('payment_transactions').select("*").eq('session_id', session_id).execute()
-        
-        if response.data and len(response.data) > 0:
-            transaction = response.data[0]
-            # Only update if payment status changed to paid and not already processed
-            if checkout_status.payment_status == "paid" and transaction.get("payment_status") != "paid":
-                supabase.table('payment_transactions').update({
-                    "status": checkout_status.status,
-                    "payment_status": checkout_status.payment_status
-                }).eq('session_id', session_id).execute()
-        
-        return {
-            "session_id": session_id,
-            "status": checkout_status.status,
-            "payment_status": checkout_status.payment_status,
-            "amount": checkout_status.amount_total / 100,  # Convert from cents
-            "currency": checkout_status.currency
-        }
+        # Concurrent polls for the same session share one upstream call
+        result = await status_flights.do(session_id, lambda: fetch_checkout_status(session_id))
+        cache_checkout_status(result)
+        return ORJSONResponse(result)
         
+    except CircuitOpenError as e:
+        logging.error(f"Error checking payment status: {str(e)}")
+        raise unavailable(e, "Payment status unavailable")
     except Exception as e:
         logging.error(f"Error checking payment status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
+    received_at = time.perf_counter()
     try:
-        # Get Stripe API key
-        api_key = os.environ.get('STRIPE_API_KEY')
-        if not api_key:
+        if not stripe_clients.api_key:
             raise HTTPException(status_code=500, detail="Stripe API key not configured")
         
         # Get raw body and signature
@@ -230,47 +556,120 @@ async def stripe_webhook(request: Request):
         if not signature:
             raise HTTPException(status_code=400, detail="Missing Stripe signature")
         
-        # Initialize Stripe checkout
-        webhook_url = ""  # Already set during initialization
-        stripe_checkout = StripeCheckout(api_key=api_key, webhook_url=webhook_url)
+        # Webhook URL already set during session creation
+        stripe_checkout = stripe_clients.get()
         
         # Handle webhook
         webhook_response = await stripe_checkout.handle_webhook(body, signature)
         
-        # Update transaction based on webhook event
+        # Queue the transaction update; the worker applies it to Supabase
         if webhook_response.event_type == "checkout.session.completed":
-            supabase.table('payment_transactions').update({
-                "status": "completed",
-                "payment_status": webhook_response.payment_status
-            }).eq('session_id', webhook_response.session_id).execute()
-        
+            webhook_queue.enqueue(
+                webhook_response.event_id,
+                webhook_response.event_type,
+                webhook_response.session_id,
+                webhook_response.payment_status
+            )
+        
+        webhook_queue.record_ack(time.perf_counter() - received_at)
         return {"status": "success"}
         
+    except sqlite3.OperationalError as e:
+        # Queue busy in another worker; Stripe retries the delivery
+        logging.error(f"Error queueing webhook: {str(e)}")
+        raise HTTPException(status_code=503, detail="Webhook queue busy", headers={"Retry-After": "1"})
     except Exception as e:
         logging.error(f"Error handling webhook: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/tips/recent", response_model=List[TipResponse])
-async def get_recent_tips(limit: int = 10):
+async def get_recent_tips(limit: int = Query(10, ge=1, le=TIPS_PAGE_MAX), cursor: Optional[str] = None):
+    """Newest paid tips first. When more may follow, X-Next-Cursor holds the
+    cursor for the next page."""
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        # Get successful tips only
-        response = supabase.table('payment_transactions').select(
-            "amount, message, tipper_name, timestamp"
-        ).eq('payment_status', 'paid').order('timestamp', desc=True).limit(limit).execute()
-        
-        tips = []
-        for tip in response.data:
-            tips.append(TipResponse(
-                amount=tip['amount'],
-                message=tip.get('message'),
-                tipper_name=tip.get('tipper_name'),
-                timestamp=datetime.fromisoformat(tip['timestamp'].replace('Z', '+00:00'))
-            ))
-        
-        return tips
+        if not recent_tips.warmed:
+            await warm_recent_tips()
+        
+        page = recent_tips.body(limit, after)
+        if page is None:
+            # Reaches past the buffer: one keyset query, one row extra to see if more follow
+            rows = await transactions.recent_paid(limit + 1, after)
+            next_key = row_key(rows[limit - 1]) if len(rows) > limit else None
+            page = recent_tips.serialize([tip_projection(tip) for tip in rows[:limit]]), next_key
+        
+        body, next_key = page
+        headers = {"X-Next-Cursor": encode_cursor(next_key)} if next_key is not None else None
+        return Response(body, media_type="application/json", headers=headers)
     except Exception as e:
         logging.error(f"Error fetching recent tips: {str(e)}")
-        return []
+        raise unavailable(e, "Recent tips unavailable")
+
+@api_router.get("/tips/stats")
+async def get_tip_stats():
+    """Running total, hourly/daily rollups and top tippers"""
+    try:
+        if not tip_stats.built:
+            await stats_flight.do("rebuild", rebuild_tip_stats)
+        return Response(tip_stats.body(datetime.now(timezone.utc)), media_type="application/json")
+    except Exception as e:
+        logging.error(f"Error fetching tip stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch tip stats")
+
+@api_router.get("/tips/stream")
+async def stream_tips(request: Request, last_event_id: Optional[str] = None):
+    """Server-sent events feed of newly paid tips"""
+    subscriber = tip_events.subscribe(
+        parse_event_id(request.headers.get("last-event-id") or last_event_id)
+    )
+    
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                event = await next_event(subscriber, TIP_STREAM_HEARTBEAT)
+                if event is None:
+                    # Too far behind; the client reconnects with Last-Event-ID
+                    break
+                if event is False:
+                    if await request.is_disconnected():
+                        break
+                    yield b": heartbeat\n\n"
+                    continue
+                yield event.sse
+        finally:
+            tip_events.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@api_router.websocket("/tips/ws")
+async def tips_websocket(websocket: WebSocket, last_event_id: Optional[str] = None):
+    """WebSocket variant of /tips/stream"""
+    await websocket.accept()
+    subscriber = tip_events.subscribe(parse_event_id(last_event_id))
+    try:
+        while True:
+            event = await next_event(subscriber, TIP_STREAM_HEARTBEAT)
+            if event is None:
+                break
+            if event is False:
+                await websocket.send_text('{"type": "heartbeat"}')
+                continue
+            await websocket.send_text(event.data)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tip_events.unsubscribe(subscriber)
 
 
 # Admin Authentication Models
@@ -279,7 +678,6 @@ class AdminLoginRequest(BaseModel):
     password: str
 
 class AdminPasswordChangeRequest(BaseModel):
-    admin_id: int
     current_password: str
     new_password: str
 
@@ -287,12 +685,50 @@ class VerifyPasswordChangeRequest(BaseModel):
     token: str
     new_password: str
 
+class AdminRefreshRequest(BaseModel):
+    refresh_token: str
+
+
+admin_bearer = HTTPBearer(auto_error=False)
+
+async def session_admin(token: str, kind: str = 'access') -> Optional[dict]:
+    """The admin a session token belongs to; 503 if their record can't be read"""
+    try:
+        return await auth_service.admin_from_token(token, kind)
+    except Exception as e:
+        logging.error(f"Error loading admin for session: {str(e)}")
+        raise unavailable(e, "Admin sessions are temporarily unavailable")
+
+async def require_admin(credentials: Optional[HTTPAuthorizationCredentials] = Depends(admin_bearer)) -> dict:
+    """The admin behind a session token; an HMAC check plus the cached admin record"""
+    admin = await session_admin(credentials.credentials) if credentials else None
+    if not admin:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired session",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return admin
+
+def admin_changed(admin_id: int):
+    """Drop the admin's cached record here and in the other workers"""
+    auth_service.forget_admin(admin_id)
+    worker_bus.publish("admin_changed", admin_id)
+
 
 # Admin Authentication Routes
 @api_router.post("/admin/login")
-async def admin_login(login_data: AdminLoginRequest):
+async def admin_login(login_data: AdminLoginRequest, request: Request):
     """Admin login endpoint"""
-    admin = await auth_service.authenticate_admin(login_data.email, login_data.password)
+    login_attempts.check(request, login_data.email)
+    
+    try:
+        admin = await auth_service.authenticate_admin(login_data.email, login_data.password)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error authenticating admin: {str(e)}")
+        raise unavailable(e, "Login is temporarily unavailable")
     
     if not admin:
         raise HTTPException(
@@ -300,25 +736,43 @@ async def admin_login(login_data: AdminLoginRequest):
             detail="Invalid email or password"
         )
     
+    login_attempts.succeeded(login_data.email)
     return {
         "success": True,
         "admin": {
             "id": admin['id'],
             "email": admin['email']
-        }
+        },
+        **auth_service.issue_session(admin)
+    }
+
+@api_router.post("/admin/refresh")
+async def refresh_admin_session(refresh_data: AdminRefreshRequest):
+    """Exchange a refresh token for a new session"""
+    admin = await session_admin(refresh_data.refresh_token, 'refresh')
+    if not admin:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return {
+        "success": True,
+        "admin": {
+            "id": admin['id'],
+            "email": admin['email']
+        },
+        **auth_service.issue_session(admin)
     }
 
 @api_router.post("/admin/change-password")
-async def change_admin_password(password_data: AdminPasswordChangeRequest):
-    """Change admin password directly (no email verification)"""
+async def change_admin_password(
+    password_data: AdminPasswordChangeRequest,
+    request: Request,
+    admin: dict = Depends(require_admin),
+):
+    """Change the signed-in admin's password directly (no email verification)"""
     try:
         # Verify current password
-        admin_email = await auth_service.get_admin_email(password_data.admin_id)
-        if not admin_email:
-            raise HTTPException(status_code=404, detail="Admin not found")
+        login_attempts.check(request, admin['email'])
         
-        admin = await auth_service.authenticate_admin(admin_email, password_data.current_password)
-        if not admin:
+        if not await auth_service.verify_password(password_data.current_password, admin['hashed_password']):
             raise HTTPException(status_code=401, detail="Current password is incorrect")
         
         # Validate new password
@@ -329,13 +783,15 @@ async def change_admin_password(password_data: AdminPasswordChangeRequest):
             raise HTTPException(status_code=400, detail="New password must be different from current password")
         
         # Hash and update password directly
-        hashed_password = auth_service.hash_password(password_data.new_password)
+        hashed_password = await auth_service.hash_password(password_data.new_password)
         
-        from datetime import datetime, timezone
-        supabase.table('admin_users').update({
-            'hashed_password': hashed_password,
-            'updated_at': datetime.now(timezone.utc).isoformat()
-        }).eq('id', password_data.admin_id).execute()
+        await admins.update_password(
+            admin['id'],
+            hashed_password,
+            datetime.now(timezone.utc).isoformat()
+        )
+        # Sessions issued under the old password stop verifying
+        admin_changed(admin['id'])
         
         return {
             "success": True,
@@ -348,24 +804,22 @@ async def change_admin_password(password_data: AdminPasswordChangeRequest):
         raise HTTPException(status_code=500, detail="Failed to change password")
 
 @api_router.post("/admin/verify-password-change")
-async def verify_password_change(verify_data: VerifyPasswordChangeRequest):
+async def verify_password_change(verify_data: VerifyPasswordChangeRequest, request: Request):
     """Verify token and complete password change"""
     try:
-        # Get token data to get admin email before changing password
-        response = supabase.table('password_change_tokens').select('*, admin_users(email)').eq('token', verify_data.token).eq('used', False).execute()
-        
-        if response.data and len(response.data) > 0:
-            admin_email = response.data[0]['admin_users']['email']
-        else:
-            admin_email = None
+        # The new password is hashed before the token is checked, so cap
+        # how much bcrypt work one client can ask for
+        login_attempts.check(request, None)
         
         # Verify and change password
-        success = await auth_service.verify_and_change_password(verify_data.token, verify_data.new_password)
+        admin = await auth_service.verify_and_change_password(verify_data.token, verify_data.new_password)
+        changed_at = datetime.now(timezone.utc).isoformat()
+        admin_changed(admin['id'])
         
-        if success and admin_email:
-            # Send confirmation email
+        if admin.get('email'):
+            # Queue confirmation email; delivery happens in the background
             try:
-                email_service.send_password_changed_confirmation(admin_email)
+                email_service.send_password_changed_confirmation(admin['email'], admin['id'], changed_at)
             except Exception as e:
                 logging.error(f"Failed to send confirmation email: {str(e)}")
         
@@ -380,36 +834,123 @@ async def verify_password_change(verify_data: VerifyPasswordChangeRequest):
         raise HTTPException(status_code=500, detail="Failed to change password")
 
 @api_router.get("/admin/profile/{admin_id}")
-async def get_admin_profile(admin_id: int):
-    """Get admin profile"""
+async def get_admin_profile(admin_id: int, admin: dict = Depends(require_admin)):
+    """Get the signed-in admin's profile"""
+    if admin_id != admin['id']:
+        raise HTTPException(status_code=403, detail="Not your profile")
+    return {
+        "id": admin['id'],
+        "email": admin['email'],
+        "created_at": admin.get('created_at')
+    }
+
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 1000))
+TRANSACTIONS_EXPORTED = Counter('transactions_exported', "payment_transactions rows streamed by admin exports")
+
+@api_router.get("/admin/transactions/export")
+async def export_transactions(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    payment_status: Optional[List[str]] = Query(None),
+    admin: dict = Depends(require_admin),
+):
+    """Stream payment_transactions (oldest first) as NDJSON or CSV.
+
+    ``start`` is inclusive and ``end`` exclusive; times without an offset are
+    UTC. Repeat ``payment_status`` to export several statuses.
+    """
+    start, end = (
+        moment.replace(tzinfo=timezone.utc) if moment is not None and moment.tzinfo is None else moment
+        for moment in (start, end)
+    )
+    pages = transactions.pages(
+        ", ".join(export.EXPORT_COLUMNS), payment_status, start, end, page_size=EXPORT_PAGE_SIZE
+    )
     try:
-        response = supabase.table('admin_users').select('id, email, created_at').eq('id', admin_id).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(status_code=404, detail="Admin not found")
-        
-        return response.data[0]
-    except HTTPException:
-        raise
+        # Fetch the first page up front so a failing database is a 500, not an empty file
+        first = await pages.__anext__()
+    except StopAsyncIteration:
+        first = []
     except Exception as e:
-        logging.error(f"Error fetching admin profile: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to fetch profile")
-
-
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+        logging.error(f"Error exporting transactions: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to export transactions")
+
+    media_type, extension = export.FORMATS[fmt]
+    logging.info(f"Admin {admin['email']} exporting transactions as {fmt}")
+    return StreamingResponse(
+        export.encode(fmt, first, pages, on_rows=TRANSACTIONS_EXPORTED.inc),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{extension}"'}
+    )
+
+
+# Component stats, read when /metrics is scraped
+Gauge('tip_stream_subscribers', "Connected live tip subscribers", fn=lambda: len(tip_events.subscribers))
+Gauge('checkout_status_cache_entries', "Cached checkout status answers", fn=lambda: len(checkout_statuses))
+Gauge('checkout_pool_sessions', "Pre-created checkout sessions ready to hand out", fn=lambda: len(checkout_pool))
+Gauge('bcrypt_in_flight', "bcrypt operations running or queued", fn=lambda: auth_service.hasher.in_flight)
+Gauge('webhook_queue_depth', "Webhook events waiting to be applied", fn=lambda: webhook_queue.depth())
+Gauge('webhook_dead_letters', "Webhook events that exhausted their retries", fn=lambda: webhook_queue.dead_letter_count())
+Counter('webhook_events_applied', "Webhook events applied to Supabase", fn=lambda: webhook_queue.applied)
+Counter('webhook_events_retried', "Webhook event attempts scheduled for retry", fn=lambda: webhook_queue.retried)
+Gauge('email_outbox_depth', "Emails waiting to be delivered", fn=lambda: email_service.outbox.depth())
+Counter('emails_sent', "Emails delivered through resend", fn=lambda: email_service.outbox.sent)
+Counter('emails_failed', "Emails that exhausted their retries", fn=lambda: email_service.outbox.failed)
+Counter('emails_deduped', "Duplicate emails dropped at enqueue", fn=lambda: email_service.outbox.deduped)
+Counter('tx_write_requests', "payment_transactions writes submitted", fn=lambda: transactions.writes.submitted)
+Counter('tx_write_round_trips', "Database requests made to flush payment_transactions writes", fn=lambda: transactions.writes.requests)
+Counter('tx_write_flushes', "payment_transactions write batches flushed", fn=lambda: transactions.writes.flushes)
+Counter('tx_write_rows', "payment_transactions rows written by batches", fn=lambda: transactions.writes.rows_flushed)
+Counter('worker_bus_sent', "Messages sent to sibling workers", fn=lambda: worker_bus.sent)
+Counter('worker_bus_received', "Messages received from sibling workers", fn=lambda: worker_bus.received)
+Counter('worker_bus_dropped', "Messages a sibling worker could not accept", fn=lambda: worker_bus.dropped)
+Counter('login_rejected_ip', "Admin credential checks refused by the per-IP limit", fn=lambda: login_attempts.by_ip.rejected)
+Counter('login_rejected_email', "Admin credential checks refused by the per-email limit", fn=lambda: login_attempts.by_email.rejected)
+Gauge('process_max_resident_memory_bytes', "Peak resident memory of this worker", fn=peak_rss)
+
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+def create_app() -> FastAPI:
+    """Build the ASGI app. Clients and integrations are created on first use,
+    so this needs no credentials and makes no network calls."""
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # Create the main app without a prefix
+    app = FastAPI(lifespan=lifespan)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+    
+    # Include the router in the main app
+    app.include_router(api_router)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+
+_app: Optional[FastAPI] = None
+
+def __getattr__(name: str):
+    # `uvicorn server:app` builds the app on first access rather than at import
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
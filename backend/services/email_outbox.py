@@ -0,0 +1,255 @@
+"""
+Persistent outbox for transactional email.
+
+Callers enqueue a rendered message and return immediately; EmailSender
+delivers in the background over a shared keep-alive connection with bounded
+concurrency and exponential backoff.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from metrics import upstream
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    sent_at REAL,
+    failed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(sent_at, failed_at, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_dedupe ON email_outbox(dedupe_key, created_at);
+"""
+
+# Every worker on the host shares the file, and waiting for its lock blocks
+# the event loop: give up quickly and try again on the next poll instead
+BUSY_TIMEOUT = 0.05
+
+
+class SessionHTTPClient:
+    """resend HTTP client that reuses connections instead of one per send"""
+
+    def __init__(self, timeout: float = 30, pool_size: int = 4):
+        import requests
+
+        self._timeout = timeout
+        self._errors = requests.RequestException
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping[str, str],
+        json: Optional[Union[Dict[str, object], List[object]]] = None,
+    ) -> Tuple[bytes, int, Mapping[str, str]]:
+        try:
+            resp = self.session.request(method=method, url=url, headers=headers, json=json, timeout=self._timeout)
+            return resp.content, resp.status_code, resp.headers
+        except self._errors as e:
+            raise RuntimeError(f"Request failed: {e}") from e
+
+    def close(self):
+        self.session.close()
+
+
+class EmailOutbox:
+    """SQLite (WAL) backed outbox with per-event dedupe"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dedupe_window: float = 600,
+        max_attempts: int = 10,
+        lease: float = 120,
+    ):
+        self.path = path or os.environ.get(
+            'EMAIL_OUTBOX_PATH', str(Path(__file__).parent.parent / 'email_outbox.db')
+        )
+        self.dedupe_window = dedupe_window
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.conn: Optional[sqlite3.Connection] = None
+        self.wakeup = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+        self.deduped = 0
+
+    def open(self):
+        """Connect from the event loop thread, which is the only user"""
+        self.conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def enqueue(self, params: dict, key: Optional[str] = None) -> Optional[int]:
+        """Queue a message; returns None if it is a duplicate.
+
+        ``key`` names the event the message is for: a message whose key was
+        queued or sent within the dedupe window is dropped. Without a key an
+        identical message still waiting to go out is dropped, but one that
+        was already sent is not, since the same text can announce a new event.
+        """
+        body = json.dumps(params, sort_keys=True)
+        now = time.time()
+        if key is not None:
+            dedupe_key = key
+            duplicate = self.conn.execute(
+                'SELECT 1 FROM email_outbox WHERE dedupe_key = ? AND failed_at IS NULL '
+                'AND created_at > ? LIMIT 1',
+                (dedupe_key, now - self.dedupe_window)
+            ).fetchone()
+        else:
+            dedupe_key = hashlib.sha256(body.encode('utf-8')).hexdigest()
+            duplicate = self.conn.execute(
+                'SELECT 1 FROM email_outbox WHERE dedupe_key = ? AND failed_at IS NULL '
+                'AND sent_at IS NULL LIMIT 1',
+                (dedupe_key,)
+            ).fetchone()
+        if duplicate:
+            self.deduped += 1
+            return None
+        cursor = self.conn.execute(
+            'INSERT INTO email_outbox (dedupe_key, recipient, params, created_at, next_attempt_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (dedupe_key, params['to'], body, now, now)
+        )
+        self.wakeup.set()
+        return cursor.lastrowid
+
+    def claim(self, limit: int) -> List[dict]:
+        """Lease due messages to this process so sibling workers skip them"""
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self.conn.execute(
+                'SELECT id, params, attempts FROM email_outbox '
+                'WHERE sent_at IS NULL AND failed_at IS NULL AND next_attempt_at <= ? '
+                'ORDER BY id LIMIT ?',
+                (now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE email_outbox SET next_attempt_at = ? WHERE id = ?',
+                [(now + self.lease, row[0]) for row in rows]
+            )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return [{'id': row[0], 'params': json.loads(row[1]), 'attempts': row[2]} for row in rows]
+
+    def mark_sent(self, message_id: int):
+        self.conn.execute(
+            'UPDATE email_outbox SET sent_at = ?, attempts = attempts + 1 WHERE id = ?',
+            (time.time(), message_id)
+        )
+        self.sent += 1
+
+    def mark_failed(self, message_id: int, attempts: int, error: str):
+        tries = attempts + 1
+        now = time.time()
+        if tries >= self.max_attempts:
+            self.conn.execute(
+                'UPDATE email_outbox SET attempts = ?, last_error = ?, failed_at = ? WHERE id = ?',
+                (tries, error, now, message_id)
+            )
+            self.failed += 1
+        else:
+            self.conn.execute(
+                'UPDATE email_outbox SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?',
+                (tries, error, now + min(5 * 2 ** tries, 3600), message_id)
+            )
+
+    def depth(self) -> int:
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM email_outbox WHERE sent_at IS NULL AND failed_at IS NULL'
+        ).fetchone()[0]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class EmailSender:
+    """Delivers queued messages through resend with bounded concurrency"""
+
+    def __init__(self, outbox: EmailOutbox, concurrency: Optional[int] = None, poll_interval: float = 5.0):
+        self.outbox = outbox
+        self.concurrency = concurrency or int(os.environ.get('EMAIL_SENDER_CONCURRENCY', 2))
+        self.poll_interval = poll_interval
+        self.http_client: Optional[SessionHTTPClient] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def _resend(self):
+        """Import and configure resend when the first message goes out"""
+        import resend
+
+        if self.http_client is None:
+            resend.api_key = os.environ.get('RESEND_API_KEY')
+            self.http_client = SessionHTTPClient(pool_size=self.concurrency)
+            resend.default_http_client = self.http_client
+        return resend
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.http_client:
+            self.http_client.close()
+
+    async def deliver(self, message: dict):
+        try:
+            resend = self._resend()
+            # The outbox id doubles as the idempotency key, so a retry after
+            # a lost response can't send the email twice
+            with upstream('resend', 'emails.send'):
+                await asyncio.to_thread(
+                    resend.Emails.send, message['params'], {"idempotency_key": f"outbox-{message['id']}"}
+                )
+            self.outbox.mark_sent(message['id'])
+        except Exception as e:
+            logging.error(f"Error sending email {message['id']}: {str(e)}")
+            self.outbox.mark_failed(message['id'], message['attempts'], str(e))
+
+    async def run(self):
+        while True:
+            try:
+                self.outbox.wakeup.clear()
+                batch = self.outbox.claim(self.concurrency)
+                if not batch:
+                    try:
+                        await asyncio.wait_for(self.outbox.wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await asyncio.gather(*(self.deliver(message) for message in batch))
+            except asyncio.CancelledError:
+                raise
+            except sqlite3.OperationalError as e:
+                # Another worker holds the lock; leased messages come back after the lease
+                logging.error(f"Email outbox busy, retrying on the next poll: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+            except Exception as e:
+                logging.error(f"Email sender error: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
@@ -1,20 +1,12 @@
-import resend
-import os
-from dotenv import load_dotenv
-from pathlib import Path
+import html
+from string import Template
+from typing import Optional
+from services.email_outbox import EmailOutbox, EmailSender
 
-ROOT_DIR = Path(__file__).parent.parent
-load_dotenv(ROOT_DIR / '.env')
+SENDER = "Tipping Page <onboarding@resend.dev>"
 
-resend.api_key = os.environ.get('RESEND_API_KEY')
-
-class EmailService:
-    @staticmethod
-    def send_password_change_verification(email: str, token: str, frontend_url: str):
-        """Send password change verification email"""
-        verification_link = f"{frontend_url}/admin/verify-password-change?token={token}"
-        
-        html_content = f"""
+# Templates are compiled once at import; only the link is substituted per send
+VERIFICATION_TEMPLATE = Template("""
         <html>
             <body style="font-family: Arial, sans-serif; background-color: #f4f4f4; padding: 20px;">
                 <div style="max-width: 600px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
@@ -22,32 +14,17 @@ class EmailService:
                     <p style="color: #666; line-height: 1.6;">You have requested to change your admin password.</p>
                     <p style="color: #666; line-height: 1.6;">Please click the button below to verify and complete the password change:</p>
                     <div style="text-align: center; margin: 30px 0;">
-                        <a href="{verification_link}" style="display: inline-block; padding: 12px 30px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; text-decoration: none; border-radius: 6px; font-weight: 600;">Verify Password Change</a>
+                        <a href="$verification_link" style="display: inline-block; padding: 12px 30px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; text-decoration: none; border-radius: 6px; font-weight: 600;">Verify Password Change</a>
                     </div>
                     <p style="color: #999; font-size: 14px; line-height: 1.6;">This link expires in 15 minutes. If you didn't request this change, please ignore this email.</p>
                     <p style="color: #999; font-size: 14px; margin-top: 20px;">Or copy and paste this link:</p>
-                    <p style="color: #667eea; font-size: 12px; word-break: break-all;">{verification_link}</p>
+                    <p style="color: #667eea; font-size: 12px; word-break: break-all;">$verification_link</p>
                 </div>
             </body>
         </html>
-        """
-        
-        try:
-            response = resend.Emails.send({
-                "from": "Tipping Page <onboarding@resend.dev>",
-                "to": email,
-                "subject": "Verify Your Password Change",
-                "html": html_content,
-            })
-            return response
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            raise
-    
-    @staticmethod
-    def send_password_changed_confirmation(email: str):
-        """Send confirmation email after password change"""
-        html_content = """
+        """)
+
+PASSWORD_CHANGED_HTML = """
         <html>
             <body style="font-family: Arial, sans-serif; background-color: #f4f4f4; padding: 20px;">
                 <div style="max-width: 600px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
@@ -59,18 +36,40 @@ class EmailService:
             </body>
         </html>
         """
-        
-        try:
-            response = resend.Emails.send({
-                "from": "Tipping Page <onboarding@resend.dev>",
-                "to": email,
-                "subject": "Password Changed Successfully",
-                "html": html_content,
-            })
-            return response
-        except Exception as e:
-            print(f"Error sending confirmation email: {str(e)}")
-            # Don't fail if confirmation email fails
-            pass
 
-email_service = EmailService()
\ No newline at end of file
+class EmailService:
+    """Renders transactional emails and queues them on the outbox"""
+
+    def __init__(self, outbox: Optional[EmailOutbox] = None):
+        self.outbox = outbox or EmailOutbox()
+        self.sender = EmailSender(self.outbox)
+
+    def send_password_change_verification(self, email: str, token: str, frontend_url: str) -> Optional[int]:
+        """Queue password change verification email"""
+        verification_link = f"{frontend_url}/admin/verify-password-change?token={token}"
+
+        return self.outbox.enqueue({
+            "from": SENDER,
+            "to": email,
+            "subject": "Verify Your Password Change",
+            "html": VERIFICATION_TEMPLATE.substitute(verification_link=html.escape(verification_link)),
+        }, key=f"password-change-verification:{token}")
+
+    def send_password_changed_confirmation(self, email: str, admin_id: int, changed_at: str) -> Optional[int]:
+        """Queue confirmation email after password change; one per change"""
+        return self.outbox.enqueue({
+            "from": SENDER,
+            "to": email,
+            "subject": "Password Changed Successfully",
+            "html": PASSWORD_CHANGED_HTML,
+        }, key=f"password-changed:{admin_id}:{changed_at}")
+
+    def start(self):
+        self.outbox.open()
+        self.sender.start()
+
+    async def stop(self):
+        await self.sender.stop()
+        self.outbox.close()
+
+email_service = EmailService()
@@ -0,0 +1,168 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from metrics import upstream
+from resilience import CircuitBreaker
+
+_checkout_class = None
+
+
+def unhealthy(error: BaseException) -> bool:
+    """Whether a failed call counts against the Stripe circuit breaker"""
+    status = getattr(error, 'http_status', None)
+    # A declined card or a bad request says nothing about Stripe's health,
+    # but rate limiting does
+    return not (isinstance(status, int) and status < 500 and status != 429)
+
+
+# Shared by every client: they all talk to the same Stripe
+breaker = CircuitBreaker('stripe', unhealthy)
+
+
+def session_params(request) -> dict:
+    """Stripe Checkout Session parameters for a CheckoutSessionRequest"""
+    params = {
+        "mode": "payment",
+        "line_items": [{
+            "price_data": {
+                "currency": request.currency,
+                "unit_amount": int(round(request.amount * 100)),
+                "product_data": {"name": "Tip"},
+            },
+            "quantity": 1,
+        }],
+        "success_url": request.success_url,
+        "cancel_url": request.cancel_url,
+        "metadata": request.metadata or {},
+    }
+    if request.payment_methods:
+        params["payment_method_types"] = request.payment_methods
+    return params
+
+
+def checkout_class():
+    """StripeCheckout subclass that records API calls as upstream metrics.
+
+    emergentintegrations and the stripe SDK are heavy to import, so they are
+    loaded the first time a client is needed rather than when the app starts.
+    """
+    global _checkout_class
+    if _checkout_class is None:
+        from emergentintegrations.payments.stripe.checkout import StripeCheckout
+
+        class TimedStripeCheckout(StripeCheckout):
+            def __init__(self, api_key: str, **kwargs):
+                super().__init__(api_key=api_key, **kwargs)
+                self._api_key = api_key
+
+            async def create_checkout_session(self, request, idempotency_key: Optional[str] = None):
+                # Created with the SDK rather than through StripeCheckout, which
+                # takes no request options, so the Idempotency-Key reaches Stripe
+                # as an argument of this call whatever thread sends it
+                import stripe
+                from emergentintegrations.payments.stripe.checkout import CheckoutSessionResponse
+
+                options = {"idempotency_key": idempotency_key} if idempotency_key else {}
+                with breaker.call(), upstream('stripe', 'create_checkout_session'):
+                    session = await stripe.checkout.Session.create_async(
+                        api_key=self._api_key, **options, **session_params(request)
+                    )
+                return CheckoutSessionResponse(url=session.url, session_id=session.id)
+
+            async def get_checkout_status(self, checkout_session_id):
+                with breaker.call(), upstream('stripe', 'get_checkout_status'):
+                    return await super().get_checkout_status(checkout_session_id)
+
+            async def handle_webhook(self, webhook_payload, signature):
+                with upstream('stripe', 'handle_webhook'):
+                    return await super().handle_webhook(webhook_payload, signature)
+
+        _checkout_class = TimedStripeCheckout
+    return _checkout_class
+
+
+def checkout_request(**fields):
+    from emergentintegrations.payments.stripe.checkout import CheckoutSessionRequest
+    return CheckoutSessionRequest(**fields)
+
+
+class StripeClientPool:
+    """Long-lived StripeCheckout clients shared across requests.
+
+    Checkout sessions need the caller's webhook URL, so one client is kept per
+    URL (bounded, least recently used evicted). All of them share a single
+    keep-alive HTTP connection pool with explicit connect/read timeouts, so
+    repeat checkouts skip the TCP and TLS handshake to Stripe. The pool is
+    built on first use.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_clients: int = 16,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None,
+    ):
+        self._api_key = api_key
+        self.max_clients = max_clients
+        self.connect_timeout = connect_timeout or float(os.environ.get('STRIPE_CONNECT_TIMEOUT', 3))
+        self.read_timeout = read_timeout or float(os.environ.get('STRIPE_READ_TIMEOUT', 15))
+        self.pool_size = pool_size or int(os.environ.get('STRIPE_POOL_SIZE', 10))
+        self._clients: "OrderedDict[str, object]" = OrderedDict()
+        self.session = None
+        self.http_client = None
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key or os.environ.get('STRIPE_API_KEY')
+
+    def open(self):
+        """Install the shared keep-alive HTTP client on the stripe SDK"""
+        if self.http_client is not None:
+            return
+        import httpx
+        import requests
+        import stripe
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.http_client = stripe.RequestsClient(
+            timeout=(self.connect_timeout, self.read_timeout),
+            session=self.session,
+            async_fallback_client=stripe.HTTPXClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            ),
+        )
+        stripe.default_http_client = self.http_client
+
+        # Point at a local stand-in for load tests
+        if os.environ.get('STRIPE_API_BASE'):
+            stripe.api_base = os.environ['STRIPE_API_BASE']
+
+    def get(self, webhook_url: str = ""):
+        """Return the shared client for a webhook URL, creating it on first use"""
+        if not self.api_key:
+            raise RuntimeError("Stripe API key not configured")
+
+        client = self._clients.get(webhook_url)
+        if client is not None:
+            self._clients.move_to_end(webhook_url)
+            return client
+
+        self.open()
+        client = checkout_class()(api_key=self.api_key, webhook_url=webhook_url)
+        self._clients[webhook_url] = client
+        if len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+        return client
+
+    async def close(self):
+        self._clients.clear()
+        if self.http_client is not None:
+            self.http_client.close()
+            await self.http_client.close_async()
+            self.http_client = None
@@ -67,6 +67,12 @@ def setup_tables():
     print(sql_commands)
     print("="*70 + "\n")
     
+    # Functions the backend calls over RPC; run once the admin tables exist too
+    print("📋 Then run supabase_functions.sql (database functions used by the backend):")
+    print("\n" + "="*70)
+    print((ROOT_DIR / 'supabase_functions.sql').read_text())
+    print("="*70 + "\n")
+    
     # Test connection
     try:
         response = supabase.table('creator_profile').select("*").limit(1).execute()
@@ -78,6 +84,14 @@ def setup_tables():
     except Exception as e:
         print(f"⚠️  Please run the SQL commands above in Supabase Dashboard")
         print(f"   Error: {str(e)}")
+    
+    # PostgREST answers 404 for a function that doesn't exist
+    try:
+        supabase.rpc('change_password_with_token', {'p_token': '', 'p_hashed_password': ''}).execute()
+        print("✅ Database functions are installed")
+    except Exception as e:
+        print(f"⚠️  Database functions missing - please run supabase_functions.sql")
+        print(f"   Error: {str(e)}")
 
 if __name__ == "__main__":
     setup_tables()
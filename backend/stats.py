@@ -0,0 +1,176 @@
+"""
+Incrementally maintained rollups of paid tips for /api/tips/stats.
+
+Built once from payment_transactions at startup, then updated on every paid
+transition, so answering never touches the table.
+"""
+import heapq
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterable, Dict, List, Optional, Tuple
+
+import orjson
+
+ANONYMOUS = 'anonymous'
+
+# How many of the last rows read by a rebuild are remembered: a tip paid just
+# as the scan read it arrives through add() moments later, while still listed
+SCAN_OVERLAP = 2048
+
+
+def parse_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class TopTippers:
+    """The ``k`` largest tipper totals, kept in a min-heap.
+
+    A tipper's total only ever grows, so someone outside the heap can only
+    enter by beating its smallest entry; each update is O(k) at worst.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap: List[Tuple[float, str]] = []
+        self.members: Dict[str, float] = {}
+
+    def update(self, key: str, total: float):
+        if key in self.members:
+            self.heap[self.heap.index((self.members[key], key))] = (total, key)
+            heapq.heapify(self.heap)
+        elif len(self.heap) < self.k:
+            heapq.heappush(self.heap, (total, key))
+        elif total > self.heap[0][0]:
+            _, evicted = heapq.heapreplace(self.heap, (total, key))
+            del self.members[evicted]
+        else:
+            return
+        self.members[key] = total
+
+    def ranked(self) -> List[str]:
+        return [key for _, key in sorted(self.heap, reverse=True)]
+
+
+class TipStats:
+    """Totals, hourly/daily buckets (UTC) and a top-tippers leaderboard"""
+
+    def __init__(self, top_k: int = 10, hours: int = 48, days: int = 90):
+        self.top_k = top_k
+        self.hours = hours
+        self.days = days
+        self.built = False
+        self.total_amount = 0.0
+        self.total_count = 0
+        self.hourly: Dict[datetime, List[float]] = {}
+        self.daily: Dict[datetime, List[float]] = {}
+        self.tippers: Dict[str, List] = {}
+        self.top = TopTippers(top_k)
+        self._pending: Optional[Dict[str, dict]] = None
+        self._scanned: Optional[deque] = None
+        self._body: Optional[bytes] = None
+        self._body_hour: Optional[datetime] = None
+
+    async def rebuild(self, rows: AsyncIterable[dict]):
+        """Recount from every paid row; tips that land while reading are kept.
+
+        ``rows`` is one keyset scan, so it yields each row once. A tip paid
+        while it runs can be both read by the scan and passed to ``add``;
+        it is counted once, by whichever saw it first.
+        """
+        fresh = TipStats(self.top_k, self.hours, self.days)
+        self._pending = {}
+        self._scanned = deque(maxlen=SCAN_OVERLAP)
+        try:
+            async for row in rows:
+                if row['session_id'] not in self._pending:
+                    self._scanned.append(row['session_id'])
+                    fresh._add(row)
+            for row in self._pending.values():
+                fresh._add(row)
+        finally:
+            self._pending = None
+            self._scanned = None
+        self.total_amount, self.total_count = fresh.total_amount, fresh.total_count
+        self.hourly, self.daily = fresh.hourly, fresh.daily
+        self.tippers, self.top = fresh.tippers, fresh.top
+        self._body = None
+        self.built = True
+
+    def add(self, row: dict):
+        if self._pending is not None and row['session_id'] not in self._scanned:
+            self._pending[row['session_id']] = row
+        if self.built:
+            self._add(row)
+
+    def _add(self, row: dict):
+        amount = float(row['amount'])
+        moment = parse_timestamp(row['timestamp']).astimezone(timezone.utc)
+        hour = moment.replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+
+        self.total_amount += amount
+        self.total_count += 1
+        self._bump(self.hourly, hour, amount, self.hours)
+        self._bump(self.daily, day, amount, self.days)
+
+        name = (row.get('tipper_name') or '').strip()
+        key = name.lower()
+        if key and key != ANONYMOUS:
+            tipper = self.tippers.setdefault(key, [0.0, 0, name])
+            tipper[0] += amount
+            tipper[1] += 1
+            self.top.update(key, tipper[0])
+        self._body = None
+
+    @staticmethod
+    def _bump(buckets: Dict[datetime, List[float]], key: datetime, amount: float, keep: int):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [0.0, 0]
+            if len(buckets) > keep:
+                for old in sorted(buckets)[:len(buckets) - keep]:
+                    del buckets[old]
+        bucket[0] += amount
+        bucket[1] += 1
+
+    def snapshot(self, now: datetime) -> dict:
+        hour = now.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+
+        def bucket(buckets, key):
+            amount, count = buckets.get(key, (0.0, 0))
+            return {"amount": round(amount, 2), "count": count}
+
+        return {
+            "total": {"amount": round(self.total_amount, 2), "count": self.total_count},
+            "this_hour": bucket(self.hourly, hour),
+            "today": bucket(self.daily, day),
+            "last_24_hours": {
+                "amount": round(sum(self.hourly.get(hour - timedelta(hours=n), (0.0, 0))[0] for n in range(24)), 2),
+                "count": sum(self.hourly.get(hour - timedelta(hours=n), (0.0, 0))[1] for n in range(24)),
+            },
+            "hourly": [
+                {"start": (hour - timedelta(hours=n)).isoformat(), **bucket(self.hourly, hour - timedelta(hours=n))}
+                for n in reversed(range(24))
+            ],
+            "daily": [
+                {"start": (day - timedelta(days=n)).isoformat(), **bucket(self.daily, day - timedelta(days=n))}
+                for n in reversed(range(30))
+            ],
+            "top_tippers": [
+                {"tipper_name": self.tippers[key][2], "amount": round(self.tippers[key][0], 2), "count": self.tippers[key][1]}
+                for key in self.top.ranked()
+            ],
+        }
+
+    def body(self, now: datetime) -> bytes:
+        """Serialized snapshot, reused until a tip lands or the hour turns"""
+        hour = now.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        if self._body is None or self._body_hour != hour:
+            self._body = orjson.dumps(self.snapshot(now))
+            self._body_hour = hour
+        return self._body
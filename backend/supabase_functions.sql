@@ -0,0 +1,62 @@
+-- Postgres functions the backend calls over PostgREST RPC.
+-- Each replaces a read-then-write sequence with one atomic round trip.
+-- Run after the tables from SUPABASE_SETUP.md and SUPABASE_ADMIN_SETUP.md
+-- exist; re-running is safe.
+
+-- Apply a partial profile update, creating the profile with the column
+-- defaults if there is none yet. Keys missing from (or null in) the patch
+-- keep their current value.
+CREATE OR REPLACE FUNCTION update_creator_profile(patch JSONB)
+RETURNS SETOF creator_profile
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    target INTEGER;
+BEGIN
+    -- Concurrent first saves must not each insert a profile
+    PERFORM pg_advisory_xact_lock(hashtext('creator_profile'));
+
+    SELECT id INTO target FROM creator_profile ORDER BY id LIMIT 1;
+    IF target IS NULL THEN
+        INSERT INTO creator_profile DEFAULT VALUES RETURNING id INTO target;
+    END IF;
+
+    RETURN QUERY
+    UPDATE creator_profile SET
+        name = COALESCE(patch->>'name', name),
+        bio = COALESCE(patch->>'bio', bio),
+        avatar_url = COALESCE(patch->>'avatar_url', avatar_url),
+        social_links = COALESCE(NULLIF(patch->'social_links', 'null'::jsonb), social_links),
+        updated_at = NOW()
+    WHERE id = target
+    RETURNING *;
+END;
+$$;
+
+-- Spend an unused, unexpired password change token and set the new
+-- password. Returns the admin's id and email, or no row when the token is
+-- unknown, used or expired. The token is claimed with a row lock, so two
+-- concurrent requests can't both use it.
+CREATE OR REPLACE FUNCTION change_password_with_token(p_token TEXT, p_hashed_password TEXT)
+RETURNS TABLE (id INTEGER, email TEXT)
+LANGUAGE sql
+AS $$
+    WITH claimed AS (
+        UPDATE password_change_tokens SET used = TRUE
+        WHERE token = p_token AND NOT used AND expires_at > NOW()
+        RETURNING admin_id
+    )
+    UPDATE admin_users AS admin SET
+        hashed_password = p_hashed_password,
+        updated_at = NOW()
+    FROM claimed
+    WHERE admin.id = claimed.admin_id
+    RETURNING admin.id, admin.email;
+$$;
+
+-- Only the backend (service role) may call these; PostgREST would otherwise
+-- expose them to anyone holding the public anon key.
+REVOKE EXECUTE ON FUNCTION update_creator_profile(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION change_password_with_token(TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_creator_profile(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION change_password_with_token(TEXT, TEXT) TO service_role;
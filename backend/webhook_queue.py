@@ -0,0 +1,242 @@
+"""
+Durable local queue for Stripe webhook events.
+
+The webhook endpoint verifies the signature, appends the event here and
+acknowledges immediately; WebhookWorker applies queued events to
+payment_transactions in the background, retrying with backoff and moving
+events that keep failing to a dead-letter table.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from metrics import Histogram
+
+WEBHOOK_ACK = Histogram(
+    'webhook_ack_seconds', "Time from receiving a Stripe webhook to acknowledging it",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_events (
+    event_id TEXT PRIMARY KEY,
+    event_type TEXT NOT NULL,
+    session_id TEXT,
+    payment_status TEXT,
+    received_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    applied_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_events_due ON webhook_events(applied_at, next_attempt_at);
+
+CREATE TABLE IF NOT EXISTS webhook_dead_letters (
+    event_id TEXT PRIMARY KEY,
+    event_type TEXT NOT NULL,
+    session_id TEXT,
+    payment_status TEXT,
+    received_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+COLUMNS = ('event_id', 'event_type', 'session_id', 'payment_status', 'attempts')
+
+# Every worker on the host shares the file, and waiting for its lock blocks
+# the event loop: give up quickly and try again on the next poll instead
+BUSY_TIMEOUT = 0.05
+
+
+class WebhookQueue:
+    """SQLite (WAL) backed queue, deduplicated by Stripe event id"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        retention: float = 7 * 86400,
+        lease: float = 60,
+    ):
+        self.path = path or os.environ.get(
+            'WEBHOOK_QUEUE_PATH', str(Path(__file__).parent / 'webhook_queue.db')
+        )
+        self.max_attempts = max_attempts or int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+        self.retention = retention
+        self.lease = lease
+        self.conn: Optional[sqlite3.Connection] = None
+        self.wakeup = asyncio.Event()
+        self.applied = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def open(self):
+        """Connect from the event loop thread, which is the only user"""
+        self.conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def enqueue(self, event_id: str, event_type: str, session_id: Optional[str], payment_status: Optional[str]) -> bool:
+        """Persist an event; returns False if it was already received"""
+        now = time.time()
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO webhook_events '
+            '(event_id, event_type, session_id, payment_status, received_at, next_attempt_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (event_id, event_type, session_id, payment_status, now, now)
+        )
+        self.wakeup.set()
+        return cursor.rowcount == 1
+
+    def record_ack(self, seconds: float):
+        WEBHOOK_ACK.observe(seconds)
+
+    def claim(self, limit: int) -> List[dict]:
+        """Lease due events to this process so sibling workers skip them"""
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self.conn.execute(
+                'SELECT event_id, event_type, session_id, payment_status, attempts FROM webhook_events '
+                'WHERE applied_at IS NULL AND next_attempt_at <= ? ORDER BY received_at LIMIT ?',
+                (now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE webhook_events SET next_attempt_at = ? WHERE event_id = ?',
+                [(now + self.lease, row[0]) for row in rows]
+            )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def complete(self, applied: List[str], failed: Dict[str, str], attempts: Dict[str, int]):
+        """Record a batch outcome in one transaction"""
+        now = time.time()
+        self.conn.execute('BEGIN')
+        try:
+            self.conn.executemany(
+                'UPDATE webhook_events SET applied_at = ?, attempts = attempts + 1 WHERE event_id = ?',
+                [(now, event_id) for event_id in applied]
+            )
+            for event_id, error in failed.items():
+                tries = attempts[event_id] + 1
+                if tries >= self.max_attempts:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO webhook_dead_letters '
+                        'SELECT event_id, event_type, session_id, payment_status, received_at, ?, ?, ? '
+                        'FROM webhook_events WHERE event_id = ?',
+                        (tries, error, now, event_id)
+                    )
+                    self.conn.execute('DELETE FROM webhook_events WHERE event_id = ?', (event_id,))
+                    self.dead_lettered += 1
+                else:
+                    backoff = min(2 ** tries, 300)
+                    self.conn.execute(
+                        'UPDATE webhook_events SET attempts = ?, last_error = ?, next_attempt_at = ? '
+                        'WHERE event_id = ?',
+                        (tries, error, now + backoff, event_id)
+                    )
+                    self.retried += 1
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.applied += len(applied)
+
+    def depth(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM webhook_events WHERE applied_at IS NULL').fetchone()[0]
+
+    def dead_letter_count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM webhook_dead_letters').fetchone()[0]
+
+    def purge(self):
+        """Forget applied events older than the retention (dedupe window)"""
+        self.conn.execute(
+            'DELETE FROM webhook_events WHERE applied_at IS NOT NULL AND applied_at < ?',
+            (time.time() - self.retention,)
+        )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class WebhookWorker:
+    """Applies queued events in batches with bounded concurrency"""
+
+    def __init__(
+        self,
+        queue: WebhookQueue,
+        apply: Callable[[dict], Awaitable[None]],
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: float = 1.0,
+    ):
+        self.queue = queue
+        self.apply = apply
+        self.concurrency = concurrency or int(os.environ.get('WEBHOOK_WORKERS', 4))
+        self.batch_size = batch_size or int(os.environ.get('WEBHOOK_BATCH_SIZE', 50))
+        self.poll_interval = poll_interval
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_purge = time.monotonic()
+
+        async def attempt(event: dict):
+            async with semaphore:
+                try:
+                    await self.apply(event)
+                    return None
+                except Exception as e:
+                    logging.error(f"Error applying webhook event {event['event_id']}: {str(e)}")
+                    return str(e) or type(e).__name__
+
+        while True:
+            try:
+                self.queue.wakeup.clear()
+                batch = self.queue.claim(self.batch_size)
+                if not batch:
+                    if time.monotonic() - last_purge > 3600:
+                        self.queue.purge()
+                        last_purge = time.monotonic()
+                    try:
+                        await asyncio.wait_for(self.queue.wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                errors = await asyncio.gather(*(attempt(event) for event in batch))
+                applied = [event['event_id'] for event, error in zip(batch, errors) if error is None]
+                failed = {event['event_id']: error for event, error in zip(batch, errors) if error is not None}
+                self.queue.complete(applied, failed, {event['event_id']: event['attempts'] for event in batch})
+            except asyncio.CancelledError:
+                raise
+            except sqlite3.OperationalError as e:
+                # Another worker holds the lock; leased events come back after the lease
+                logging.error(f"Webhook queue busy, retrying on the next poll: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+            except Exception as e:
+                logging.error(f"Webhook worker error: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
@@ -1,8 +1,9 @@
 import React from 'react';
 import { Navigate } from 'react-router-dom';
+import { hasAdminSession } from '../lib/adminSession';
 
 const ProtectedRoute = ({ children }) => {
-  const isAuthenticated = sessionStorage.getItem('adminAuth') === 'true';
+  const isAuthenticated = hasAdminSession();
   
   if (!isAuthenticated) {
     return <Navigate to="/admin" replace />;
@@ -0,0 +1,61 @@
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
+// Refresh this long before the access token runs out
+const REFRESH_MARGIN_SECONDS = 30;
+
+export function saveAdminSession(data) {
+  sessionStorage.setItem('adminAuth', 'true');
+  sessionStorage.setItem('adminId', data.admin.id);
+  sessionStorage.setItem('adminEmail', data.admin.email);
+  sessionStorage.setItem('adminAccessToken', data.access_token);
+  sessionStorage.setItem('adminRefreshToken', data.refresh_token);
+  sessionStorage.setItem('adminExpiresAt', data.expires_at);
+}
+
+export function clearAdminSession() {
+  ['adminAuth', 'adminId', 'adminEmail', 'adminAccessToken', 'adminRefreshToken', 'adminExpiresAt']
+    .forEach((key) => sessionStorage.removeItem(key));
+}
+
+export function hasAdminSession() {
+  return sessionStorage.getItem('adminAuth') === 'true' && !!sessionStorage.getItem('adminRefreshToken');
+}
+
+let refreshing = null;
+
+async function accessToken() {
+  const expiresAt = Number(sessionStorage.getItem('adminExpiresAt') || 0);
+  if (expiresAt - REFRESH_MARGIN_SECONDS > Date.now() / 1000) {
+    return sessionStorage.getItem('adminAccessToken');
+  }
+  // One refresh at a time, however many requests are waiting on it
+  if (!refreshing) {
+    refreshing = axios.post(`${API}/admin/refresh`, {
+      refresh_token: sessionStorage.getItem('adminRefreshToken')
+    })
+      .then((response) => saveAdminSession(response.data))
+      .catch((err) => {
+        if (err.response?.status === 401) {
+          clearAdminSession();
+        }
+        throw err;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  await refreshing;
+  return sessionStorage.getItem('adminAccessToken');
+}
+
+// Axios instance for admin routes: sends the session token, refreshing it when due
+export const adminApi = axios.create({ baseURL: API });
+
+adminApi.interceptors.request.use(async (config) => {
+  const token = await accessToken();
+  config.headers.Authorization = `Bearer ${token}`;
+  return config;
+});
@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { Lock, Eye, EyeOff, Mail } from 'lucide-react';
+import { saveAdminSession } from '../lib/adminSession';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -26,10 +27,8 @@ const AdminLoginPage = () => {
       });
       
       if (response.data.success) {
-        // Store auth and admin info in sessionStorage
-        sessionStorage.setItem('adminAuth', 'true');
-        sessionStorage.setItem('adminId', response.data.admin.id);
-        sessionStorage.setItem('adminEmail', response.data.admin.email);
+        // Store the session and admin info in sessionStorage
+        saveAdminSession(response.data);
         navigate('/dashboard');
       }
     } catch (err) {
@@ -1,10 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import axios from 'axios';
 import { Lock, Mail, ArrowLeft, Eye, EyeOff, CheckCircle } from 'lucide-react';
-
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
+import { adminApi, clearAdminSession } from '../lib/adminSession';
 
 const AdminSettingsPage = () => {
   const navigate = useNavigate();
@@ -67,10 +64,7 @@ const AdminSettingsPage = () => {
     }
 
     try {
-      const adminId = sessionStorage.getItem('adminId');
-      
-      const response = await axios.post(`${API}/admin/change-password`, {
-        admin_id: parseInt(adminId),
+      const response = await adminApi.post('/admin/change-password', {
         current_password: currentPassword,
         new_password: newPassword
       });
@@ -84,7 +78,7 @@ const AdminSettingsPage = () => {
         
         // Clear session and redirect to login after 3 seconds
         setTimeout(() => {
-          sessionStorage.clear();
+          clearAdminSession();
           navigate('/admin');
         }, 3000);
       }
@@ -1,11 +1,9 @@
-import React, { useState, useEffect, useRef } from 'react';
-import axios from 'axios';
+import React, { useEffect, useRef } from 'react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const AlertsPage = () => {
-  const [lastProcessedId, setLastProcessedId] = useState(null);
   const alertElRef = useRef(null);
   const titleElRef = useRef(null);
   const msgElRef = useRef(null);
@@ -14,37 +12,30 @@ const AlertsPage = () => {
   const hideTimeoutRef = useRef(null);
 
   useEffect(() => {
-    // Poll for new tips every 3 seconds
-    const pollInterval = setInterval(() => {
-      checkForNewTips();
-    }, 3000);
-
-    return () => clearInterval(pollInterval);
-  }, [lastProcessedId]);
-
-  const checkForNewTips = async () => {
-    try {
-      const response = await axios.get(`${API}/tips/recent?limit=1`);
-      const tips = response.data;
-      
-      if (tips.length > 0) {
-        const latestTip = tips[0];
-        const tipId = `${latestTip.timestamp}_${latestTip.amount}`;
-        
-        if (tipId !== lastProcessedId) {
-          setLastProcessedId(tipId);
-          showAlert({
-            type: 'tip',
-            username: latestTip.tipper_name || 'Anonymous',
-            amount: latestTip.amount,
-            message: latestTip.message
-          });
-        }
+    // Tips are pushed by the server; EventSource reconnects on its own and
+    // sends Last-Event-ID so tips that land while disconnected are replayed
+    const source = new EventSource(`${API}/tips/stream`);
+
+    source.addEventListener('tip', (event) => {
+      try {
+        const tip = JSON.parse(event.data);
+        showAlert({
+          type: 'tip',
+          username: tip.tipper_name || 'Anonymous',
+          amount: tip.amount,
+          message: tip.message
+        });
+      } catch (error) {
+        console.error('Error handling tip event:', error);
       }
-    } catch (error) {
-      console.error('Error checking for tips:', error);
-    }
-  };
+    });
+
+    source.onerror = (error) => {
+      console.error('Tip stream error, reconnecting:', error);
+    };
+
+    return () => source.close();
+  }, []);
 
   const showAlert = (opts) => {
     const o = Object.assign({
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Zap, LogOut, ExternalLink } from 'lucide-react';
+import { clearAdminSession } from '../lib/adminSession';
 
 const AlertsTestPage = () => {
   const navigate = useNavigate();
@@ -10,7 +11,7 @@ const AlertsTestPage = () => {
   const [status, setStatus] = useState('');
 
   const handleLogout = () => {
-    sessionStorage.removeItem('adminAuth');
+    clearAdminSession();
     navigate('/admin');
   };
 
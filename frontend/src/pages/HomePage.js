@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { DollarSign, Heart, Loader2, Lock } from 'lucide-react';
@@ -7,6 +7,13 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const PRESET_AMOUNTS = [5, 10, 25, 50, 100];
+const CHECKOUT_RETRIES = 2;
+
+const newIdempotencyKey = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+);
 
 const HomePage = () => {
   const navigate = useNavigate();
@@ -18,6 +25,8 @@ const HomePage = () => {
   const [tipperName, setTipperName] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  // The same tip keeps its Idempotency-Key across clicks and retries
+  const checkoutAttempt = useRef({ payload: null, key: null });
 
   useEffect(() => {
     fetchCreatorProfile();
@@ -77,18 +86,42 @@ const HomePage = () => {
 
     try {
       const originUrl = window.location.origin;
-      const response = await axios.post(`${API}/checkout/session`, {
+      const payload = {
         amount: parseFloat(amount.toFixed(2)),
         message: message || null,
         tipper_name: tipperName || null,
         origin_url: originUrl
-      });
+      };
+      const payloadKey = JSON.stringify(payload);
+      if (checkoutAttempt.current.payload !== payloadKey) {
+        checkoutAttempt.current = { payload: payloadKey, key: newIdempotencyKey() };
+      }
+      const headers = { 'Idempotency-Key': checkoutAttempt.current.key };
+
+      let response;
+      for (let attempt = 0; ; attempt++) {
+        try {
+          response = await axios.post(`${API}/checkout/session`, payload, { headers });
+          break;
+        } catch (err) {
+          // No response means the network dropped it; the key makes a retry safe
+          if (err.response || attempt >= CHECKOUT_RETRIES) {
+            throw err;
+          }
+          await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+        }
+      }
 
       if (response.data.url) {
         window.location.href = response.data.url;
       }
     } catch (err) {
       console.error('Error creating checkout session:', err);
+      if (err.response) {
+        // The server answered; Stripe would replay that answer for the same
+        // key, so "try again" has to be a new attempt
+        checkoutAttempt.current = { payload: null, key: null };
+      }
       setError(err.response?.data?.detail || 'Failed to process payment. Please try again.');
       setLoading(false);
     }
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import axios from 'axios';
 import { CheckCircle, XCircle, Loader2 } from 'lucide-react';
+import { clearAdminSession } from '../lib/adminSession';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -45,9 +46,7 @@ const VerifyPasswordChangePage = () => {
         setMessage('Your password has been changed successfully!');
         
         // Clear admin session
-        sessionStorage.removeItem('adminAuth');
-        sessionStorage.removeItem('adminId');
-        sessionStorage.removeItem('adminEmail');
+        clearAdminSession();
         
         // Redirect to login after 3 seconds
         setTimeout(() => {
@@ -2,4 +2,4 @@
 # Railway start script for backend
 
 cd backend
-exec uvicorn server:app --host 0.0.0.0 --port ${PORT:-8001}
+exec python serve.py
@@ -0,0 +1,10 @@
+"""
+Backend modules are imported from backend/, the way the server runs them.
+Upstreams are the local stand-ins in backend/benchmarks/stand_ins.py;
+seed a stand-in before serving it, since it runs in a forked process.
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
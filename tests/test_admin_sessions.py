@@ -0,0 +1,95 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from auth import AuthService, PasswordHasher, SessionTokens
+from benchmarks.stand_ins import FakePostgREST, run_backend, serve
+from database import AdminRepository, Database
+
+ADMIN = {
+    "id": 1, "email": "admin@example.com",
+    "hashed_password": bcrypt.hashpw(b"old password", bcrypt.gensalt(4)).decode('utf-8'),
+}
+
+
+def test_token_round_trip_and_tampering():
+    tokens = SessionTokens(secret=b"secret")
+    token, expires_at = tokens.issue(ADMIN, 'access')
+    assert expires_at > time.time()
+    assert tokens.verify(token, 'access')['sub'] == 1
+    # Wrong kind, another key, or an altered payload are all refused
+    assert tokens.verify(token, 'refresh') is None
+    assert SessionTokens(secret=b"other").verify(token, 'access') is None
+    payload, signature = token.split('.')
+    assert tokens.verify(f"{payload[:-2]}AA.{signature}", 'access') is None
+    assert tokens.verify("garbage", 'access') is None
+
+
+def test_expired_token_is_refused():
+    tokens = SessionTokens(secret=b"secret", access_ttl=0.001)
+    token, _ = tokens.issue(ADMIN, 'access')
+    time.sleep(1.1)
+    assert tokens.verify(token, 'access') is None
+
+
+def test_password_change_revokes_earlier_sessions():
+    supabase = FakePostgREST()
+    supabase.seed('admin_users', [dict(ADMIN)])
+    supabase.seed('password_change_tokens', [{
+        "admin_id": 1, "token": "change-me", "used": False,
+        "expires_at": (datetime.now(timezone.utc) + timedelta(minutes=15)).isoformat(),
+    }])
+    with serve(supabase.app) as url:
+        async def main():
+            db = Database(url=url, key="test-service-key")
+            auth = AuthService(AdminRepository(db), PasswordHasher(workers=1),
+                               SessionTokens(secret=b"secret"))
+            try:
+                before = auth.issue_session(dict(ADMIN))
+                assert (await auth.admin_from_token(before['access_token']))['id'] == 1
+
+                await auth.verify_and_change_password("change-me", "new password")
+                assert await auth.admin_from_token(before['access_token']) is None
+                assert await auth.admin_from_token(before['refresh_token'], 'refresh') is None
+
+                # The token is spent
+                with pytest.raises(HTTPException) as reused:
+                    await auth.verify_and_change_password("change-me", "another password")
+                assert reused.value.status_code == 400
+
+                admin = await auth.authenticate_admin("admin@example.com", "new password")
+                after = auth.issue_session(admin)
+                assert (await auth.admin_from_token(after['access_token']))['id'] == 1
+            finally:
+                auth.hasher.shutdown()
+                await db.close()
+
+        asyncio.run(main())
+
+
+def test_admin_routes_are_503_while_admin_records_cannot_be_read():
+    supabase = FakePostgREST()
+    supabase.seed('admin_users', [dict(ADMIN)])
+    with serve(supabase.app) as supabase_url:
+        env = {"SUPABASE_URL": supabase_url, "SUPABASE_SERVICE_KEY": "test-service-key",
+               "ADMIN_CACHE_TTL": "0.1"}
+        with run_backend(env) as url, httpx.Client(base_url=url, timeout=10) as client:
+            session = client.post('/api/admin/login', json={
+                "email": "admin@example.com", "password": "old password",
+            }).json()
+            bearer = {"Authorization": f"Bearer {session['access_token']}"}
+            assert client.get('/api/admin/profile/1', headers=bearer).status_code == 200
+
+            httpx.post(f"{supabase_url}/test/faults", json={"error_rate": 1}).raise_for_status()
+            time.sleep(0.2)
+            for response in (
+                client.get('/api/admin/profile/1', headers=bearer),
+                client.post('/api/admin/refresh', json={"refresh_token": session['refresh_token']}),
+            ):
+                assert response.status_code == 503
+                assert int(response.headers['retry-after']) >= 1
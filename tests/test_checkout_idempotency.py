@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.stand_ins import FakePostgREST, FakeStripe, metric, run_backend, serve
+from services.stripe_service import StripeClientPool, checkout_request
+
+ORIGIN = "https://tips.test"
+TIP = {"amount": 5.0, "origin_url": ORIGIN, "tipper_name": "fan", "message": "hi"}
+
+
+def backend_env(tmp_path, supabase_url: str, stripe_url: str, name: str, **extra) -> dict:
+    return {
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_SERVICE_KEY": "test-service-key",
+        "STRIPE_API_KEY": "sk_test_idempotency",
+        "STRIPE_API_BASE": stripe_url,
+        "WORKER_BUS_DIR": str(tmp_path / name),
+        "CHECKOUT_POOL_ORIGINS": "",
+        **extra,
+    }
+
+
+def rows(supabase_url: str) -> list:
+    return httpx.get(f"{supabase_url}/rest/v1/payment_transactions").json()
+
+
+def checkout(client: httpx.Client, key: str, **changes) -> httpx.Response:
+    return client.post('/api/checkout/session', json={**TIP, **changes}, headers={"Idempotency-Key": key})
+
+
+def test_retry_on_another_worker_gets_the_same_session(tmp_path):
+    with serve(FakePostgREST().app) as supabase_url, serve(FakeStripe().app) as stripe_url:
+        pooled = backend_env(tmp_path, supabase_url, stripe_url, 'b',
+                             CHECKOUT_POOL_ORIGINS=ORIGIN, CHECKOUT_POOL_SIZE="1")
+        with run_backend(backend_env(tmp_path, supabase_url, stripe_url, 'a')) as url_a, \
+                run_backend(pooled) as url_b, \
+                httpx.Client(base_url=url_a, timeout=10) as worker_a, \
+                httpx.Client(base_url=url_b, timeout=10) as worker_b:
+            first = checkout(worker_a, "key-1")
+            assert first.status_code == 200
+            retried = checkout(worker_b, "key-1")
+            assert retried.json() == first.json()
+            # The replay was answered from the claimed row, not a pooled session
+            takes = metric(worker_b.get('/metrics').text, r'checkout_pool_takes_total\{[^}]*\}')
+            assert takes == 0
+            assert checkout(worker_b, "key-1", amount=10.0).status_code == 422
+        assert len(rows(supabase_url)) == 1
+
+
+def test_checkout_works_before_the_idempotency_migration(tmp_path):
+    supabase = FakePostgREST(missing_columns={'payment_transactions': ['idempotency_key', 'checkout_url']})
+    with serve(supabase.app) as supabase_url, serve(FakeStripe().app) as stripe_url:
+        with run_backend(backend_env(tmp_path, supabase_url, stripe_url, 'a')) as url, \
+                httpx.Client(base_url=url, timeout=10) as client:
+            first = checkout(client, "key-1")
+            assert first.status_code == 200
+            # Replays still hold within the worker
+            assert checkout(client, "key-1").json() == first.json()
+            assert checkout(client, "key-2").status_code == 200
+            # The coalescer writes in the background
+            deadline = time.monotonic() + 5
+            while len(rows(supabase_url)) < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        written = rows(supabase_url)
+    assert len(written) == 2
+    assert not any('idempotency_key' in row for row in written)
+
+
+def test_idempotency_key_reaches_stripe(monkeypatch):
+    with serve(FakeStripe().app) as stripe_url:
+        monkeypatch.setenv('STRIPE_API_BASE', stripe_url)
+        pool = StripeClientPool(api_key="sk_test_idempotency")
+
+        async def main():
+            client = pool.get(f"{ORIGIN}/api/webhook/stripe")
+            request = checkout_request(amount=5.0, currency="usd", success_url=f"{ORIGIN}/success",
+                                       cancel_url=ORIGIN, metadata={})
+            try:
+                first = await client.create_checkout_session(request, idempotency_key="key-1")
+                retried = await client.create_checkout_session(request, idempotency_key="key-1")
+                unkeyed = await client.create_checkout_session(request)
+            finally:
+                await pool.close()
+            return first, retried, unkeyed
+
+        first, retried, unkeyed = asyncio.run(main())
+    assert retried.session_id == first.session_id
+    assert unkeyed.session_id != first.session_id
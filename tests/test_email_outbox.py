@@ -0,0 +1,41 @@
+import pytest
+
+from services.email_outbox import EmailOutbox
+from services.email_service import EmailService
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = EmailOutbox(path=str(tmp_path / 'outbox.db'))
+    outbox.open()
+    yield outbox
+    outbox.close()
+
+
+def deliver(outbox: EmailOutbox):
+    for message in outbox.claim(10):
+        outbox.mark_sent(message['id'])
+
+
+def test_each_password_change_gets_its_confirmation(outbox):
+    emails = EmailService(outbox)
+    assert emails.send_password_changed_confirmation("admin@example.com", 1, "2024-01-01T00:00:00+00:00")
+    deliver(outbox)
+    # Same text, a later change within the dedupe window
+    assert emails.send_password_changed_confirmation("admin@example.com", 1, "2024-01-01T00:05:00+00:00")
+
+
+def test_the_same_event_is_queued_once(outbox):
+    emails = EmailService(outbox)
+    assert emails.send_password_changed_confirmation("admin@example.com", 1, "2024-01-01T00:00:00+00:00")
+    deliver(outbox)
+    assert emails.send_password_changed_confirmation("admin@example.com", 1, "2024-01-01T00:00:00+00:00") is None
+    assert outbox.deduped == 1
+
+
+def test_unkeyed_duplicates_are_dropped_only_while_unsent(outbox):
+    message = {"from": "a@example.com", "to": "b@example.com", "subject": "Hi", "html": "<p>Hi</p>"}
+    assert outbox.enqueue(message)
+    assert outbox.enqueue(message) is None
+    deliver(outbox)
+    assert outbox.enqueue(message)
@@ -0,0 +1,38 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS, HTTP_STREAMS_OPEN, MetricsMiddleware
+
+
+def test_streams_are_not_timed_or_counted_in_flight():
+    app = FastAPI()
+    seen = {}
+
+    @app.get("/test-metrics/stream")
+    async def stream():
+        async def events():
+            yield b"retry: 3000\n\n"
+            await asyncio.sleep(0.3)
+            seen['in_flight'] = HTTP_IN_FLIGHT.labels().value
+            seen['open'] = HTTP_STREAMS_OPEN.labels('/test-metrics/stream').value
+            yield b": heartbeat\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/test-metrics/plain")
+    async def plain():
+        return {}
+
+    app.add_middleware(MetricsMiddleware)
+    with TestClient(app) as client:
+        client.get("/test-metrics/plain")
+        client.get("/test-metrics/stream")
+
+    assert seen == {'in_flight': 0, 'open': 1}
+    assert HTTP_STREAMS_OPEN.labels('/test-metrics/stream').value == 0
+    assert HTTP_IN_FLIGHT.labels().value == 0
+    assert HTTP_LATENCY.labels('/test-metrics/plain', 'GET').count == 1
+    assert ('/test-metrics/stream', 'GET') not in HTTP_LATENCY._children
+    assert HTTP_REQUESTS.labels('/test-metrics/stream', 'GET', '200').value == 1
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, row_key
+
+
+def test_cursor_round_trip():
+    key = (datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc), "7f0c1a2b")
+    cursor = encode_cursor(key)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == key
+
+
+def test_row_key_matches_decoded_cursor():
+    row = {"id": "abc", "timestamp": "2024-05-01T12:30:15.123456+00:00"}
+    assert decode_cursor(encode_cursor(row_key(row))) == row_key(row)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "WzEsMl0", "WyJub3QgYSBkYXRlIiwiYSJd"])
+def test_invalid_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,77 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from rate_limit import LoginAttemptTracker, SlidingWindowLimiter
+
+
+def request_from(ip: str) -> Request:
+    return Request({"type": "http", "headers": [], "client": (ip, 1234)})
+
+
+def test_limiter_allows_up_to_the_limit():
+    limiter = SlidingWindowLimiter(limit=3, window=60)
+    assert [limiter.hit('k') for _ in range(4)] == [True, True, True, False]
+    assert limiter.rejected == 1
+    assert 1 <= limiter.retry_after('k') <= 61
+    assert limiter.hit('other')
+
+
+def test_reset_clears_a_key():
+    limiter = SlidingWindowLimiter(limit=1, window=60)
+    limiter.hit('k')
+    limiter.reset('k')
+    assert limiter.hit('k')
+
+
+def test_previous_window_still_counts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('rate_limit.time.monotonic', lambda: now[0])
+    limiter = SlidingWindowLimiter(limit=4, window=10)
+    for _ in range(4):
+        assert limiter.hit('k')
+    # A quarter into the next window, three quarters of the last one still count
+    now[0] = 1012.5
+    assert limiter.hit('k')
+    assert not limiter.hit('k')
+    now[0] = 1019.9
+    assert limiter.hit('k')
+
+
+def test_memory_stays_bounded():
+    limiter = SlidingWindowLimiter(limit=1, window=60, max_keys=100)
+    for n in range(1000):
+        limiter.hit(f"10.0.{n // 256}.{n % 256}")
+    assert len(limiter._keys) == 100
+
+
+def test_tracker_limits_per_email():
+    tracker = LoginAttemptTracker(ip_limit=100, email_limit=2, window=60)
+    tracker.check(request_from('10.0.0.1'), 'Admin@Example.com')
+    tracker.check(request_from('10.0.0.2'), 'admin@example.com')
+    with pytest.raises(HTTPException) as rejected:
+        tracker.check(request_from('10.0.0.3'), 'admin@example.com')
+    assert rejected.value.status_code == 429
+    assert 'Retry-After' in rejected.value.headers
+
+
+def test_tracker_shares_attempts():
+    shared = []
+    tracker = LoginAttemptTracker(ip_limit=100, email_limit=1, window=60,
+                                  share=lambda kind, data: shared.append((kind, data)))
+    tracker.check(request_from('10.0.0.1'), 'Admin@Example.com')
+    with pytest.raises(HTTPException):
+        tracker.check(request_from('10.0.0.2'), 'admin@example.com')
+    assert shared[0] == ("login_attempt", {"ip": '10.0.0.1', "email": 'admin@example.com'})
+    # The refused attempt still counts for its IP, not for the email
+    assert shared[1] == ("login_attempt", {"ip": '10.0.0.2', "email": None})
+
+
+def test_attempts_from_other_workers_count():
+    worker_a = LoginAttemptTracker(ip_limit=2, email_limit=10, window=60)
+    worker_b = LoginAttemptTracker(ip_limit=2, email_limit=10, window=60,
+                                   share=lambda kind, data: worker_a.record(data))
+    worker_b.check(request_from('10.0.0.1'), 'a@example.com')
+    worker_b.check(request_from('10.0.0.1'), 'b@example.com')
+    with pytest.raises(HTTPException):
+        worker_a.check(request_from('10.0.0.1'), 'c@example.com')
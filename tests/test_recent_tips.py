@@ -0,0 +1,65 @@
+import asyncio
+
+import orjson
+
+from cache import RecentTipsBuffer, SingleFlight
+
+
+def test_tip_paid_during_warm_up_is_kept():
+    buffer = RecentTipsBuffer(size=3, serialize=orjson.dumps)
+    flight = SingleFlight()
+    queries = []
+
+    async def load():
+        queries.append(None)
+        await asyncio.sleep(0.05)
+        # Snapshot taken before the new tip was paid
+        return [((1, 'a'), 'a')]
+
+    async def main():
+        warms = [asyncio.ensure_future(flight.do("warm", lambda: buffer.warm(load))) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        buffer.add((2, 'b'), 'b')
+        await asyncio.gather(*warms)
+
+    asyncio.run(main())
+    assert len(queries) == 1
+    assert buffer.page(10) == (['b', 'a'], None)
+
+
+def test_late_warm_does_not_drop_newer_tips():
+    buffer = RecentTipsBuffer(size=2, serialize=orjson.dumps)
+
+    async def snapshot():
+        return [((1, 'a'), 'a')]
+
+    asyncio.run(buffer.warm(snapshot))
+    buffer.add((2, 'b'), 'b')
+    asyncio.run(buffer.warm(snapshot))
+    assert buffer.page(2)[0] == ['b', 'a']
+
+
+def test_pages_past_a_full_buffer_go_to_the_database():
+    buffer = RecentTipsBuffer(size=2, serialize=orjson.dumps)
+
+    async def full():
+        return [((3, 'c'), 'c'), ((2, 'b'), 'b')]
+
+    asyncio.run(buffer.warm(full))
+    assert buffer.page(2) == (['c', 'b'], (2, 'b'))
+    assert buffer.page(3) is None
+    assert buffer.page(1, after=(2, 'b')) is None
+
+
+def test_tip_seen_by_warm_up_and_its_paid_transition_is_held_once():
+    buffer = RecentTipsBuffer(size=3, serialize=orjson.dumps)
+
+    async def snapshot():
+        return [((1, 'a'), 'a')]
+
+    asyncio.run(buffer.warm(snapshot))
+    # The same tip arriving from on_tip_paid, then again over the bus
+    buffer.add((1, 'a'), 'a')
+    buffer.add((1, 'a'), 'a')
+    buffer.add((2, 'b'), 'b')
+    assert buffer.page(10) == (['b', 'a'], None)
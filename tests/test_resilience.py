@@ -0,0 +1,194 @@
+import asyncio
+import re
+import time
+
+import httpx
+import pytest
+
+from benchmarks.stand_ins import FakePostgREST, metric, run_backend, serve
+from resilience import CircuitBreaker, CircuitOpenError, hedged
+
+
+def fail(breaker: CircuitBreaker, error: Exception = RuntimeError("down")):
+    with pytest.raises(type(error)):
+        with breaker.call():
+            raise error
+
+
+def succeed(breaker: CircuitBreaker):
+    with breaker.call():
+        pass
+
+
+def test_breaker_opens_after_failure_ratio():
+    breaker = CircuitBreaker('test', min_calls=4, failure_ratio=0.5, window=10, open_for=60)
+    succeed(breaker)
+    succeed(breaker)
+    fail(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+    fail(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as rejected:
+        succeed(breaker)
+    assert 0 < rejected.value.retry_after <= 60
+
+
+def test_breaker_ignores_errors_that_are_not_failures():
+    breaker = CircuitBreaker('test', is_failure=lambda e: not isinstance(e, ValueError),
+                             min_calls=2, window=10, open_for=60)
+    for _ in range(5):
+        fail(breaker, ValueError("bad request"))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker('test', min_calls=1, window=10, open_for=0.05)
+    fail(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    with breaker.call():
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # A second call while the probe is out is still refused
+        with pytest.raises(CircuitOpenError):
+            succeed(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker('test', min_calls=1, window=10, open_for=0.05)
+    fail(breaker)
+    time.sleep(0.06)
+    fail(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        succeed(breaker)
+
+
+def test_cancelled_probe_lets_another_call_probe():
+    breaker = CircuitBreaker('test', min_calls=1, window=10, open_for=0.05)
+    fail(breaker)
+    time.sleep(0.06)
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.call():
+            raise asyncio.CancelledError()
+    succeed(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedged_takes_the_faster_copy():
+    attempts = []
+
+    async def call():
+        attempts.append(None)
+        await asyncio.sleep(1 if len(attempts) == 1 else 0.01)
+        return len(attempts)
+
+    async def run():
+        started = time.perf_counter()
+        result = await hedged(call, after=0.05, timeout=2, service='test')
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result == 2
+    assert elapsed < 0.5
+
+
+def test_hedged_does_not_retry_errors():
+    attempts = []
+
+    async def call():
+        attempts.append(None)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(hedged(call, after=0.05, timeout=2, service='test'))
+    assert len(attempts) == 1
+
+
+def test_hedged_times_out():
+    async def call():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(hedged(call, after=0.01, timeout=0.1, service='test'))
+
+
+PROFILE = {
+    "id": 1, "name": "Stork", "bio": "Clips", "avatar_url": "https://example.com/a.png",
+    "social_links": {}, "created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-01T00:00:00+00:00",
+}
+
+
+@pytest.fixture
+def degraded_backend(tmp_path):
+    """The backend against a PostgREST stand-in whose faults the test controls"""
+    supabase = FakePostgREST()
+    supabase.seed('creator_profile', [PROFILE])
+    with serve(supabase.app) as supabase_url:
+        env = {
+            "SUPABASE_URL": supabase_url,
+            "SUPABASE_SERVICE_KEY": "test-service-key",
+            "WORKER_BUS_DIR": str(tmp_path / 'bus'),
+            "CREATOR_CACHE_TTL": "0.2",
+            "SUPABASE_READ_TIMEOUT": "0.3",
+            "CIRCUIT_MIN_CALLS": "4",
+            "CIRCUIT_OPEN_FOR": "1",
+        }
+        with run_backend(env) as url, httpx.Client(base_url=url, timeout=10) as client, \
+                httpx.Client(base_url=supabase_url) as faults:
+            yield client, lambda **settings: faults.post('/test/faults', json=settings).raise_for_status()
+
+
+def breaker_state(client: httpx.Client) -> float:
+    return metric(client.get('/metrics').text, re.escape('upstream_circuit_state{service="supabase"}'))
+
+
+def test_cold_read_is_503_with_retry_after(degraded_backend):
+    client, faults = degraded_backend
+    faults(error_rate=1)
+    response = client.get('/api/creator')
+    assert response.status_code == 503
+    assert int(response.headers['retry-after']) >= 1
+
+
+def test_creator_served_stale_while_supabase_errors(degraded_backend):
+    client, faults = degraded_backend
+    assert client.get('/api/creator').json()['name'] == "Stork"
+    faults(error_rate=1)
+    time.sleep(0.3)
+    response = client.get('/api/creator')
+    assert response.status_code == 200
+    assert response.json()['name'] == "Stork"
+
+
+def test_creator_served_stale_while_supabase_is_slow(degraded_backend):
+    client, faults = degraded_backend
+    client.get('/api/creator').raise_for_status()
+    faults(latency=2)
+    time.sleep(0.3)
+    started = time.perf_counter()
+    response = client.get('/api/creator')
+    assert response.status_code == 200
+    # Gave up at the read deadline instead of waiting out the upstream
+    assert time.perf_counter() - started < 1.5
+
+
+def test_breaker_opens_fails_fast_and_recovers(degraded_backend):
+    client, faults = degraded_backend
+    faults(error_rate=1)
+    for _ in range(4):
+        assert client.get('/api/tips/recent').status_code == 503
+    assert breaker_state(client) == 2
+
+    # Open: refused without a database request, told when to come back
+    faults(error_rate=0, latency=2)
+    started = time.perf_counter()
+    response = client.get('/api/tips/recent')
+    assert time.perf_counter() - started < 0.2
+    assert response.status_code == 503
+    assert 1 <= int(response.headers['retry-after']) <= 2
+
+    faults(latency=0)
+    time.sleep(1.1)
+    assert client.get('/api/tips/recent').status_code == 200
+    assert breaker_state(client) == 0
@@ -0,0 +1,60 @@
+import time
+
+from events import TipEventHub
+
+
+def drain(subscriber) -> list:
+    return [subscriber.queue.get_nowait() for _ in range(subscriber.queue.qsize())]
+
+
+def test_workers_share_event_ids_and_order(tmp_path):
+    log = str(tmp_path / 'events.db')
+    worker_a, worker_b = TipEventHub(log_path=log), TipEventHub(log_path=log)
+    worker_a.open()
+    worker_b.open()
+    watcher = worker_b.subscribe()
+
+    worker_a.publish({"n": 1})
+    worker_b.publish({"n": 2})
+    worker_a.publish({"n": 3})
+    # worker_a's bus messages arrive after worker_b's own tip
+    worker_b.sync()
+
+    events = drain(watcher)
+    ids = [event.id for event in events]
+    assert ids == sorted(ids) and len(set(ids)) == 3
+    assert ['"n": 1' in event.data for event in events] == [True, False, False]
+
+    # Resuming on the other worker replays exactly what came after
+    resumed = worker_a.subscribe(ids[0])
+    assert [event.id for event in drain(resumed)] == ids[1:]
+
+    # A worker started later has the same history
+    late = TipEventHub(log_path=log)
+    late.open()
+    assert [event.id for event in late.history] == ids
+    for hub in (worker_a, worker_b, late):
+        hub.close()
+
+
+def test_ids_keep_increasing_across_log_files(tmp_path):
+    first = TipEventHub(log_path=str(tmp_path / 'one.db'))
+    first.open()
+    first.publish({})
+    first.close()
+    time.sleep(0.01)
+    second = TipEventHub(log_path=str(tmp_path / 'two.db'))
+    second.open()
+    second.publish({})
+    second.close()
+    assert second.history[-1].id > first.history[-1].id
+
+
+def test_without_a_log_ids_are_local():
+    hub = TipEventHub()
+    subscriber = hub.subscribe()
+    hub.publish({"n": 1})
+    hub.publish({"n": 2})
+    first, second = drain(subscriber)
+    assert second.id == first.id + 1
+    assert [event.id for event in drain(hub.subscribe(first.id))] == [second.id]
@@ -0,0 +1,40 @@
+import asyncio
+
+from stats import TipStats
+
+
+def tip(n: int, amount: float = 5.0) -> dict:
+    return {"id": f"tx-{n}", "session_id": f"cs_{n}", "amount": amount, "tipper_name": f"fan-{n}",
+            "timestamp": f"2024-01-01T00:{n:02d}:00+00:00"}
+
+
+def test_tips_paid_during_a_rebuild_are_counted_once():
+    stats = TipStats()
+
+    async def scan():
+        for n in range(1, 6):
+            if n == 3:
+                # Paid before the scan reaches it, and just after it read cs_2
+                stats.add(tip(4))
+                stats.add(tip(2))
+                # Paid and not in this scan at all
+                stats.add(tip(9))
+            yield tip(n)
+            await asyncio.sleep(0)
+
+    asyncio.run(stats.rebuild(scan()))
+    assert stats.total_count == 6
+    assert stats.total_amount == 30.0
+
+
+def test_rebuild_replaces_earlier_counts():
+    stats = TipStats()
+
+    async def scan():
+        for n in range(3):
+            yield tip(n, 10.0)
+
+    asyncio.run(stats.rebuild(scan()))
+    asyncio.run(stats.rebuild(scan()))
+    assert stats.total_count == 3
+    assert stats.total_amount == 30.0
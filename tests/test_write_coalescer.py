@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.stand_ins import FakePostgREST, serve
+from database import Database, TransactionRepository
+
+
+def pending(session_id: str) -> dict:
+    return {
+        "id": f"tx-{session_id}", "session_id": session_id, "amount": 5.0, "currency": "usd",
+        "message": None, "tipper_name": "fan", "status": "initiated", "payment_status": "pending",
+        "timestamp": "2024-01-01T00:00:00+00:00",
+    }
+
+
+def rows(url: str) -> dict:
+    return {row['session_id']: row for row in httpx.get(f"{url}/rest/v1/payment_transactions").json()}
+
+
+def run(url: str, scenario):
+    async def main():
+        db = Database(url=url, key="test-service-key")
+        try:
+            return await scenario(TransactionRepository(db))
+        finally:
+            await db.close()
+    return asyncio.run(main())
+
+
+def test_one_batch_applies_insert_then_status_then_paid():
+    with serve(FakePostgREST().app) as url:
+        async def scenario(transactions):
+            # Submitted out of order, flushed together
+            return await asyncio.gather(
+                transactions.mark_paid("cs_1", "complete"),
+                transactions.update_status("cs_1", "open", "unpaid"),
+                transactions.create(pending("cs_1")),
+            )
+        paid, _, _ = run(url, scenario)
+        assert paid['session_id'] == "cs_1"
+        assert rows(url)["cs_1"]['payment_status'] == "paid"
+        assert rows(url)["cs_1"]['status'] == "complete"
+
+
+def test_paid_is_never_inverted():
+    supabase = FakePostgREST()
+    supabase.seed('payment_transactions', [pending("cs_1")])
+    with serve(supabase.app) as url:
+        async def scenario(transactions):
+            await transactions.mark_paid("cs_1", "complete")
+            await transactions.update_status("cs_1", "expired", "unpaid")
+        run(url, scenario)
+        assert rows(url)["cs_1"]['payment_status'] == "paid"
+
+
+def test_only_the_first_mark_paid_sees_the_transition():
+    supabase = FakePostgREST()
+    supabase.seed('payment_transactions', [pending("cs_1")])
+    with serve(supabase.app) as url:
+        async def scenario(transactions):
+            together = await asyncio.gather(*(transactions.mark_paid("cs_1", "complete") for _ in range(3)))
+            later = await transactions.mark_paid("cs_1", "complete")
+            return together, later
+        together, later = run(url, scenario)
+        assert sum(result is not None for result in together) == 1
+        assert later is None
+
+
+def test_concurrent_writes_share_round_trips():
+    with serve(FakePostgREST().app) as url:
+        async def scenario(transactions):
+            await asyncio.gather(*(transactions.create(pending(f"cs_{n}")) for n in range(20)))
+            return transactions.writes
+        writes = run(url, scenario)
+        assert len(rows(url)) == 20
+        assert writes.submitted == 20
+        assert writes.requests == 1
+
+
+def test_failures_reach_every_caller(monkeypatch):
+    monkeypatch.delenv('SUPABASE_URL', raising=False)
+
+    async def main():
+        transactions = TransactionRepository(Database())
+        results = await asyncio.wait_for(asyncio.gather(
+            transactions.create(pending("cs_1")),
+            transactions.update_status("cs_1", "open", "unpaid"),
+            transactions.mark_paid("cs_1", "complete"),
+            return_exceptions=True,
+        ), timeout=2)
+        assert all(isinstance(result, Exception) for result in results)
+
+    asyncio.run(main())
+
+
+def test_upstream_errors_reach_callers():
+    with serve(FakePostgREST(error_rate=1).app) as url:
+        async def scenario(transactions):
+            await transactions.create(pending("cs_1"))
+        with pytest.raises(Exception):
+            run(url, scenario)